@@ -1,18 +1,31 @@
 import pandas as pd
+from VoterDB import connect, create_indexes, DISTRICT_COLUMNS
+from RegistrantIndex import open_table_index, lookup, duplicates
 
-# Load the two CSV files
-df1 = pd.read_csv('FinaaaalCD AND LD data.csv')    # This file has 'statevoterid'
-df2 = pd.read_csv('muslim_voters_with_vote_status.csv')   # This file has 'resgid' and other columns
+# Both input files are tables in muslim_voters.sqlite (Step0_buildVoterDatabase.py):
+#   cd_ld_voters  'FinaaaalCD AND LD data.csv'            (has 'Voters Id')
+#   voters        'muslim_voters_with_vote_status.csv'    (has 'RegistrantID', 'School District', 'Voted')
+connection = connect()
+df1 = pd.read_sql_query("SELECT * FROM cd_ld_voters ORDER BY rowid", connection)
+df2 = pd.read_sql_query('SELECT "School District", "Voted" FROM voters ORDER BY rowid', connection)  # Only the two columns we bring over
 
-# Select only 'resgid' and the two columns you want to bring over
-columns_needed = ['RegistrantID', 'School District', 'Voted']  # Replace column1, column2 with actual names
-df2 = df2[columns_needed]
-df2 = df2.drop_duplicates(subset=['RegistrantID'])
-# Merge the two files: match statevoterid in df1 to resgid in df2
-merged_df = df1.merge(df2, left_on='Voters Id', right_on='RegistrantID', how='left')
+# Sorted, memory-mapped RegistrantID index over the voters table (built by Step0_buildVoterDatabase.py)
+index = open_table_index('voters', 'RegistrantID')
+print(f"{len(duplicates(index)):,} duplicated RegistrantIDs (first row is kept)")
 
-# Optionally, drop the 'resgid' after the merge if you don't need it
-merged_df = merged_df.drop(columns=['RegistrantID'])
+# Binary-search every 'Voters Id' in the index to get the matching row (first occurrence, -1 if missing)
+rows = lookup(index, df1['Voters Id'])
+matched = rows >= 0
+
+# Attach School District and Voted by row position instead of drop_duplicates + merge
+merged_df = df1.copy()
+for column in ['School District', 'Voted']:
+    merged_df[column] = pd.Series(pd.NA, index=merged_df.index, dtype=object)
+    merged_df.loc[matched, column] = df2[column].to_numpy()[rows[matched]]
+
+# Keep the joined table in the database for the Step scripts, indexed by id and district
+merged_df.to_sql("voters_with_districts", connection, if_exists="replace", index=False)
+create_indexes(connection, "voters_with_districts", ["Voters Id"] + DISTRICT_COLUMNS)
 
 # Save the final result
 merged_df.to_csv('muslim_Voters_data_with_SchoolDistrict_CD_LD_Voted.csv', index=False)
@@ -0,0 +1,239 @@
+import argparse
+import datetime
+import gzip
+import hashlib
+import json
+import os
+from email.utils import parsedate_to_datetime
+import numpy as np
+import pandas as pd
+import tornado.escape
+import tornado.ioloop
+import tornado.web
+from RenderTables import (GEOGRAPHIES, GEOGRAPHY_BY_KEY, NUM_CLASSES, add_locations, classify, jenks_breaks,
+                          quantile_breaks)
+from States import STATE, current_state
+from Step11_publishAggregates import PUBLISH_DIR
+
+# Read-only JSON API over the precomputed store, for partners who would otherwise get CSVs by
+# email or scrape the dashboards:
+#   GET /api                                   state, geographies, elections, endpoints
+#   GET /api/aggregates/<geography>            published aggregate rows (Step11: small cells
+#                                              suppressed), ?election=<folder> for a past election
+#   GET /api/render/<geography>                the published rows keyed by the GeoJSON feature key
+#                                              (featureidkey), with color classes and class breaks
+#                                              computed from the published values only
+#   GET /api/drilldown[/<county>[/<city>]]     one level of the published drill-down index
+# Everything is served from Step11's published/ files, never from the unsuppressed tables.
+#
+# Every response body is built once, gzip-compressed once and kept with its ETag and
+# Last-Modified under its route and election (so the cache holds at most one entry per resource);
+# an entry is rebuilt when one of its source files changes (checked with a stat per request), so
+# a pipeline rerun or a WatchPipeline.py hot swap is picked up without a restart.
+# If-None-Match / If-Modified-Since get a 304, gzip-capable clients get the stored gzip bytes.
+# Run it from the project root or a state's directory (RunStates.py) to serve that state.
+
+CACHE_MAX_AGE = 60  # seconds clients and proxies may reuse a response
+ELECTIONS_FILE = os.path.join("history", "elections.json")
+
+
+class ResponseCache:
+    """Encoded responses by key, each valid while its source files keep their modification times."""
+
+    def __init__(self, enabled=True):
+        self.enabled = enabled
+        self.entries = {}
+
+    def get(self, key, sources, build):
+        stamps = tuple(os.stat(path).st_mtime_ns if os.path.exists(path) else None for path in sources)
+        entry = self.entries.get(key)
+        if entry is None or entry["stamps"] != stamps or not self.enabled:
+            body = build().encode("utf-8")
+            modified = max((s for s in stamps if s is not None), default=0) // 1_000_000_000
+            entry = {
+                "stamps": stamps,
+                "body": body,
+                "gzip": gzip.compress(body, compresslevel=6),
+                "etag": '"' + hashlib.sha1(body).hexdigest()[:20] + '"',
+                "last_modified": datetime.datetime.fromtimestamp(modified, tz=datetime.timezone.utc),
+            }
+            self.entries[key] = entry
+        return entry
+
+
+def election_dir(election):
+    """history/<folder>/ for a known election folder, '' for the current data."""
+    if not election:
+        return ""
+    folders = []
+    if os.path.exists(ELECTIONS_FILE):
+        with open(ELECTIONS_FILE, "r") as file:
+            folders = [e["folder"] for e in json.load(file)]
+    if election not in folders:
+        raise tornado.web.HTTPError(404, reason=f"Unknown election '{election}'")
+    return os.path.join("history", election, "")
+
+
+def geography(key):
+    if key not in GEOGRAPHY_BY_KEY:
+        raise tornado.web.HTTPError(404, reason=f"Unknown geography '{key}'")
+    return GEOGRAPHY_BY_KEY[key]
+
+
+def require(path, hint):
+    if not os.path.exists(path):
+        raise tornado.web.HTTPError(503, reason=f"{path} not built yet ({hint})")
+    return path
+
+
+class JSONHandler(tornado.web.RequestHandler):
+    def initialize(self, cache):
+        self.cache = cache
+
+    def head(self, *args):
+        return self.get(*args)
+
+    def compute_etag(self):
+        return None  # set from the cache entry instead of hashing every response
+
+    def write_error(self, status_code, **kwargs):
+        self.set_header("Content-Type", "application/json; charset=utf-8")
+        self.finish(json.dumps({"error": self._reason}))
+
+    def respond(self, key, sources, build):
+        entry = self.cache.get(key, sources, build)
+        self.set_header("Content-Type", "application/json; charset=utf-8")
+        self.set_header("Cache-Control", f"public, max-age={CACHE_MAX_AGE}")
+        self.set_header("Vary", "Accept-Encoding")
+        self.set_header("Etag", entry["etag"])
+        self.set_header("Last-Modified", entry["last_modified"])
+
+        if self.request.headers.get("If-None-Match"):
+            not_modified = self.check_etag_header()
+        else:
+            try:
+                since = parsedate_to_datetime(self.request.headers.get("If-Modified-Since", ""))
+                not_modified = since >= entry["last_modified"]
+            except (TypeError, ValueError):
+                not_modified = False
+        if not_modified:
+            self.set_status(304)
+            return
+
+        if "gzip" in self.request.headers.get("Accept-Encoding", ""):
+            self.set_header("Content-Encoding", "gzip")
+            self.write(entry["gzip"])
+        else:
+            self.write(entry["body"])
+
+
+class IndexHandler(JSONHandler):
+    def get(self):
+        def build():
+            elections = []
+            if os.path.exists(ELECTIONS_FILE):
+                with open(ELECTIONS_FILE, "r") as file:
+                    elections = json.load(file)
+            return json.dumps({
+                "state": current_state(),
+                "name": STATE["name"],
+                "geographies": [{k: geo[k] for k in ("key", "title", "featureidkey")} for geo in GEOGRAPHIES],
+                "elections": elections,
+                "endpoints": ["/api/aggregates/<geography>", "/api/render/<geography>",
+                              "/api/drilldown[/<county>[/<city>]]"],
+            })
+
+        self.respond(("index",), [ELECTIONS_FILE], build)
+
+
+class AggregateHandler(JSONHandler):
+    def get(self, key):
+        data_dir = election_dir(self.get_argument("election", ""))
+        path = os.path.join(PUBLISH_DIR, data_dir + geography(key)["data_file"])
+        require(path, "run Step11_publishAggregates.py")
+        self.respond(("aggregates", key, data_dir), [path], lambda: pd.read_csv(path).to_json(orient="records"))
+
+
+def published_render_table(key, path):
+    """The published rows of one geography by feature key, with color classes from the published
+    values; rows sharing a feature are summed, and a sum with a hidden part is hidden."""
+    data = add_locations(key, pd.read_csv(path))
+    data["location"] = data["location"].astype(str)
+    counts = ["Muslim_Total", "Muslim_Voted"]
+    groups = data.groupby("location", sort=False)
+    table = groups[counts].sum().mask(groups[counts].agg(lambda s: s.isna().any()))
+    table.insert(0, "label", groups["label"].first())
+    table["Muslim_Voted_Percent"] = (table["Muslim_Voted"] / table["Muslim_Total"] * 100).round(2)
+    table["Total_Suppressed"] = table["Muslim_Total"].isna()
+    table["Turnout_Suppressed"] = table["Muslim_Voted"].isna()
+
+    breaks = {
+        "Muslim_Total": {"method": "jenks",
+                         "breaks": jenks_breaks(table["Muslim_Total"].dropna(), NUM_CLASSES)},
+        "Muslim_Voted_Percent": {"method": "quantile",
+                                 "breaks": quantile_breaks(table["Muslim_Voted_Percent"].dropna(), NUM_CLASSES)},
+    }
+    for metric, hidden in [("Muslim_Total", "Total_Suppressed"), ("Muslim_Voted_Percent", "Turnout_Suppressed")]:
+        classes = classify(table[metric].fillna(0), breaks[metric]["breaks"])
+        table[f"{metric}_class"] = np.where(table[hidden], -1, classes)
+    return table, breaks
+
+
+class RenderTableHandler(JSONHandler):
+    def get(self, key):
+        geo = geography(key)
+        data_dir = election_dir(self.get_argument("election", ""))
+        path = require(os.path.join(PUBLISH_DIR, data_dir + geo["data_file"]), "run Step11_publishAggregates.py")
+
+        def build():
+            table, breaks = published_render_table(key, path)
+            return (f'{{"featureidkey":{json.dumps(geo["featureidkey"])},"breaks":{json.dumps(breaks)},'
+                    f'"features":{table.to_json(orient="index")}}}')
+
+        self.respond(("render", key, data_dir), [path], build)
+
+
+class DrilldownHandler(JSONHandler):
+    def get(self, path):
+        names = [tornado.escape.url_unescape(p) for p in path.split("/") if p]
+        index_path = require(os.path.join(PUBLISH_DIR, "DrilldownIndex.json"), "run Step11_publishAggregates.py")
+
+        def build():
+            with open(index_path, "r") as file:
+                node = {"children": json.load(file)}
+            for name in names:
+                if name not in node.get("children", {}):
+                    raise tornado.web.HTTPError(404, reason=f"No '{name}' under /{'/'.join(names)}")
+                node = node["children"][name]
+            children = node.get("children", {})
+            return json.dumps({
+                "path": names,
+                **{k: v for k, v in node.items() if k != "children"},
+                "children": {name: {**{k: v for k, v in child.items() if k != "children"},
+                                    "has_children": bool(child.get("children"))}
+                             for name, child in children.items()},
+            })
+
+        self.respond(("drilldown", tuple(names)), [index_path], build)
+
+
+def make_app(cache_enabled=True):
+    cache = ResponseCache(cache_enabled)
+    return tornado.web.Application([
+        (r"/api/?", IndexHandler, {"cache": cache}),
+        (r"/api/aggregates/(\w+)", AggregateHandler, {"cache": cache}),
+        (r"/api/render/(\w+)", RenderTableHandler, {"cache": cache}),
+        (r"/api/drilldown((?:/[^/]+)*)/?", DrilldownHandler, {"cache": cache}),
+    ])
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Serve the precomputed aggregates as a cached JSON API")
+    parser.add_argument("--port", type=int, default=8600)
+    parser.add_argument("--address", default="127.0.0.1")
+    parser.add_argument("--no-cache", action="store_true", help="Rebuild every response (for comparison)")
+    args = parser.parse_args()
+
+    make_app(not args.no_cache).listen(args.port, address=args.address)
+    print(f"✅ Serving {STATE['name']} aggregates on http://{args.address}:{args.port}/api", flush=True)
+    tornado.ioloop.IOLoop.current().start()
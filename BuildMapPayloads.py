@@ -0,0 +1,96 @@
+import argparse
+import gzip
+import hashlib
+import json
+import os
+from RenderTables import GEOGRAPHIES
+from GeometryTools import round_geojson, simplify_topology, to_topojson, count_vertices
+from PreprocessBoundaries import boundary_path
+from States import boundary_source
+
+try:
+    import brotli
+except ImportError:  # brotli is optional; gzip is always written
+    brotli = None
+
+# Compact boundary payloads for the dashboards and the static export.
+#
+# For every boundary file this writes, under static/geo/ (served by Streamlit at
+# app/static/geo/ because .streamlit/config.toml turns on enableStaticServing):
+#   <geography>.<hash>.json        GeoJSON with rounded coordinates and only the featureidkey property
+#   <geography>.<hash>.topo.json   the same boundaries TopoJSON-style: shared arcs stored once, delta-encoded
+# each with pre-compressed .gz (and .br when the brotli module is installed) siblings. Streamlit
+# does not serve those: it gzips the plain file on the fly for every request. They are only for a
+# CDN or static host that serves pre-compressed files directly, if static/geo/ is deployed to one.
+# Map.py / MapVoting.py pass the GeoJSON URL to Plotly instead of embedding the boundaries in
+# every figure, so the browser downloads each file once and caches it across sections and reruns.
+
+PAYLOAD_DIR = os.path.join("static", "geo")
+MANIFEST_FILE = os.path.join(PAYLOAD_DIR, "manifest.json")
+
+
+def precompress(path, data):
+    """Write data to path plus .gz / .br siblings for servers that serve them directly."""
+    with open(path, "wb") as file:
+        file.write(data)
+    with open(path + ".gz", "wb") as file:
+        file.write(gzip.compress(data, compresslevel=9, mtime=0))
+    if brotli is not None:
+        with open(path + ".br", "wb") as file:
+            file.write(brotli.compress(data, quality=11))
+
+
+def write_payload(out_dir, name, extension, payload):
+    """Write minified JSON under a content-hashed name and return the file name."""
+    data = json.dumps(payload, separators=(",", ":")).encode("utf-8")
+    file_name = f"{name}.{hashlib.sha256(data).hexdigest()[:12]}.{extension}"
+    path = os.path.join(out_dir, file_name)
+    if not os.path.exists(path):
+        precompress(path, data)
+    return file_name, len(data)
+
+
+def encode_boundaries(geo, precision=5, tolerance=0.0):
+    """Rounded GeoJSON and TopoJSON for one entry of RenderTables.GEOGRAPHIES."""
+    with open(boundary_path(geo["geojson_file"]), "r") as file:
+        geojson_data = json.load(file)
+    if tolerance > 0:
+        geojson_data = simplify_topology(geojson_data, tolerance, precision)
+    feature_property = geo["featureidkey"].split(".", 1)[1]
+    rounded = round_geojson(geojson_data, precision, keep_properties=[feature_property])
+    return rounded, to_topojson(rounded, precision)
+
+
+def read_manifest(path=MANIFEST_FILE):
+    if not os.path.exists(path):
+        return None
+    with open(path, "r") as file:
+        return json.load(file)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Build rounded, arc-deduplicated, pre-compressed boundary payloads")
+    parser.add_argument("--precision", type=int, default=5, help="Decimal places kept (5 is about 1 m)")
+    parser.add_argument("--tolerance", type=float, default=0.0, help="Optional simplification tolerance in degrees")
+    parser.add_argument("--out", default=PAYLOAD_DIR)
+    args = parser.parse_args()
+
+    os.makedirs(args.out, exist_ok=True)
+    manifest = {"precision": args.precision, "files": {}}
+
+    print(f"{'Boundary file':<50} {'Raw':>10} {'GeoJSON':>10} {'TopoJSON':>10} {'gzip':>10}")
+    for geo in GEOGRAPHIES:
+        rounded, topology = encode_boundaries(geo, args.precision, args.tolerance)
+        geojson_file, geojson_size = write_payload(args.out, geo["key"], "json", rounded)
+        topojson_file, topojson_size = write_payload(args.out, geo["key"], "topo.json", topology)
+        manifest["files"][geo["geojson_file"]] = {"geojson": geojson_file, "topojson": topojson_file}
+
+        raw_size = os.path.getsize(boundary_source(geo["key"]))
+        gzip_size = os.path.getsize(os.path.join(args.out, topojson_file + ".gz"))
+        print(f"{geo['geojson_file']:<50} {raw_size / 1e3:>8.0f}kB {geojson_size / 1e3:>8.0f}kB "
+              f"{topojson_size / 1e3:>8.0f}kB {gzip_size / 1e3:>8.0f}kB  "
+              f"({count_vertices(rounded):,} vertices, {len(topology['arcs']):,} arcs)")
+
+    with open(os.path.join(args.out, "manifest.json"), "w") as file:
+        json.dump(manifest, file, indent=2)
+    print(f"✅ Saved payloads to {args.out}/ (brotli: {'yes' if brotli else 'not installed, gzip only'})")
@@ -0,0 +1,169 @@
+import argparse
+import glob
+import hashlib
+import os
+import time
+import numpy as np
+import pandas as pd
+from RenderTables import GEOGRAPHIES, MIN_VOTERS, load_stats_table
+
+# Run-to-run changes of the aggregates. Every run stores a snapshot of each geography's render
+# table (location, Muslim_Total, Muslim_Voted) as snapshots/<UTC time, to the microsecond>-<content hash>.npz, unless
+# nothing changed since the latest one. Snapshot files are never rewritten, so the directory is a
+# plain version history (WatchPipeline.py adds to it in place; a failed run only adds a file).
+#
+# For a geography, load_history() stacks all snapshots into snapshot x location matrices with the
+# locations aligned by one searchsorted per snapshot. compare() then takes two rows and computes
+# every delta at once:
+#   Total_Change      change in Muslim voters; "material" when at least MATERIAL_MIN voters and
+#                     MATERIAL_SHARE of the earlier count
+#   Turnout_Change    change in turnout percentage points, with the z score of a two-proportion
+#                     test; "significant" when |z| >= Z_CRITICAL and both counts reach MIN_VOTERS
+#                     (turnout and z are left empty when either count is under MIN_VOTERS, as the
+#                     maps suppress turnout there)
+# Map.py draws the result as a "what changed" layer; this script writes change_report.csv with
+# the flagged areas of the two latest snapshots.
+
+SNAPSHOT_DIR = "snapshots"
+REPORT_FILE = "change_report.csv"
+Z_CRITICAL = 1.96
+MATERIAL_MIN = 10
+MATERIAL_SHARE = 0.05
+
+
+def snapshot_time(path):
+    """Sortable UTC time of a snapshot name; names from before microseconds were added count as .000000."""
+    stamp = os.path.basename(path).split("-")[0].rstrip("Z")
+    return stamp if "." in stamp else stamp + ".000000"
+
+
+def snapshot_paths(directory=SNAPSHOT_DIR):
+    """Snapshot files, oldest first."""
+    return sorted(glob.glob(os.path.join(directory, "*.npz")), key=snapshot_time)
+
+
+def snapshot_label(path):
+    stamp = snapshot_time(path)
+    return f"{stamp[:4]}-{stamp[4:6]}-{stamp[6:8]} {stamp[9:11]}:{stamp[11:13]}:{stamp[13:15]} UTC"
+
+
+def take_snapshot(data_dir=""):
+    """Sorted locations and counts of every geography's render table."""
+    arrays = {}
+    for geo in GEOGRAPHIES:
+        table = load_stats_table(geo["key"], data_dir)[0]
+        table = table[~table.index.duplicated()].sort_index()
+        arrays[f"{geo['key']}_locations"] = table.index.to_numpy(dtype=str)
+        arrays[f"{geo['key']}_total"] = table["Muslim_Total"].to_numpy(dtype=np.int64)
+        arrays[f"{geo['key']}_voted"] = table["Muslim_Voted"].to_numpy(dtype=np.int64)
+    return arrays
+
+
+def snapshot_hash(arrays):
+    digest = hashlib.sha256()
+    for name in sorted(arrays):
+        digest.update(name.encode("utf-8"))
+        digest.update(np.ascontiguousarray(arrays[name]).tobytes())
+    return digest.hexdigest()[:12]
+
+
+def save_snapshot(arrays, directory=SNAPSHOT_DIR):
+    """Write a new snapshot unless the latest one has the same contents; returns its path or None."""
+    content = snapshot_hash(arrays)
+    paths = snapshot_paths(directory)
+    if paths and os.path.basename(paths[-1]).split("-")[1][:-len(".npz")] == content:
+        return None
+    os.makedirs(directory, exist_ok=True)
+    now = time.time_ns()
+    stamp = f"{time.strftime('%Y%m%dT%H%M%S', time.gmtime(now // 10**9))}.{now // 1000 % 10**6:06d}Z"
+    path = os.path.join(directory, f"{stamp}-{content}.npz")
+    temp_file = path + ".tmp"
+    with open(temp_file, "wb") as file:
+        np.savez(file, **arrays)
+    os.replace(temp_file, path)
+    return path
+
+
+def load_history(key, paths):
+    """Snapshot x location matrices of one geography (NaN where a snapshot lacks a location)."""
+    snapshots = []
+    for path in paths:
+        with np.load(path) as s:  # read the three arrays and close the file
+            if f"{key}_locations" in s:
+                snapshots.append((s[f"{key}_locations"], s[f"{key}_total"], s[f"{key}_voted"]))
+            else:
+                snapshots.append((np.array([], dtype=str), None, None))
+    per_snapshot = [names for names, _, _ in snapshots]
+    locations = np.unique(np.concatenate(per_snapshot)) if per_snapshot else np.array([], dtype=str)
+    total = np.full((len(paths), len(locations)), np.nan)
+    voted = np.full((len(paths), len(locations)), np.nan)
+    for i, (names, snapshot_total, snapshot_voted) in enumerate(snapshots):
+        if len(names):
+            columns = np.searchsorted(locations, names)
+            total[i, columns] = snapshot_total
+            voted[i, columns] = snapshot_voted
+    return {"labels": [snapshot_label(p) for p in paths], "locations": locations, "total": total, "voted": voted}
+
+
+def compare(history, before, after, z_critical=Z_CRITICAL):
+    """Deltas of every location between two snapshot rows, with the change flags."""
+    n1, n2 = history["total"][before], history["total"][after]
+    v1, v2 = history["voted"][before], history["voted"][after]
+    with np.errstate(invalid="ignore", divide="ignore"):
+        p1, p2 = v1 / n1, v2 / n2
+        pooled = (v1 + v2) / (n1 + n2)
+        z = (p2 - p1) / np.sqrt(pooled * (1 - pooled) * (1 / n1 + 1 / n2))
+    z = np.where(np.isfinite(z), z, 0.0)
+    shown = (n1 >= MIN_VOTERS) & (n2 >= MIN_VOTERS)
+    p1, p2, z = np.where(shown, p1, np.nan), np.where(shown, p2, np.nan), np.where(shown, z, np.nan)
+    change = n2 - n1
+    material = np.abs(change) >= np.maximum(MATERIAL_MIN, MATERIAL_SHARE * n1)
+    significant = shown & (np.abs(z) >= z_critical)
+    status = np.select(
+        [np.isnan(n1) & ~np.isnan(n2), ~np.isnan(n1) & np.isnan(n2), significant & (z > 0),
+         significant & (z < 0), material],
+        ["New", "Gone", "Turnout up", "Turnout down", "Voter count changed"],
+        default="",
+    )
+    return pd.DataFrame({
+        "Total_Before": n1,
+        "Total_After": n2,
+        "Total_Change": change,
+        "Turnout_Before": (p1 * 100).round(2),
+        "Turnout_After": (p2 * 100).round(2),
+        "Turnout_Change": ((p2 - p1) * 100).round(2),
+        "z": z.round(2),
+        "Material": material,
+        "Significant": significant,
+        "Status": status,
+    }, index=pd.Index(history["locations"], name="location"))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Snapshot the aggregates and report what changed since the last run")
+    parser.add_argument("--directory", default=SNAPSHOT_DIR)
+    parser.add_argument("--z", type=float, default=Z_CRITICAL, help="|z| needed for a significant turnout change")
+    parser.add_argument("--output", default=REPORT_FILE)
+    args = parser.parse_args()
+    start = time.perf_counter()
+
+    # Step 1: Snapshot the current render tables (skipped when identical to the latest)
+    path = save_snapshot(take_snapshot(), args.directory)
+    paths = snapshot_paths(args.directory)
+    print(f"{'New snapshot ' + os.path.basename(path) if path else 'No change since the latest snapshot'}"
+          f" ({len(paths)} snapshots)")
+
+    # Step 2: Flagged areas of every geography between the two latest snapshots
+    reports = []
+    if len(paths) >= 2:
+        for geo in GEOGRAPHIES:
+            changes = compare(load_history(geo["key"], paths[-2:]), 0, 1, args.z)
+            changes = changes[changes["Status"] != ""].reset_index()
+            changes.insert(0, "Geography", geo["title"])
+            reports.append(changes)
+            print(f"{geo['title']:<25} {len(changes):>5} flagged "
+                  f"({int((changes['Status'].str.startswith('Turnout')).sum())} significant turnout changes)")
+    report = pd.concat(reports, ignore_index=True) if reports else pd.DataFrame(columns=["Geography", "location"])
+    report.to_csv(args.output, index=False)
+    print(f"Compared in {time.perf_counter() - start:.2f}s")
+    print(f"✅ Saved to {args.output}")
@@ -0,0 +1,114 @@
+import pandas as pd
+import numpy as np
+import argparse
+import sys
+from VoterDB import read_columns, read_aggregate
+from CityResolution import resolve_city_names
+
+# Cross-geography consistency check. Run after the Step scripts and before
+# Step10_computeMapStats.py / the maps are rebuilt; exits non-zero when a check fails.
+#
+# Every aggregate table is recounted from the voter-level tables in one vectorized pass
+# (factorize + bincount) and compared key by key, the two voter sources are compared to
+# each other, and the rows that land in unassigned buckets ("Invalid", "District not
+# found", blanks) are counted per geography.
+
+UNASSIGNED_KEYS = {"", "nan", "None", "Invalid", "District not found"}
+
+# (voter table, geography column, cleaning, aggregate file, aggregate key column)
+CHECKS = [
+    ("voters", "CountyCode", "none", "MuslimVoterStatsByCountyCode.csv", "CountyCode"),
+    ("voters", "City", "city", "MuslimsPerCityVoting.csv", "City"),
+    ("voters", "School District", "school_district", "MuslimPerSchoolDistrictVoted2.csv", "school_district"),
+    ("voters_with_districts", "Congressional District", "strip", "MuslimsPerCongressionalDistrictVoting.csv", "Congressional District"),
+    ("voters_with_districts", "State Senate District", "strip", "MuslimsPerStateSenateDistrictVoting.csv", "State Senate District"),
+    ("voters_with_districts", "State Assembly District", "strip", "MuslimsPerStateAssemblyDistrictVoting.csv", "State Assembly District"),
+]
+
+
+def clean_keys(values, cleaning):
+    """Same cleaning as the Step scripts, applied to unique values only."""
+    if cleaning == "none":
+        return values
+    text = values.astype(str).str.strip()
+    if cleaning == "city":
+        return resolve_city_names(text)
+    if cleaning == "school_district":
+        # As text (a numeric-looking district read back as a number has no .str), blanks stay blank
+        lower = text.str.lower().where(values.notna(), "")
+        return lower.str.extract(r"(.*?school district)", expand=False).fillna(lower).str.strip().fillna("")
+    return text
+
+
+def geography_counts(voters, column, cleaning, voted):
+    # Factorize once, clean only the unique strings, then count with bincount
+    codes, uniques = pd.factorize(voters[column], use_na_sentinel=False)
+    cleaned = clean_keys(pd.Series(uniques), cleaning)
+    clean_codes, clean_uniques = pd.factorize(cleaned)
+    codes = clean_codes[codes]
+    totals = np.bincount(codes, minlength=len(clean_uniques))
+    voted_counts = np.bincount(codes, weights=voted, minlength=len(clean_uniques)).astype(int)
+    return pd.DataFrame({"key": clean_uniques.astype(str), "Muslim_Total": totals, "Muslim_Voted": voted_counts})
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Check every aggregate against the voter-level tables")
+    parser.add_argument("--max-unassigned", type=float, default=0.05,
+                        help="Fail when more than this share of voters is unassigned in a geography")
+    args = parser.parse_args()
+
+    failures = []
+    sources = {}
+
+    # Step 1: Voter-level totals from both sources
+    for table in ["voters", "voters_with_districts"]:
+        columns = [c for (t, c, _, _, _) in CHECKS if t == table] + ["Voted"]
+        voters = read_columns(table, columns)
+        voted = (voters["Voted"].astype(str).str.lower() == "yes").to_numpy(dtype=np.int64)
+        sources[table] = (voters, voted)
+        print(f"{table}: {len(voters):,} rows, {int(voted.sum()):,} voted")
+
+    status_rows, district_rows = len(sources["voters"][0]), len(sources["voters_with_districts"][0])
+    if status_rows != district_rows:
+        print(f"⚠️ Voter sources differ: voters has {status_rows:,} rows, voters_with_districts has {district_rows:,}")
+    unmatched = int(sources["voters_with_districts"][0]["Voted"].isna().sum())
+    if unmatched:
+        print(f"⚠️ {unmatched:,} CD/LD rows have no matching RegistrantID in the vote-status file")
+
+    # Step 2: Recount every geography and compare key by key with its aggregate table
+    print()
+    print(f"{'Aggregate':<45} {'Total':>10} {'Unassigned':>11} {'Mismatched keys':>16}")
+    for table, column, cleaning, aggregate_file, key_column in CHECKS:
+        voters, voted = sources[table]
+        expected = geography_counts(voters, column, cleaning, voted)
+
+        actual = read_aggregate(aggregate_file)
+        actual["key"] = actual[key_column].astype(str)
+        compared = pd.merge(expected, actual[["key", "Muslim_Total", "Muslim_Voted"]], on="key",
+                            how="outer", suffixes=("_expected", "_actual")).fillna(0)
+        mismatched = compared[
+            (compared["Muslim_Total_expected"] != compared["Muslim_Total_actual"]) |
+            (compared["Muslim_Voted_expected"] != compared["Muslim_Voted_actual"])
+        ]
+
+        unassigned = int(expected.loc[expected["key"].isin(UNASSIGNED_KEYS), "Muslim_Total"].sum())
+        unassigned_share = unassigned / max(len(voters), 1)
+        total = int(actual["Muslim_Total"].sum())
+        print(f"{aggregate_file:<45} {total:>10,} {unassigned:>8,} ({unassigned_share:>4.1%}) {len(mismatched):>10,}")
+
+        if total != len(voters):
+            failures.append(f"{aggregate_file}: Muslim_Total sums to {total:,}, voter table has {len(voters):,}")
+        if len(mismatched):
+            failures.append(f"{aggregate_file}: {len(mismatched):,} keys differ from the voter table, "
+                            f"e.g. {mismatched['key'].head(3).tolist()}")
+        if unassigned_share > args.max_unassigned:
+            failures.append(f"{aggregate_file}: {unassigned_share:.1%} of voters unassigned "
+                            f"(limit {args.max_unassigned:.1%})")
+
+    # Step 3: Fail fast so stale or inconsistent aggregates never reach the maps
+    print()
+    if failures:
+        for failure in failures:
+            print(f"❌ {failure}")
+        sys.exit(1)
+    print("✅ All aggregates are consistent with the voter-level tables")
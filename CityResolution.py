@@ -0,0 +1,222 @@
+import argparse
+import hashlib
+import json
+import os
+import re
+import time
+import unicodedata
+import pandas as pd
+from rapidfuzz import fuzz, process
+from PreprocessBoundaries import PROCESSED_DIR, boundary_path, file_hash
+from RenderTables import GEOGRAPHY_BY_KEY
+from States import STATE, read_county_lookup
+from VoterDB import read_columns
+
+# Resolution of the voter file's City values to the city boundary features (properties.CITY), so
+# spelling variants and postal names stop dropping off the city map. Each distinct City value is
+# resolved once, in this order:
+#   exact           the title-cased value is a feature name (what Step2 relied on before)
+#   alias           city_aliases.csv (alias -> feature), e.g. postal names of city neighborhoods
+#   normalized      same name after normalization (accents, punctuation, St/Mt/Ft, "City of")
+#   fuzzy           RapidFuzz ratio >= FUZZY_CUTOFF against the normalized names of the features
+#                   lying in the county most of the value's voters are registered in (a feature's
+#                   county is the county boundary holding its representative point), so e.g. San
+#                   Martin (Santa Clara County) cannot become San Marino (Los Angeles County)
+#   cdp             the same steps against the state's Census Designated Places, when States.py
+#                   lists a "places" boundary file
+#   county          otherwise an unincorporated place: mapped to the county most of its voters
+#                   are registered in, so it is still counted on the county map
+# The table is saved as city_resolution.csv. Rows are reused while the aliases, boundaries and
+# settings are unchanged, so a rerun only resolves (and fuzzy-matches) City values it has not
+# seen. Step2, Step9, CheckConsistency.py and Crosswalks.py key cities by resolve_city_names().
+
+RESOLUTION_FILE = "city_resolution.csv"
+ALIAS_FILE = "city_aliases.csv"
+FUZZY_CUTOFF = 90
+MIN_FUZZY_LENGTH = 5  # shorter names match too many others
+CITY_METHODS = ["exact", "alias", "normalized", "fuzzy"]
+ABBREVIATIONS = {"ST": "SAINT", "STE": "SAINTE", "MT": "MOUNT", "FT": "FORT", "PT": "POINT"}
+
+
+def normalize_city(name):
+    text = unicodedata.normalize("NFKD", str(name)).encode("ascii", "ignore").decode().upper()
+    text = re.sub(r"[^A-Z0-9]+", " ", text).strip()
+    text = re.sub(r"^(CITY|TOWN) OF ", "", text)
+    return " ".join(ABBREVIATIONS.get(word, word) for word in text.split())
+
+
+def feature_names(path, key_property):
+    with open(path, "r") as file:
+        features = json.load(file)["features"]
+    return sorted({str(f["properties"][key_property]).strip() for f in features
+                   if f["properties"].get(key_property) is not None})
+
+
+def layer_boundary(key):
+    """A layer's boundary file and the property holding the feature name."""
+    path = boundary_path(GEOGRAPHY_BY_KEY[key]["geojson_file"])
+    if os.path.dirname(path) == PROCESSED_DIR:
+        return path, GEOGRAPHY_BY_KEY[key]["featureidkey"].split(".", 1)[1]
+    return path, STATE["boundaries"][key]["key_property"]
+
+
+def feature_counties(path, key_property):
+    """Feature name -> normalized name of the county boundary holding the feature's
+    representative point (features outside every county are left out)."""
+    import geopandas as gpd  # only needed when resolving, not by resolve_city_names
+
+    county_path, county_property = layer_boundary("county")
+    features = gpd.read_file(path)[[key_property, "geometry"]].rename(columns={key_property: "name"})
+    features = features[features["name"].notna() & features.geometry.notna()]
+    counties = gpd.read_file(county_path)[[county_property, "geometry"]].rename(columns={county_property: "county"})
+    points = features.set_geometry(features.representative_point())
+    joined = gpd.sjoin(points, counties.to_crs(points.crs), how="inner", predicate="within")
+    joined = joined.drop_duplicates("name")
+    return dict(zip(joined["name"].astype(str).str.strip(), joined["county"].map(normalize_city)))
+
+
+class NameMatcher:
+    """Normalized lookup of a name among one layer's feature names, and fuzzy lookup among the
+    features of one county."""
+
+    def __init__(self, names, counties):
+        self.names = set(names)
+        self.by_normalized = {}
+        self.choices = {}  # normalized county -> normalized feature names in it
+        for name in names:
+            normalized = normalize_city(name)
+            if self.by_normalized.setdefault(normalized, name) == name and name in counties:
+                self.choices.setdefault(counties[name], []).append(normalized)
+
+    def match(self, normalized, county):
+        if normalized in self.by_normalized:
+            return self.by_normalized[normalized], "normalized", 100.0
+        choices = self.choices.get(normalize_city(county))
+        if len(normalized) >= MIN_FUZZY_LENGTH and choices:
+            best = process.extractOne(normalized, choices, scorer=fuzz.ratio, score_cutoff=FUZZY_CUTOFF)
+            if best is not None:
+                return self.by_normalized[best[0]], "fuzzy", round(best[1], 1)
+        return None
+
+
+def resolve_place(city, county, cities, places, aliases):
+    """(resolved name, method, score) of one title-cased City value, given the county most of
+    its voters are registered in."""
+    if city in cities.names:
+        return city, "exact", 100.0
+    normalized = normalize_city(city)
+    if aliases.get(normalized) in cities.names:
+        return aliases[normalized], "alias", 100.0
+    match = cities.match(normalized, county)
+    if match is not None:
+        return match
+    if places is not None:
+        match = places.match(normalized, county)
+        if match is not None:
+            return match[0], "cdp", match[2]
+    return county, "county", None
+
+
+def read_aliases(path=ALIAS_FILE):
+    if not os.path.exists(path):
+        return {}
+    aliases = pd.read_csv(path, dtype=str).dropna()
+    return dict(zip(aliases["alias"].map(normalize_city), aliases["city"].str.strip()))
+
+
+_resolution = {}
+
+
+def read_resolution(path=RESOLUTION_FILE):
+    """City value -> city feature name, for the values that resolved to a city (cached by mtime)."""
+    if not os.path.exists(path):
+        return {}
+    mtime = os.path.getmtime(path)
+    if _resolution.get("mtime") != mtime:
+        table = pd.read_csv(path, dtype={"City": str, "Resolved": str}, keep_default_na=False)
+        table = table[table["Method"].isin(CITY_METHODS)]
+        _resolution.update(mtime=mtime, names=dict(zip(table["City"], table["Resolved"])))
+    return _resolution["names"]
+
+
+def resolve_city_names(values):
+    """Title-case City values (the Step2 cleaning) and replace the resolved ones by their feature
+    name; a dict lookup per value, values not in the table stay title-cased."""
+    cleaned = values.astype(str).str.strip().str.title()
+    names = read_resolution()
+    if not names:
+        return cleaned
+    return cleaned.map(names).fillna(cleaned)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Resolve voter City values to city boundary features")
+    parser.add_argument("--aliases", default=ALIAS_FILE)
+    parser.add_argument("--output", default=RESOLUTION_FILE)
+    parser.add_argument("--rebuild", action="store_true", help="Resolve every value again")
+    args = parser.parse_args()
+    start = time.perf_counter()
+
+    # Step 1: Distinct City values with their voter count and most common county
+    voters = read_columns("voters", ["City", "CountyCode"])
+    voters["City"] = voters["City"].astype(str).str.strip().str.title()
+    lookup = read_county_lookup()
+    county_names = dict(zip(lookup["CountyCode"], lookup["County_Name"].str.strip().str.title()))
+    places = (voters.groupby(["City", "CountyCode"]).size().reset_index(name="Voters")
+              .sort_values(["City", "Voters"], ascending=[True, False]))
+    counts = places.groupby("City")["Voters"].sum()
+    places = places.drop_duplicates("City").set_index("City")
+    places["County"] = places["CountyCode"].map(county_names).fillna("")
+    places["Voters"] = counts
+
+    # Step 2: Reuse earlier rows resolved against the same aliases, boundaries and settings
+    city_path, city_property = layer_boundary("city")
+    county_path, county_property = layer_boundary("county")
+    place_config = STATE.get("places")
+    settings = {"fuzzy_cutoff": FUZZY_CUTOFF, "min_fuzzy_length": MIN_FUZZY_LENGTH, "places": place_config,
+                "fuzzy_scope": "county",
+                "boundary": file_hash(city_path, {"property": city_property}),
+                "county_boundary": file_hash(county_path, {"property": county_property}),
+                "aliases": file_hash(args.aliases, {}) if os.path.exists(args.aliases) else None}
+    source = hashlib.sha256(json.dumps(settings, sort_keys=True).encode("utf-8")).hexdigest()[:16]
+    previous = pd.DataFrame()
+    if os.path.exists(args.output) and not args.rebuild:
+        previous = pd.read_csv(args.output, dtype={"City": str, "Resolved": str}, keep_default_na=False)
+        previous = previous[previous["Source"] == source].set_index("City")
+
+    # Step 3: Resolve only the values not resolved before
+    cities = NameMatcher(feature_names(city_path, city_property), feature_counties(city_path, city_property))
+    cdps = None
+    if place_config:
+        cdps = NameMatcher(feature_names(place_config["file"], place_config["key_property"]),
+                           feature_counties(place_config["file"], place_config["key_property"]))
+    aliases = read_aliases(args.aliases)
+    new = places.index.difference(previous.index)
+    resolved = pd.DataFrame(
+        [resolve_place(city, places.at[city, "County"], cities, cdps, aliases) for city in new],
+        index=new, columns=["Resolved", "Method", "Score"])
+    if len(previous):
+        resolved = pd.concat([previous.loc[previous.index.intersection(places.index), ["Resolved", "Method", "Score"]],
+                              resolved])
+    table = places[["County", "Voters"]].join(resolved)
+    table["Source"] = source
+    table.index.name = "City"
+    table = table.reset_index()[["City", "Resolved", "Method", "Score", "County", "Voters", "Source"]]
+
+    temp_file = args.output + ".tmp"
+    table.to_csv(temp_file, index=False)
+    os.replace(temp_file, args.output)
+
+    # Step 4: How many voters land on a city feature now
+    by_method = table.groupby("Method")["Voters"].agg(["size", "sum"])
+    total = max(int(table["Voters"].sum()), 1)
+    print(f"{'Method':<12} {'Values':>8} {'Voters':>10} {'Share':>7}")
+    for method in CITY_METHODS + ["cdp", "county"]:
+        if method in by_method.index:
+            values, voters_count = by_method.loc[method]
+            print(f"{method:<12} {values:>8,} {voters_count:>10,} {voters_count / total:>7.1%}")
+    exact = int(by_method["sum"].get("exact", 0))
+    on_map = int(table.loc[table["Method"].isin(CITY_METHODS), "Voters"].sum())
+    print(f"City map coverage: {exact / total:.1%} exact only -> {on_map / total:.1%} resolved "
+          f"({len(new):,} new values resolved in {time.perf_counter() - start:.1f}s)")
+    print(f"✅ Saved to {args.output}")
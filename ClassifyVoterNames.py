@@ -0,0 +1,182 @@
+import argparse
+import os
+import pickle
+import re
+import time
+import unicodedata
+from concurrent.futures import ProcessPoolExecutor
+import pandas as pd
+from PreprocessBoundaries import file_hash
+
+# Select likely Muslim registrants from the full state voter roll by first and last name, and
+# write them in the schema the Step scripts read (muslim_voters_with_vote_status.csv: every
+# column of the roll, only the selected rows).
+#
+#   1. lexicon      muslim_name_lexicon.csv (name, part = first/last, weight) is compiled once
+#                   into hash maps from every normalized spelling and its transliteration variants
+#                   to its weight (Mohammed / Mohamed / Mohammad ...) and cached in name_lexicon.pkl.
+#                   A variant is one substitution away from a lexicon spelling (substitutions are
+#                   not chained, which drifted e.g. MARYAM -> MARIAM -> MIRIAM), and never a name
+#                   on name_variant_denylist.csv (common names that are not in the lexicon, e.g.
+#                   ELI, one substitution from ALI); other spellings go in the lexicon itself.
+#   2. dedupe       the roll is streamed in chunks; only names not seen in an earlier chunk are
+#                   scored, so the ~22M rows come down to the few million distinct names
+#   3. scoring      new names are split into batches across a process pool; a name's weight is
+#                   the best weight of its tokens (hyphens, spaces, an Al-/El- prefix)
+#   4. selection    first-name weight + last-name weight >= --threshold
+# Normalization: accents stripped, upper case, letters only, doubled letters collapsed.
+
+ROLL_FILE = "state_voter_roll.csv"
+OUTPUT_FILE = "muslim_voters_with_vote_status.csv"
+LEXICON_FILE = "muslim_name_lexicon.csv"
+COMPILED_LEXICON_FILE = "name_lexicon.pkl"
+DENYLIST_FILE = "name_variant_denylist.csv"
+REQUIRED_COLUMNS = ["RegistrantID", "CountyCode", "City", "School District", "Voted"]
+
+# Spelling alternatives of transliterated names, applied both ways to each occurrence
+TRANSLITERATIONS = [
+    ("OU", "U"), ("OO", "U"), ("EE", "I"), ("O", "U"), ("E", "A"), ("E", "I"),
+    ("Q", "K"), ("PH", "F"), ("DH", "D"), ("TH", "T"), ("Y", "I"), ("AI", "AY"), ("IA", "YA"),
+]
+NAME_PREFIXES = ("AL", "EL")
+
+
+def normalize_name(name):
+    text = unicodedata.normalize("NFKD", str(name)).encode("ascii", "ignore").decode().upper()
+    text = re.sub(r"[^A-Z]+", " ", text)
+    return re.sub(r"([A-Z])\1+", r"\1", text).strip()
+
+
+def name_variants(name, denylist=frozenset()):
+    """The normalized lexicon spelling and its variants with one substitution of one occurrence,
+    leaving out names on the denylist."""
+    variants = [name]
+    for a, b in TRANSLITERATIONS:
+        for old, new in ((a, b), (b, a)):
+            for match in re.finditer(old, name):
+                variant = re.sub(r"([A-Z])\1+", r"\1", name[:match.start()] + new + name[match.end():])
+                if variant not in variants and variant not in denylist:
+                    variants.append(variant)
+    # Trailing H is optional (Fatimah / Fatima)
+    optional_h = [v[:-1] if v.endswith("AH") else v + "H" for v in variants if v.endswith(("A", "AH"))]
+    return variants + [v for v in optional_h if v not in variants and v not in denylist]
+
+
+def read_denylist(path=DENYLIST_FILE):
+    if not os.path.exists(path):
+        return frozenset()
+    return frozenset(pd.read_csv(path, dtype=str)["name"].dropna().map(normalize_name))
+
+
+def compile_lexicon(path=LEXICON_FILE, denylist_path=DENYLIST_FILE):
+    """{'first': {variant: weight}, 'last': {...}}, read from the compiled cache when current."""
+    denylist = read_denylist(denylist_path)
+    source_hash = file_hash(path, {"transliterations": TRANSLITERATIONS, "depth": 1, "denylist": sorted(denylist)})
+    if os.path.exists(COMPILED_LEXICON_FILE):
+        with open(COMPILED_LEXICON_FILE, "rb") as file:
+            compiled = pickle.load(file)
+        if compiled["source_hash"] == source_hash:
+            return compiled
+
+    compiled = {"source_hash": source_hash, "first": {}, "last": {}}
+    lexicon = pd.read_csv(path, dtype={"name": str, "part": str})
+    lexicon["normalized"] = lexicon["name"].map(normalize_name)
+    lexicon = lexicon.sort_values("weight", ascending=False)
+    # Spellings in the lexicon first, then variants that do not collide with one of them
+    for part, entries in lexicon.groupby("part"):
+        weights = compiled[part]
+        for name, weight in zip(entries["normalized"], entries["weight"].astype(float)):
+            weights.setdefault(name, weight)
+        for name, weight in zip(entries["normalized"], entries["weight"].astype(float)):
+            for variant in name_variants(name, denylist):
+                weights.setdefault(variant, weight)
+    with open(COMPILED_LEXICON_FILE + ".tmp", "wb") as file:
+        pickle.dump(compiled, file, protocol=pickle.HIGHEST_PROTOCOL)
+    os.replace(COMPILED_LEXICON_FILE + ".tmp", COMPILED_LEXICON_FILE)
+    return compiled
+
+
+def name_weight(weights, name):
+    best = 0.0
+    for token in normalize_name(name).split():
+        weight = weights.get(token, 0.0)
+        if weight == 0.0 and token.startswith(NAME_PREFIXES) and len(token) > 4:
+            weight = weights.get(token[2:], 0.0)
+        best = max(best, weight)
+    return best
+
+
+_lexicon = None
+
+
+def init_worker(lexicon):
+    global _lexicon
+    _lexicon = lexicon
+
+
+def score_batch(part, names):
+    """Runs in a worker process: the weight of every distinct raw name of one part."""
+    weights = _lexicon[part]
+    return part, [(name, name_weight(weights, name)) for name in names]
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Select likely Muslim registrants from the state voter roll by name")
+    parser.add_argument("--input", default=ROLL_FILE)
+    parser.add_argument("--output", default=OUTPUT_FILE)
+    parser.add_argument("--lexicon", default=LEXICON_FILE)
+    parser.add_argument("--denylist", default=DENYLIST_FILE, help="Names a transliteration variant may not take")
+    parser.add_argument("--first-column", default="FirstName")
+    parser.add_argument("--last-column", default="LastName")
+    parser.add_argument("--threshold", type=float, default=1.0, help="Minimum first + last name weight")
+    parser.add_argument("--chunksize", type=int, default=1_000_000)
+    parser.add_argument("--batch-size", type=int, default=20_000, help="Distinct names per worker task")
+    parser.add_argument("--workers", type=int, default=None)
+    args = parser.parse_args()
+    start = time.perf_counter()
+
+    header = pd.read_csv(args.input, nrows=0).columns
+    missing = [c for c in REQUIRED_COLUMNS + [args.first_column, args.last_column] if c not in header]
+    if missing:
+        parser.error(f"{args.input} has no column(s) {', '.join(missing)}")
+
+    # Step 1: Compiled lexicon (hash maps of all transliteration variants)
+    lexicon = compile_lexicon(args.lexicon, args.denylist)
+    print(f"Lexicon: {len(lexicon['first']):,} first / {len(lexicon['last']):,} last name variants")
+
+    # Step 2: Stream the roll; score each distinct name once, across the pool; keep matches
+    scores = {"first": {}, "last": {}}
+    rows, selected, scoring_seconds = 0, 0, 0.0
+    temp_file = args.output + ".tmp"
+    pd.DataFrame(columns=header).to_csv(temp_file, index=False)
+    with ProcessPoolExecutor(args.workers, initializer=init_worker, initargs=(lexicon,)) as pool:
+        for chunk in pd.read_csv(args.input, dtype={"RegistrantID": str}, chunksize=args.chunksize,
+                                 keep_default_na=False, na_values=[""]):
+            scoring_start = time.perf_counter()
+            tasks = []
+            for part, column in (("first", args.first_column), ("last", args.last_column)):
+                names = chunk[column].fillna("").astype(str)
+                new_names = [n for n in names.unique() if n not in scores[part]]
+                tasks += [pool.submit(score_batch, part, new_names[j:j + args.batch_size])
+                          for j in range(0, len(new_names), args.batch_size)]
+            for task in tasks:
+                part, results = task.result()
+                scores[part].update(results)
+            scoring_seconds += time.perf_counter() - scoring_start
+
+            first = chunk[args.first_column].fillna("").astype(str).map(scores["first"])
+            last = chunk[args.last_column].fillna("").astype(str).map(scores["last"])
+            matches = chunk[(first + last) >= args.threshold]
+            matches.to_csv(temp_file, mode="a", header=False, index=False)
+            rows += len(chunk)
+            selected += len(matches)
+            print(f"   {rows:>12,} rows read, {selected:,} selected")
+    os.replace(temp_file, args.output)
+
+    # Step 3: Throughput report
+    elapsed = time.perf_counter() - start
+    print(f"Distinct names:    {len(scores['first']):,} first, {len(scores['last']):,} last "
+          f"(scored in {scoring_seconds:.1f}s)")
+    print(f"Selected:          {selected:,} of {rows:,} registrants ({selected / max(rows, 1):.2%})")
+    print(f"Total time:        {elapsed:.1f}s ({rows / max(elapsed, 1e-9):,.0f} rows/s)")
+    print(f"✅ Saved to {args.output}")
@@ -0,0 +1,114 @@
+import argparse
+import itertools
+import os
+import time
+import numpy as np
+import pandas as pd
+from RenderTables import GEOGRAPHIES
+from CheckConsistency import CHECKS, clean_keys
+from VoterDB import voter_geographies
+
+# Sparse crosswalks between every pair of the six geographies, so "how many voters of this
+# city are in CD 10 vs CD 17" or re-aggregating a measure onto another boundary set is an
+# array operation instead of another groupby over the voter file.
+#
+# crosswalks.npz holds, per geography, the labels (same keys as the aggregate files) and, per
+# pair, a COO matrix of voter counts: <a>__<b>_rows, _cols, _total, _voted (only cells with voters).
+# Voters without a row in voters_with_districts get a blank legislative district.
+
+CROSSWALK_FILE = "crosswalks.npz"
+GEOGRAPHY_KEYS = [geo["key"] for geo in GEOGRAPHIES]
+
+
+def key_labels(keys):
+    """Cleaned keys as label strings; numeric codes go through Int64 first, so a CountyCode read as
+    float (the column has a blank) is labelled "6" like the aggregate files, not "6.0"."""
+    if pd.api.types.is_numeric_dtype(keys):
+        keys = keys.astype("Int64")
+    return keys.astype(str).replace({"nan": "", "None": "", "<NA>": ""})
+
+
+def load_crosswalks(path=CROSSWALK_FILE):
+    if not os.path.exists(path):
+        return None
+    with np.load(path, allow_pickle=False) as store:
+        return {name: store[name] for name in store.files}
+
+
+def labels(crosswalks, geography):
+    return crosswalks[f"labels_{geography}"]
+
+
+def crosswalk(crosswalks, source, target, measure="total"):
+    """(rows, cols, values) of the source x target matrix; measure is 'total' or 'voted'."""
+    if GEOGRAPHY_KEYS.index(source) < GEOGRAPHY_KEYS.index(target):
+        prefix = f"{source}__{target}"
+        return crosswalks[prefix + "_rows"], crosswalks[prefix + "_cols"], crosswalks[f"{prefix}_{measure}"]
+    prefix = f"{target}__{source}"
+    return crosswalks[prefix + "_cols"], crosswalks[prefix + "_rows"], crosswalks[f"{prefix}_{measure}"]
+
+
+def reaggregate(crosswalks, source, target, values):
+    """Move a per-source measure (Series indexed by source label) onto the target geography,
+    splitting each source value by its voters' share in every target area."""
+    rows, cols, counts = crosswalk(crosswalks, source, target)
+    source_labels, target_labels = labels(crosswalks, source), labels(crosswalks, target)
+    source_values = pd.Series(values).reindex(source_labels).fillna(0).to_numpy(dtype=float)
+    source_totals = np.bincount(rows, weights=counts, minlength=len(source_labels))
+    shares = counts / source_totals[rows]
+    result = np.bincount(cols, weights=source_values[rows] * shares, minlength=len(target_labels))
+    return pd.Series(result, index=target_labels)
+
+
+def crosstab(crosswalks, source, target, source_values=None):
+    """Voters, voted and turnout of every (source, target) pair, optionally for some source labels."""
+    rows, cols, totals = crosswalk(crosswalks, source, target, "total")
+    _, _, voted = crosswalk(crosswalks, source, target, "voted")
+    source_labels, target_labels = labels(crosswalks, source), labels(crosswalks, target)
+    if source_values is not None:
+        wanted = np.isin(source_labels[rows], np.asarray(source_values, dtype=str))
+        rows, cols, totals, voted = rows[wanted], cols[wanted], totals[wanted], voted[wanted]
+    table = pd.DataFrame({
+        source: source_labels[rows],
+        target: target_labels[cols],
+        "Muslim_Total": totals,
+        "Muslim_Voted": voted,
+    })
+    table["Muslim_Voted_Percent"] = (table["Muslim_Voted"] / table["Muslim_Total"] * 100).round(2)
+    return table.sort_values([source, "Muslim_Total"], ascending=[True, False], ignore_index=True)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Build sparse crosswalks between every pair of geographies")
+    parser.parse_args()
+    start = time.perf_counter()
+
+    # Step 1: One geography code per voter and geography (keys cleaned like the Step scripts)
+    voters = voter_geographies()
+    voted = (voters["Voted"].astype(str).str.lower() == "yes").to_numpy(dtype=np.int64)
+    store = {}
+    codes = {}
+    for geo in GEOGRAPHIES:
+        _, column, cleaning, _, _ = next(c for c in CHECKS if c[3] == geo["data_file"])
+        raw_codes, uniques = pd.factorize(voters[column], use_na_sentinel=False)
+        cleaned = key_labels(clean_keys(pd.Series(uniques), cleaning))
+        clean_codes, clean_uniques = pd.factorize(cleaned)
+        codes[geo["key"]] = clean_codes[raw_codes]
+        store[f"labels_{geo['key']}"] = np.asarray(clean_uniques, dtype=str)
+
+    # Step 2: Voter and voted counts for every pair, only the non-empty cells (COO)
+    for source, target in itertools.combinations(GEOGRAPHY_KEYS, 2):
+        num_targets = len(store[f"labels_{target}"])
+        pair = codes[source].astype(np.int64) * num_targets + codes[target]
+        cells, inverse = np.unique(pair, return_inverse=True)
+        prefix = f"{source}__{target}"
+        store[prefix + "_rows"] = (cells // num_targets).astype(np.int32)
+        store[prefix + "_cols"] = (cells % num_targets).astype(np.int32)
+        store[prefix + "_total"] = np.bincount(inverse, minlength=len(cells)).astype(np.int64)
+        store[prefix + "_voted"] = np.bincount(inverse, weights=voted, minlength=len(cells)).astype(np.int64)
+        print(f"{source:>24} x {target:<24} {len(cells):>8,} non-empty cells")
+
+    temp_file = CROSSWALK_FILE + ".tmp.npz"
+    np.savez_compressed(temp_file, **store)
+    os.replace(temp_file, CROSSWALK_FILE)
+    print(f"✅ Saved to {CROSSWALK_FILE} ({len(voters):,} voters) in {time.perf_counter() - start:.1f}s")
@@ -0,0 +1,89 @@
+import argparse
+import json
+import os
+import pickle
+import time
+
+# One pre-built binary file with everything Map.py / MapVoting.py read at startup:
+#   aggregates   the six aggregate tables (plus per-election slices), by file name
+#   stats        precomputed render tables and class breaks, by (data_dir, geography)
+#   geojson      boundary GeoJSON (simplified once, by PreprocessBoundaries.py), by file name
+#   drilldown    DrilldownIndex.json
+# The apps load it with a single read; without it they fall back to the database and files.
+# The file starts with the modification time of every source the bundle was built from; a bundle
+# whose sources changed since (a step rerun without rebuilding it) is ignored, so the apps never
+# show stale data.
+
+BUNDLE_FILE = os.environ.get("DASHBOARD_BUNDLE", "dashboard_bundle.pkl")
+ARTIFACTS_VERSION_FILE = "artifacts_version.json"  # bumped by WatchPipeline.py after a hot swap
+
+
+def read_artifacts_version(path=ARTIFACTS_VERSION_FILE):
+    """Cheap change token for the dashboards (0 before the first hot swap)."""
+    try:
+        return os.stat(path).st_mtime_ns
+    except FileNotFoundError:
+        return 0
+
+
+def source_stamps(paths):
+    return {path: os.stat(path).st_mtime_ns if os.path.exists(path) else None for path in paths}
+
+
+def read_bundle(path=BUNDLE_FILE):
+    """The bundle, or None when it is missing or out of date with its sources."""
+    if not os.path.exists(path):
+        return None
+    with open(path, "rb") as file:
+        sources = pickle.load(file)
+        if not isinstance(sources, dict) or "aggregates" in sources or sources != source_stamps(sources):
+            return None  # written by an older version, or a source changed since it was built
+        return pickle.load(file)
+
+
+if __name__ == "__main__":
+    from RenderTables import GEOGRAPHIES, RENDER_DIR, load_stats_table
+    from VoterDB import DB_FILE, read_aggregate
+    from GeometryTools import count_vertices
+    from PreprocessBoundaries import boundary_path
+
+    parser = argparse.ArgumentParser(description="Build the dashboard startup bundle")
+    args = parser.parse_args()
+    start = time.perf_counter()
+
+    data_dirs = [""]
+    if os.path.exists("history/elections.json"):
+        with open("history/elections.json", "r") as file:
+            data_dirs += [os.path.join("history", e["folder"], "") for e in json.load(file)]
+
+    bundle = {"aggregates": {}, "stats": {}, "geojson": {}, "drilldown": None}
+    sources = [DB_FILE, "DrilldownIndex.json"]
+
+    # Step 1: Aggregates and precomputed render tables for every election slice
+    for data_dir in data_dirs:
+        for geo in GEOGRAPHIES:
+            bundle["aggregates"][data_dir + geo["data_file"]] = read_aggregate(data_dir + geo["data_file"])
+            bundle["stats"][(data_dir, geo["key"])] = load_stats_table(geo["key"], data_dir)
+            sources += [data_dir + geo["data_file"], os.path.join(RENDER_DIR, data_dir + f"{geo['key']}.csv")]
+        sources.append(os.path.join(RENDER_DIR, data_dir + "class_breaks.json"))
+
+    # Step 2: Boundaries, as preprocessed (already simplified; a second pass would move shared borders apart)
+    for geo in GEOGRAPHIES:
+        sources.append(boundary_path(geo["geojson_file"]))
+        with open(boundary_path(geo["geojson_file"]), "r") as file:
+            geojson_data = json.load(file)
+        bundle["geojson"][geo["geojson_file"]] = geojson_data
+        print(f"{geo['geojson_file']}: {count_vertices(geojson_data):,} vertices")
+
+    if os.path.exists("DrilldownIndex.json"):
+        with open("DrilldownIndex.json", "r") as file:
+            bundle["drilldown"] = json.load(file)
+
+    # Step 3: Write atomically so a running dashboard never reads a half-written bundle
+    temp_file = BUNDLE_FILE + ".tmp"
+    with open(temp_file, "wb") as file:
+        pickle.dump(source_stamps(sources), file, protocol=pickle.HIGHEST_PROTOCOL)
+        pickle.dump(bundle, file, protocol=pickle.HIGHEST_PROTOCOL)
+    os.replace(temp_file, BUNDLE_FILE)
+    print(f"✅ Saved to {BUNDLE_FILE} ({os.path.getsize(BUNDLE_FILE) / 1e6:.1f} MB) "
+          f"in {time.perf_counter() - start:.1f}s")
@@ -0,0 +1,180 @@
+import argparse
+import os
+import time
+import numpy as np
+import pandas as pd
+from RenderTables import GEOGRAPHY_BY_KEY, load_stats_table, stats_source
+from PreprocessBoundaries import boundary_path, file_hash
+
+# Dot-density layers: one dot per --per-dot Muslim voters, placed at random inside its school
+# district or city, so big sparse areas no longer look heavier than small dense ones.
+#
+# Every polygon part is Delaunay-triangulated (shapely, which geopandas brings in). A layer's
+# dots are then drawn for all features at once, in rounds:
+#   1. pick a triangle of the feature, weighted by area (one searchsorted over the cumulative areas)
+#   2. a uniform point in that triangle (two random numbers, folded back into the triangle)
+#   3. keep it if it is inside the part the triangle came from (shapely.contains_xy); the
+#      triangles cover each part's convex hull, so this rejects the concave bits and holes
+# until every feature has its dots. Dots are colored voted / not voted; features with
+# suppressed turnout (Step10) get neutral dots only. The RNG is seeded per layer, so the same
+# inputs always give the same map.
+#
+# dots/<layer>.npz holds lon, lat (float32) and category (uint8) plus a hash of the boundary
+# file, render table and settings; an unchanged layer is not regenerated.
+
+DOT_DIR = "dots"
+DOT_LAYERS = ["school_district", "city"]
+DOT_CATEGORIES = ["Did not vote", "Voted", "Turnout suppressed"]
+
+
+def dot_path(key):
+    return os.path.join(DOT_DIR, f"{key}.npz")
+
+
+def load_dots(key):
+    path = dot_path(key)
+    if not os.path.exists(path):
+        return None
+    with np.load(path, allow_pickle=False) as store:
+        return {name: store[name] for name in ("lon", "lat", "category")}
+
+
+def triangulate(parts):
+    """Delaunay triangles of every part: (T, 3, 2) corners and the part index of each triangle."""
+    import shapely
+
+    triangles, part_index = shapely.get_parts(shapely.delaunay_triangles(parts), return_index=True)
+    corners = shapely.get_coordinates(triangles).reshape(len(triangles), 4, 2)[:, :3]
+    return corners, part_index
+
+
+def sample_points(rng, parts, part_feature, counts, max_rounds=50):
+    """counts[i] uniform random points inside feature i (the union of its parts).
+    Returns lon, lat and the feature of every point, grouped by feature."""
+    import shapely
+
+    if not len(parts) or not np.any(counts):  # e.g. a layer or category without voters
+        return np.empty(0), np.empty(0), np.empty(0, dtype=np.int64), 0
+    corners, triangle_part = triangulate(parts)
+    a, b, c = corners[:, 0], corners[:, 1], corners[:, 2]
+    areas = 0.5 * np.abs((b[:, 0] - a[:, 0]) * (c[:, 1] - a[:, 1]) - (c[:, 0] - a[:, 0]) * (b[:, 1] - a[:, 1]))
+    triangle_feature = part_feature[triangle_part]
+    order = np.argsort(triangle_feature, kind="stable")
+    a, b, c, areas, triangle_part, triangle_feature = (
+        a[order], b[order], c[order], areas[order], triangle_part[order], triangle_feature[order])
+
+    num_features = len(counts)
+    cumulative = np.cumsum(areas)
+    feature_end = np.searchsorted(triangle_feature, np.arange(num_features), side="right")
+    feature_start = np.concatenate([[0], feature_end[:-1]])
+    has_area = feature_end > feature_start
+    area_end = np.where(has_area, cumulative[np.maximum(feature_end - 1, 0)], 0)
+    area_start = np.where(feature_start > 0, cumulative[np.maximum(feature_start - 1, 0)], 0)
+    hull_area = area_end - area_start
+    part_area = np.bincount(part_feature, weights=shapely.area(parts), minlength=num_features)
+    acceptance = np.clip(np.divide(part_area, hull_area, out=np.zeros(num_features), where=hull_area > 0), 0.05, 1)
+
+    remaining = np.where(has_area, counts, 0).astype(np.int64)
+    lon, lat, feature = [np.empty(0)], [np.empty(0)], [np.empty(0, dtype=np.int64)]
+    attempts = 0
+    for _ in range(max_rounds):
+        if not remaining.any():
+            break
+        draws = np.ceil(remaining / acceptance * 1.1).astype(np.int64) + (remaining > 0)
+        wanted_feature = np.repeat(np.arange(num_features), draws)
+        attempts += len(wanted_feature)
+
+        # 1. area-weighted triangle of the feature
+        u = area_start[wanted_feature] + rng.random(len(wanted_feature)) * hull_area[wanted_feature]
+        t = np.clip(np.searchsorted(cumulative, u, side="right"),
+                    feature_start[wanted_feature], feature_end[wanted_feature] - 1)
+        # 2. uniform point in the triangle
+        r1, r2 = rng.random(len(t)), rng.random(len(t))
+        flip = r1 + r2 > 1
+        r1, r2 = np.where(flip, 1 - r1, r1), np.where(flip, 1 - r2, r2)
+        x = a[t, 0] + r1 * (b[t, 0] - a[t, 0]) + r2 * (c[t, 0] - a[t, 0])
+        y = a[t, 1] + r1 * (b[t, 1] - a[t, 1]) + r2 * (c[t, 1] - a[t, 1])
+        # 3. rejection against the part, then at most `remaining` per feature
+        inside = shapely.contains_xy(parts[triangle_part[t]], x, y)
+        accepted = np.cumsum(inside)
+        before = np.concatenate([[0], accepted])[np.cumsum(draws) - draws]
+        rank = accepted - np.repeat(before, draws)
+        keep = inside & (rank <= remaining[wanted_feature])
+        lon.append(x[keep])
+        lat.append(y[keep])
+        feature.append(wanted_feature[keep])
+        remaining -= np.bincount(wanted_feature[keep], minlength=num_features)
+
+    lon, lat, feature = np.concatenate(lon), np.concatenate(lat), np.concatenate(feature)
+    order = np.argsort(feature, kind="stable")
+    return lon[order], lat[order], feature[order], attempts
+
+
+def build_layer(key, per_dot, seed):
+    import geopandas as gpd
+    import shapely
+
+    geo = GEOGRAPHY_BY_KEY[key]
+    gdf = gpd.read_file(boundary_path(geo["geojson_file"]))
+    table, _ = load_stats_table(key)
+    table = table[~table.index.duplicated()]
+
+    # Features with the same key (e.g. a city in several pieces) are one area
+    keys = gdf[geo["featureidkey"].split(".", 1)[1]].astype(str)
+    matched = keys.isin(table.index).to_numpy()
+    codes, locations = pd.factorize(keys[matched])
+    rows = table.reindex(locations)
+
+    # Dots per area and category, rounded at random so the expected total is exact
+    rng = np.random.default_rng([seed, list(GEOGRAPHY_BY_KEY).index(key)])
+    total = rows["Muslim_Total"].to_numpy(dtype=float)
+    voted = rows["Muslim_Voted"].fillna(0).to_numpy(dtype=float)
+    suppressed = rows["Suppressed"].astype(bool).to_numpy()
+    by_category = np.stack([np.where(suppressed, 0, total - voted), np.where(suppressed, 0, voted),
+                            np.where(suppressed, total, 0)], axis=1)
+    counts = np.floor(by_category / per_dot + rng.random(by_category.shape)).astype(np.int64)
+
+    parts, part_geometry = shapely.get_parts(gdf.geometry.values[matched], return_index=True)
+    lon, lat, area, attempts = sample_points(rng, parts, codes[part_geometry], counts.sum(axis=1))
+
+    # The dots of an area are independent and uniform, so the first ones of each area can be the
+    # did-not-vote dots, the next the voted ones; the drawing order is shuffled afterwards
+    placed = np.bincount(area, minlength=len(locations))
+    position = np.arange(len(area)) - np.repeat(np.cumsum(placed) - placed, placed)
+    category = (position[:, None] >= np.cumsum(counts, axis=1)[area]).sum(axis=1)
+    shuffle = rng.permutation(len(area))
+    return {
+        "lon": lon[shuffle].astype(np.float32),
+        "lat": lat[shuffle].astype(np.float32),
+        "category": np.minimum(category, 2)[shuffle].astype(np.uint8),
+    }, int(counts.sum()), attempts
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Generate dot-density layers (one dot per N Muslim voters)")
+    parser.add_argument("--per-dot", type=int, default=5, help="Muslim voters per dot")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--layers", nargs="+", default=DOT_LAYERS, choices=DOT_LAYERS)
+    args = parser.parse_args()
+    os.makedirs(DOT_DIR, exist_ok=True)
+
+    for key in args.layers:
+        start = time.perf_counter()
+        geo = GEOGRAPHY_BY_KEY[key]
+        settings = {"per_dot": args.per_dot, "seed": args.seed,
+                    "stats": file_hash(stats_source(key), {})}
+        source_hash = file_hash(boundary_path(geo["geojson_file"]), settings)
+        if os.path.exists(dot_path(key)):
+            with np.load(dot_path(key), allow_pickle=False) as store:
+                if str(store["source_hash"]) == source_hash:
+                    print(f"{geo['title']:<16} unchanged, kept {dot_path(key)}")
+                    continue
+
+        dots, wanted, attempts = build_layer(key, args.per_dot, args.seed)
+        temp_file = dot_path(key) + ".tmp.npz"
+        np.savez(temp_file, source_hash=np.array(source_hash), **dots)
+        os.replace(temp_file, dot_path(key))
+        print(f"{geo['title']:<16} {len(dots['lon']):>10,} of {wanted:,} dots "
+              f"({len(dots['lon']) / max(attempts, 1):.0%} of candidates accepted) "
+              f"in {time.perf_counter() - start:.1f}s, {os.path.getsize(dot_path(key)) / 1e6:.1f}MB")
+    print(f"✅ Saved to {DOT_DIR}/")
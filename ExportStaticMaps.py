@@ -0,0 +1,170 @@
+import argparse
+import hashlib
+import json
+import os
+from plotly.offline import get_plotlyjs
+import pandas as pd
+from RenderTables import GEOGRAPHIES, load_stats_table, classed_trace_args
+from BuildMapPayloads import encode_boundaries, precompress
+from States import STATE
+
+# Export the count (Map.py) and turnout (MapVoting.py) maps as static files for a CDN.
+#
+# Output layout (everything under assets/ is content-hashed and can be cached forever):
+#   index.html, count.html, turnout.html      entry pages (short cache)
+#   assets/plotly.<hash>.min.js               Plotly.js, shared by every page
+#   assets/<geography>.<hash>.topo.json       boundaries (rounded, shared arcs stored once), shared by
+#                                             the count and turnout pages and decoded in the browser
+#   assets/<geography>-<variant>.<hash>.json  locations, z values, hover text, color scale
+# Every asset also gets pre-compressed .gz (and .br with the brotli module) siblings for servers that serve them directly
+# (nginx gzip_static, S3/CloudFront with Content-Encoding: gzip).
+
+VARIANTS = {
+    "count": {"page_title": "Eligible Muslim Voters by {} in " + STATE["name"]},
+    "turnout": {"page_title": "Muslim Voter Turnout by {} in " + STATE["name"]},
+}
+
+
+def write_asset(out_dir, name, extension, content):
+    """Write content under a content-hashed name (plus .gz/.br) and return its relative path."""
+    data = content.encode("utf-8") if isinstance(content, str) else content
+    digest = hashlib.sha256(data).hexdigest()[:12]
+    relative_path = f"assets/{name}.{digest}.{extension}"
+    path = os.path.join(out_dir, relative_path)
+    if not os.path.exists(path):
+        precompress(path, data)
+    return relative_path
+
+
+def map_payload(geo, variant, stats):
+    # Color classes, hover text and suppression come precomputed from Step10_computeMapStats.py
+    metric = "Muslim_Total" if variant == "count" else "Muslim_Voted_Percent"
+    locations = stats[0].index
+    trace = classed_trace_args(stats, metric, locations)
+    return {
+        "locations": locations.tolist(),
+        "z": [None if pd.isna(v) else float(v) for v in trace["z"]],
+        "text": trace["text"].tolist(),
+        "zmin": trace["zmin"],
+        "zmax": trace["zmax"],
+        "colorscale": trace["colorscale"],
+        "featureidkey": geo["featureidkey"],
+        "colorbar": trace["colorbar"],
+    }
+
+
+TOPOJSON_DECODER_JS = """// TopoJSON -> GeoJSON: undo the delta encoding, then stitch each ring from its arcs
+// (a negative index ~i means arc i reversed; consecutive arcs share their end point)
+function topoToGeo(topo) {
+  const [sx, sy] = topo.transform.scale, [tx, ty] = topo.transform.translate;
+  const arcs = topo.arcs.map(arc => {
+    let x = 0, y = 0;
+    return arc.map(([dx, dy]) => [(x += dx) * sx + tx, (y += dy) * sy + ty]);
+  });
+  const ring = ids => ids.flatMap((id, k) => {
+    const points = id < 0 ? arcs[~id].slice().reverse() : arcs[id];
+    return k ? points.slice(1) : points;
+  });
+  return {type: "FeatureCollection", features: topo.objects.boundaries.geometries.map(g => ({
+    type: "Feature", properties: g.properties,
+    geometry: g.type === "Polygon" ? {type: "Polygon", coordinates: g.arcs.map(ring)}
+      : g.type === "MultiPolygon" ? {type: "MultiPolygon", coordinates: g.arcs.map(p => p.map(ring))} : null
+  }))};
+}
+"""
+
+
+PAGE_TEMPLATE = """<!DOCTYPE html>
+<html lang="en">
+<head>
+<meta charset="utf-8">
+<title>{page_title}</title>
+<style>body {{ font-family: sans-serif; margin: 0 2rem; }} .map {{ height: 600px; }}</style>
+<script src="{plotly_js}"></script>
+</head>
+<body>
+{sections}
+<script>
+const maps = {maps};
+async function fetchJson(url) {{
+  const response = await fetch(url);
+  return response.json();
+}}
+{topojson_decoder}
+for (const m of maps) {{
+  Promise.all([fetchJson(m.geojson).then(topoToGeo), fetchJson(m.data)]).then(([geojson, d]) => {{
+    Plotly.newPlot(m.div, [{{
+      type: "choroplethmapbox", geojson: geojson, locations: d.locations, z: d.z, text: d.text,
+      featureidkey: d.featureidkey, hovertemplate: "%{{text}}<extra></extra>",
+      colorscale: d.colorscale, zmin: d.zmin, zmax: d.zmax,
+      marker: {{opacity: 0.8, line: {{width: 1.2}}}},
+      colorbar: {{title: {{text: d.colorbar.title}}, tickvals: d.colorbar.tickvals, ticktext: d.colorbar.ticktext}}
+    }}], {{
+      mapbox: {{style: "carto-positron", zoom: {map_zoom}, center: {map_center}}},
+      margin: {{r: 0, t: 0, l: 0, b: 0}}, height: 600
+    }}, {{responsive: true}});
+  }});
+}}
+</script>
+</body>
+</html>
+"""
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Export the maps as static HTML + JSON assets")
+    parser.add_argument("--out", default="static_site")
+    parser.add_argument("--data-dir", default="", help="Export an election slice, e.g. history/2022_General/")
+    parser.add_argument("--precision", type=int, default=5, help="Decimal places kept in boundary coordinates")
+    args = parser.parse_args()
+
+    os.makedirs(os.path.join(args.out, "assets"), exist_ok=True)
+
+    # Step 1: Shared assets (Plotly.js once, each boundary file once as TopoJSON)
+    plotly_js = write_asset(args.out, "plotly", "min.js", get_plotlyjs())
+    geojson_assets = {}
+    for geo in GEOGRAPHIES:
+        _, topology = encode_boundaries(geo, args.precision)
+        geojson_assets[geo["key"]] = write_asset(
+            args.out, geo["key"], "topo.json", json.dumps(topology, separators=(",", ":"))
+        )
+
+    # Step 2: Per-variant data assets and pages
+    stats = {geo["key"]: load_stats_table(geo["key"], args.data_dir) for geo in GEOGRAPHIES}
+    manifest = {"plotly": plotly_js, "geojson": geojson_assets, "pages": {}}
+    for variant, settings in VARIANTS.items():
+        maps, sections = [], []
+        for geo in GEOGRAPHIES:
+            payload = map_payload(geo, variant, stats[geo["key"]])
+            data_asset = write_asset(
+                args.out, f"{geo['key']}-{variant}", "json", json.dumps(payload, separators=(",", ":"))
+            )
+            div_id = f"map-{geo['key']}"
+            maps.append({"div": div_id, "geojson": geojson_assets[geo["key"]], "data": data_asset})
+            sections.append(f"<h1>{settings['page_title'].format(geo['title'])}</h1>\n<div id=\"{div_id}\" class=\"map\"></div>")
+
+        page = PAGE_TEMPLATE.format(
+            page_title=settings["page_title"].format("Geography"),
+            map_center=json.dumps(STATE["center"]),
+            map_zoom=STATE["zoom"],
+            plotly_js=plotly_js,
+            sections="\n".join(sections),
+            maps=json.dumps(maps),
+            topojson_decoder=TOPOJSON_DECODER_JS,
+        )
+        with open(os.path.join(args.out, f"{variant}.html"), "w") as file:
+            file.write(page)
+        manifest["pages"][variant] = f"{variant}.html"
+        print(f"✅ Saved {variant}.html")
+
+    with open(os.path.join(args.out, "index.html"), "w") as file:
+        file.write(
+            f"<!DOCTYPE html><html><head><meta charset=\"utf-8\"><title>{STATE['name']} Map</title></head><body>"
+            f"<h1>{STATE['name']} Muslim Voter Maps</h1><ul>"
+            "<li><a href=\"count.html\">Eligible Muslim voters</a></li>"
+            "<li><a href=\"turnout.html\">Muslim voter turnout</a></li>"
+            "</ul></body></html>\n"
+        )
+    with open(os.path.join(args.out, "manifest.json"), "w") as file:
+        json.dump(manifest, file, indent=2)
+    print(f"✅ Exported static site to {args.out}/")
@@ -0,0 +1,188 @@
+import argparse
+import io
+import itertools
+import os
+import queue
+import re
+import shutil
+import threading
+import time
+import zlib
+from collections import OrderedDict
+import numpy as np
+import pandas as pd
+from VoterDB import DISTRICT_COLUMNS, read_columns
+
+# Per-district walk lists for field teams: one CSV per district of the chosen geography, e.g.
+#   walk_lists/school_district/salinas_union_high_school_district.csv
+# with every non-voter in it (--all for everyone), plus walk_lists/<geography>/index.csv with
+# the row count of each file.
+#
+# The voter table is read once, in chunks of lines. Only the columns that route a row are parsed;
+# each chunk's lines are grouped by district and appended to that district's buffer; full buffers go to writer threads, each
+# owning the districts that hash to it and at most --max-open file handles (least recently
+# used ones are closed and reopened in append mode when needed). Parsing the next chunk
+# overlaps with the writes, so the whole state takes about as long as one scan.
+#
+# --details adds name and address columns from the voters table of muslim_voters.sqlite.
+
+INPUT_FILE = "muslim_Voters_data_with_SchoolDistrict_CD_LD_Voted.csv"
+OUTPUT_DIR = "walk_lists"
+GEOGRAPHY_COLUMNS = ["School District"] + DISTRICT_COLUMNS
+DETAIL_COLUMNS = ["FirstName", "LastName", "Address", "City", "Zip"]
+BUFFER_BYTES = 64 * 1024
+
+
+def district_file_name(district):
+    return re.sub(r"[^a-z0-9]+", "_", str(district).lower()).strip("_") or "unnamed"
+
+
+class DistrictWriter(threading.Thread):
+    """Appends buffered CSV text to the files of its districts, keeping at most max_open
+    of them open."""
+
+    def __init__(self, max_open):
+        super().__init__(daemon=True)
+        self.max_open = max_open
+        self.jobs = queue.Queue(maxsize=64)
+        self.handles = OrderedDict()
+        self.error = None
+
+    def handle(self, path, header):
+        file = self.handles.pop(path, None)
+        if file is None:
+            if len(self.handles) >= self.max_open:
+                self.handles.popitem(last=False)[1].close()
+            new = not os.path.exists(path)
+            file = open(path, "a", encoding="utf-8", newline="")
+            if new:
+                file.write(header)
+        self.handles[path] = file
+        return file
+
+    def run(self):
+        while (job := self.jobs.get()) is not None:
+            path, header, text = job
+            try:
+                if self.error is None:
+                    self.handle(path, header).write(text)
+            except OSError as error:
+                self.error = error
+        for file in self.handles.values():
+            file.close()
+
+
+def export_walk_lists(input_file, geography, output_dir, non_voters_only=True, details=None,
+                      chunksize=500_000, writers=4, max_open=128):
+    """Write one CSV per district of the geography column; returns {district: rows}."""
+    columns = list(pd.read_csv(input_file, nrows=0).columns)
+    id_column = columns[0]
+    detail_columns = [c for c in details.columns if c not in columns] if details is not None else []
+    header = pd.DataFrame(columns=columns + detail_columns).to_csv(index=False)
+
+    threads = [DistrictWriter(max(1, max_open // writers)) for _ in range(writers)]
+    for thread in threads:
+        thread.start()
+    buffers, sizes, counts, paths = {}, {}, {}, {}
+
+    def flush(district):
+        thread = threads[zlib.crc32(paths[district].encode("utf-8")) % writers]
+        thread.jobs.put((paths[district], header, "".join(buffers.pop(district))))
+        sizes[district] = 0
+
+    # Rows are passed through as the input's own lines; only the id, geography and Voted columns
+    # are parsed to route them. Blank lines are dropped first (read_csv skips them as well), and a
+    # record spanning lines (a quoted embedded newline) stops the export, as lines and parsed rows
+    # would no longer line up.
+    with open(input_file, "r", encoding="utf-8", newline="") as file:
+        next(line for line in file if line.strip())  # the header
+        while chunk := list(itertools.islice(file, chunksize)):
+            lines = [line for line in chunk if line.strip()]
+            try:
+                keys = pd.read_csv(io.StringIO("".join(lines)), header=None, names=columns, dtype=str,
+                                   usecols=list(dict.fromkeys([id_column, geography, "Voted"])))
+            except pd.errors.ParserError as error:
+                raise ValueError(f"{input_file}: unparsable records ({error}); multiline records are not supported")
+            except pd.errors.EmptyDataError:
+                continue
+            if len(keys) != len(lines):
+                raise ValueError(f"{input_file}: {len(lines):,} lines parsed as {len(keys):,} records; "
+                                 "records with embedded newlines are not supported")
+            keep = keys[geography].notna().to_numpy()
+            if non_voters_only:
+                codes, values = pd.factorize(keys["Voted"])  # a handful of distinct spellings
+                voted = np.array([str(v).strip().lower() == "yes" for v in values] + [False])
+                keep &= ~voted[codes]
+            lines = np.array(lines, dtype=object)[keep]
+            keys = keys[keep]
+            if details is not None:
+                extra = details.reindex(keys[id_column])[detail_columns].to_csv(header=False, index=False)
+                lines = np.array([line.rstrip("\r\n") + "," + more + "\n"
+                                  for line, more in zip(lines, extra.splitlines())], dtype=object)
+
+            # Group the chunk's lines by district with one stable sort
+            codes, districts = pd.factorize(keys[geography])
+            order = np.argsort(codes, kind="stable")
+            bounds = np.searchsorted(codes[order], np.arange(len(districts) + 1))
+            lines = lines[order]
+            for i, district in enumerate(districts):
+                if district not in paths:
+                    name = district_file_name(district)
+                    while name == "index" or os.path.join(output_dir, name + ".csv") in paths.values():
+                        name += "_"
+                    paths[district] = os.path.join(output_dir, name + ".csv")
+                text = "".join(lines[bounds[i]:bounds[i + 1]])
+                buffers.setdefault(district, []).append(text)
+                sizes[district] = sizes.get(district, 0) + len(text)
+                counts[district] = counts.get(district, 0) + int(bounds[i + 1] - bounds[i])
+                if sizes[district] >= BUFFER_BYTES:
+                    flush(district)
+
+    for district in list(buffers):
+        flush(district)
+    for thread in threads:
+        thread.jobs.put(None)
+    for thread in threads:
+        thread.join()
+        if thread.error is not None:
+            raise thread.error
+    pd.DataFrame({
+        geography: list(counts),
+        "file": [os.path.basename(paths[d]) for d in counts],
+        "rows": list(counts.values()),
+    }).sort_values(geography).to_csv(os.path.join(output_dir, "index.csv"), index=False)
+    return counts
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Export per-district walk lists in one pass over the voter table")
+    parser.add_argument("--by", choices=GEOGRAPHY_COLUMNS, default="School District")
+    parser.add_argument("--input", default=INPUT_FILE)
+    parser.add_argument("--output-dir", default=OUTPUT_DIR)
+    parser.add_argument("--all", action="store_true", help="Everyone, not only voters who did not vote")
+    parser.add_argument("--details", action="store_true", help="Add names and addresses from muslim_voters.sqlite")
+    parser.add_argument("--chunksize", type=int, default=500_000)
+    parser.add_argument("--writers", type=int, default=4, help="Writer threads")
+    parser.add_argument("--max-open", type=int, default=128, help="Open output files across all writers")
+    args = parser.parse_args()
+    start = time.perf_counter()
+
+    # Step 1: Optional name and address columns, by voter id
+    details = None
+    if args.details:
+        details = read_columns("voters", ["RegistrantID"] + DETAIL_COLUMNS)
+        details = details.drop_duplicates("RegistrantID").set_index("RegistrantID")
+
+    # Step 2: One pass over the voter table into a fresh directory, swapped in at the end
+    geography_dir = os.path.join(args.output_dir, district_file_name(args.by))
+    temp_dir = geography_dir + ".tmp"
+    shutil.rmtree(temp_dir, ignore_errors=True)
+    os.makedirs(temp_dir)
+    counts = export_walk_lists(args.input, args.by, temp_dir, not args.all, details,
+                               args.chunksize, args.writers, args.max_open)
+    shutil.rmtree(geography_dir, ignore_errors=True)
+    os.replace(temp_dir, geography_dir)
+
+    print(f"{len(counts):,} {args.by} files, {sum(counts.values()):,} voters "
+          f"in {time.perf_counter() - start:.1f}s")
+    print(f"✅ Saved to {geography_dir}/")
@@ -0,0 +1,227 @@
+import argparse
+import json
+import os
+import numpy as np
+from plotly.offline import get_plotlyjs, get_plotlyjs_version
+from RenderTables import GEOGRAPHIES, load_stats_table
+from BuildMapPayloads import encode_boundaries
+from GeometryTools import feature_bounds, build_rtree
+from ExportStaticMaps import write_asset, map_payload, TOPOJSON_DECODER_JS, VARIANTS
+from States import STATE
+
+# One zoomable map instead of six stacked ones: counties at low zoom, cities (or school
+# districts) once zoomed in, legislative districts on demand from the layer picker.
+# Each layer is a precomputed pair of assets, simplified for the zoom it is shown at:
+#   assets/<geography>.<hash>.topo.json              boundaries
+#   assets/<geography>-<variant>[-<election>].<hash>.json   locations, classes, hover text
+#   assets/<geography>.<hash>.rtree.json             packed R-tree over feature bounds (dense layers only)
+# The page only fetches the county layer at load; other layers are fetched the first time the
+# zoom (plotly_relayout) or the picker asks for them, then kept in memory. For the dense layers
+# every relayout re-queries the R-tree and draws only the shapes in the viewport plus a margin.
+#
+# Output in static/zoom/ (the JSON assets are served by Streamlit at app/static/zoom/):
+#   count.html, turnout.html                  standalone pages with a local Plotly.js
+#   count.embed.html, turnout.embed.html      pages for st.components.v1.html in Map.py /
+#                                             MapVoting.py (Plotly.js from the CDN, since
+#                                             Streamlit only serves .json/images from ./static)
+
+ZOOM_DIR = os.path.join("static", "zoom")
+
+# Automatic modes: (minimum zoom, layer) from coarse to fine
+ZOOM_MODES = {
+    "auto-city": {"label": "By zoom: counties, then cities", "levels": [[0, "county"], [7, "city"]]},
+    "auto-school": {"label": "By zoom: counties, then school districts", "levels": [[0, "county"], [7, "school_district"]]},
+}
+
+# Simplification tolerance (degrees) per layer, coarser for layers shown zoomed out
+LAYER_TOLERANCE = {
+    "county": 0.002,
+    "city": 0.0002,
+    "school_district": 0.0005,
+    "congressional_district": 0.001,
+    "assembly_district": 0.001,
+    "senate_district": 0.001,
+}
+
+# Layers drawn with viewport culling, and the margin added around the viewport (share of its size)
+CULLED_LAYERS = ["city", "school_district"]
+CULL_MARGIN = 0.25
+
+PAGE_TEMPLATE = """<!DOCTYPE html>
+<html lang="en">
+<head>
+<meta charset="utf-8">
+<title>{page_title}</title>
+<style>body {{ font-family: sans-serif; margin: 0; }} #controls {{ padding: 0.5rem 0; }} #map {{ height: 640px; }}</style>
+<script src="{plotly_js}"></script>
+</head>
+<body>
+<div id="controls">
+  <label>Layer <select id="layer">{options}</select></label>
+  <span id="status"></span>
+</div>
+<div id="map"></div>
+<script>
+const config = {config};
+async function fetchJson(url) {{
+  const response = await fetch(config.base + url);
+  return response.json();
+}}
+{topojson_decoder}
+// Election slice: set by the embedding app (window.zoomSlice) or ?election=<history/...> on the page
+const requested = window.zoomSlice ?? new URLSearchParams(location.search).get("election") ?? "";
+const slice = requested in config.slices ? requested : "";
+
+const layers = new Map();  // layer key -> Promise of [geojson, data], fetched once
+function load(key) {{
+  if (!layers.has(key)) {{
+    layers.set(key, Promise.all([
+      fetchJson(config.layers[key].topojson).then(topoToGeo),
+      fetchJson(config.slices[slice][key]),
+      config.layers[key].rtree ? fetchJson(config.layers[key].rtree) : null,
+    ]));
+  }}
+  return layers.get(key);
+}}
+
+const div = document.getElementById("map"), picker = document.getElementById("layer"), status = document.getElementById("status");
+function layerFor(mode, zoom) {{
+  if (!(mode in config.modes)) return mode;
+  let key = config.modes[mode].levels[0][1];
+  for (const [minZoom, level] of config.modes[mode].levels) if (zoom >= minZoom) key = level;
+  return key;
+}}
+
+// Viewport culling: query the packed R-tree (GeometryTools.build_rtree) with the viewport plus a margin
+let viewport = null;
+function cullBox() {{
+  if (!viewport) return null;
+  const [x0, y0, x1, y1] = viewport, mx = (x1 - x0) * config.cull_margin, my = (y1 - y0) * config.cull_margin;
+  return [x0 - mx, y0 - my, x1 + mx, y1 + my];
+}}
+function queryTree(tree, [minX, minY, maxX, maxY]) {{
+  const levels = tree.levels, found = [];
+  const stack = levels[levels.length - 1].map((box, i) => [levels.length - 1, i]);
+  while (stack.length) {{
+    const [level, i] = stack.pop(), box = levels[level][i];
+    if (box[2] < minX || box[0] > maxX || box[3] < minY || box[1] > maxY) continue;
+    if (level === 0) {{ found.push(tree.order[i]); continue; }}
+    const end = Math.min((i + 1) * tree.node_size, levels[level - 1].length);
+    for (let j = i * tree.node_size; j < end; j++) stack.push([level - 1, j]);
+  }}
+  return found;
+}}
+function visible(geojson, d, tree) {{
+  const box = cullBox();
+  if (!tree || !box) return [geojson, d];
+  const features = queryTree(tree, box).map(i => geojson.features[i]);
+  const property = d.featureidkey.split(".")[1];
+  const keys = new Set(features.map(f => String(f.properties[property])));
+  const rows = d.locations.flatMap((location, i) => keys.has(String(location)) ? [i] : []);
+  const pick = values => rows.map(i => values[i]);
+  return [{{type: "FeatureCollection", features}}, {{...d, locations: pick(d.locations), z: pick(d.z), text: pick(d.text)}}];
+}}
+
+let shown = null, wanted = null;
+async function show(key) {{
+  wanted = key;
+  if (key === shown && !config.layers[key].rtree) return;  // same layer, nothing to re-cull
+  if (key !== shown) status.textContent = "Loading " + config.layers[key].title + "…";
+  const [fullGeojson, fullData, tree] = await load(key);
+  if (key !== wanted) return;  // the zoom moved on while this layer was loading
+  const [geojson, d] = visible(fullGeojson, fullData, tree);
+  await Plotly.react(div, [{{
+    type: "choroplethmapbox", geojson: geojson, locations: d.locations, z: d.z, text: d.text,
+    featureidkey: d.featureidkey, hovertemplate: "%{{text}}<extra></extra>",
+    colorscale: d.colorscale, zmin: d.zmin, zmax: d.zmax,
+    marker: {{opacity: 0.8, line: {{width: 1.2}}}},
+    colorbar: {{title: {{text: d.colorbar.title}}, tickvals: d.colorbar.tickvals, ticktext: d.colorbar.ticktext}}
+  }}], {{
+    mapbox: {{style: "carto-positron", zoom: {map_zoom}, center: {map_center}}},
+    uirevision: "keep-view", margin: {{r: 0, t: 0, l: 0, b: 0}}, height: 640
+  }}, {{responsive: true}});
+  if (shown === null) {{
+    div.on("plotly_relayout", event => {{
+      const corners = event["mapbox._derived"] && event["mapbox._derived"].coordinates;
+      if (corners) {{
+        const lons = corners.map(c => c[0]), lats = corners.map(c => c[1]);
+        viewport = [Math.min(...lons), Math.min(...lats), Math.max(...lons), Math.max(...lats)];
+      }}
+      show(layerFor(picker.value, div.layout.mapbox.zoom));
+    }});
+  }}
+  shown = key;
+  status.textContent = config.layers[key].title +
+    (geojson.features.length < fullGeojson.features.length ? ` (${{geojson.features.length}} of ${{fullGeojson.features.length}} shapes in view)` : "");
+}}
+picker.addEventListener("change", () => show(layerFor(picker.value, div.layout.mapbox ? div.layout.mapbox.zoom : 5)));
+show(layerFor(picker.value, 5));
+</script>
+</body>
+</html>
+"""
+
+
+def zoom_page(variant, plotly_js, config):
+    options = [f'<option value="{mode}">{settings["label"]}</option>' for mode, settings in ZOOM_MODES.items()]
+    options += [f'<option value="{key}">{layer["title"]}</option>' for key, layer in config["layers"].items()]
+    return PAGE_TEMPLATE.format(
+        page_title=VARIANTS[variant]["page_title"].format("Geography"),
+        map_center=json.dumps(STATE["center"]),
+        map_zoom=STATE["zoom"],
+        plotly_js=plotly_js,
+        options="".join(options),
+        config=json.dumps(config),
+        topojson_decoder=TOPOJSON_DECODER_JS,
+    )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Export the zoomable multi-resolution map")
+    parser.add_argument("--out", default=ZOOM_DIR)
+    parser.add_argument("--precision", type=int, default=5, help="Decimal places kept in boundary coordinates")
+    parser.add_argument("--base-url", default="app/static/zoom/", help="Where Streamlit serves --out")
+    args = parser.parse_args()
+
+    os.makedirs(os.path.join(args.out, "assets"), exist_ok=True)
+
+    data_dirs = [""]
+    if os.path.exists("history/elections.json"):
+        with open("history/elections.json", "r") as file:
+            data_dirs += [os.path.join("history", e["folder"], "") for e in json.load(file)]
+
+    # Step 1: Per-level geometry, simplified for the zoom each layer is shown at
+    layers = {}
+    for geo in GEOGRAPHIES:
+        rounded, topology = encode_boundaries(geo, args.precision, LAYER_TOLERANCE[geo["key"]])
+        topojson_asset = write_asset(args.out, geo["key"], "topo.json", json.dumps(topology, separators=(",", ":")))
+        layers[geo["key"]] = {"title": geo["title"], "topojson": topojson_asset}
+        if geo["key"] in CULLED_LAYERS:
+            tree = build_rtree(np.round(feature_bounds(rounded), args.precision))
+            layers[geo["key"]]["rtree"] = write_asset(args.out, geo["key"], "rtree.json", json.dumps(tree, separators=(",", ":")))
+        print(f"{geo['key']:<24} {os.path.getsize(os.path.join(args.out, topojson_asset + '.gz')) / 1e3:>8.0f} kB gzipped")
+
+    # Step 2: Per-level aggregates for every election slice, then the pages
+    stats = {(d, geo["key"]): load_stats_table(geo["key"], d) for d in data_dirs for geo in GEOGRAPHIES}
+    local_plotly_js = write_asset(args.out, "plotly", "min.js", get_plotlyjs())
+    cdn_plotly_js = f"https://cdn.plot.ly/plotly-{get_plotlyjs_version()}.min.js"
+    for variant in VARIANTS:
+        slices = {}
+        for data_dir in data_dirs:
+            suffix = "-" + data_dir.strip("/").split("/")[-1] if data_dir else ""
+            slices[data_dir] = {
+                geo["key"]: write_asset(
+                    args.out, f"{geo['key']}-{variant}{suffix}", "json",
+                    json.dumps(map_payload(geo, variant, stats[(data_dir, geo["key"])]),
+                               separators=(",", ":")),
+                )
+                for geo in GEOGRAPHIES
+            }
+        config = {"layers": layers, "modes": ZOOM_MODES, "slices": slices, "cull_margin": CULL_MARGIN}
+
+        with open(os.path.join(args.out, f"{variant}.html"), "w") as file:
+            file.write(zoom_page(variant, local_plotly_js, {**config, "base": ""}))
+        with open(os.path.join(args.out, f"{variant}.embed.html"), "w") as file:
+            file.write(zoom_page(variant, cdn_plotly_js, {**config, "base": args.base_url}))
+        print(f"✅ Saved {variant}.html and {variant}.embed.html")
+    print(f"✅ Exported zoomable map to {args.out}/")
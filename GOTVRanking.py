@@ -0,0 +1,147 @@
+import argparse
+import heapq
+import threading
+import numpy as np
+import pandas as pd
+from RenderTables import GEOGRAPHIES, MIN_VOTERS, load_stats_table
+
+# Get-out-the-vote targets: every area of every geography scored by the votes a contact program
+# there could add,
+#   expected additional votes = (Muslim_Total - Muslim_Voted) * mobilization_rate
+#                               * (1 + low_turnout_boost * (1 - turnout))
+# so areas with many non-voters rank first and low turnout counts extra. Areas under MIN_VOTERS
+# (whose turnout the maps suppress) are not ranked.
+#
+# Each geography keeps a max-heap of scores. When counts change (a pipeline rerun picked up by
+# the dashboards' hot reload) only the changed areas are pushed again, and their old entries
+# are dropped lazily when they surface. Reading the top k walks just the top of the heap, also
+# when the table is filtered, so the ranked tables next to the maps never rescan the aggregates.
+
+SCORE_FACTORS = {"mobilization_rate": 0.10, "low_turnout_boost": 1.0}
+OUTPUT_FILE = "gotv_targets.csv"
+RANKED_COLUMNS = ["label", "Muslim_Total", "Muslim_Voted", "Muslim_Voted_Percent", "Expected_Additional_Votes"]
+
+
+def expected_votes(total, voted, factors=SCORE_FACTORS):
+    total = np.asarray(total, dtype=float)
+    voted = np.asarray(voted, dtype=float)
+    turnout = np.divide(voted, total, out=np.zeros_like(total), where=total > 0)
+    score = (total - voted) * factors["mobilization_rate"] * (1 + factors["low_turnout_boost"] * (1 - turnout))
+    return np.where(total >= MIN_VOTERS, score, np.nan)
+
+
+class TopK:
+    """Max-heap of scores by location with lazy deletion: update is O(log n) and top(k)
+    visits about k entries plus the ones a filter rejects."""
+
+    def __init__(self):
+        self.heap = []
+        self.scores = {}
+
+    def update(self, location, score):
+        if score is None or np.isnan(score):
+            self.scores.pop(location, None)
+        elif self.scores.get(location) != score:
+            self.scores[location] = score
+            heapq.heappush(self.heap, (-score, location))
+        if len(self.heap) > 2 * len(self.scores) + 64:
+            self.heap = [(-s, loc) for loc, s in self.scores.items()]
+            heapq.heapify(self.heap)
+
+    def top(self, k, keep=None):
+        # Best-first walk of the heap array: children of a visited entry join the frontier
+        heap, results, seen = self.heap, [], set()
+        frontier = [(heap[0], 0)] if heap else []
+        while frontier and len(results) < k:
+            (negative, location), i = heapq.heappop(frontier)
+            if self.scores.get(location) == -negative and location not in seen:
+                seen.add(location)
+                if keep is None or keep(location):
+                    results.append(location)
+            for child in (2 * i + 1, 2 * i + 2):
+                if child < len(heap):
+                    heapq.heappush(frontier, (heap[child], child))
+        return results
+
+
+class GOTVRanking:
+    """Ranked areas per (data_dir, geography key), kept in sync with the render tables."""
+
+    def __init__(self, factors=SCORE_FACTORS):
+        self.factors = factors
+        self.lock = threading.Lock()
+        self.rankings = {}  # (data_dir, key) -> {"version", "rows", "topk"}
+
+    def sync(self, slice_key, load_table, version=None):
+        """Push the areas of a render table (indexed by location, as from load_stats_table)
+        whose counts differ from the last sync; returns how many changed. load_table is only
+        called when the slice was not yet synced at this version."""
+        with self.lock:
+            ranking = self.rankings.get(slice_key)
+            if ranking is not None and version is not None and ranking["version"] == version:
+                return 0
+            table = load_table()
+            rows = table[~table.index.duplicated()][
+                ["label", "Muslim_Total", "Muslim_Voted", "Muslim_Voted_Percent"]].copy()
+            rows["Expected_Additional_Votes"] = expected_votes(rows["Muslim_Total"], rows["Muslim_Voted"], self.factors)
+            if ranking is None:
+                ranking = self.rankings[slice_key] = {"rows": rows.iloc[:0], "topk": TopK()}
+            old = ranking["rows"].reindex(rows.index)
+            changed = rows.index[~(old["Muslim_Total"].eq(rows["Muslim_Total"])
+                                   & old["Muslim_Voted"].eq(rows["Muslim_Voted"]))]
+            removed = ranking["rows"].index.difference(rows.index)
+            topk = ranking["topk"]
+            for location in removed:
+                topk.update(location, None)
+            for location, score in rows.loc[changed, "Expected_Additional_Votes"].items():
+                topk.update(location, score)
+            ranking["rows"], ranking["version"] = rows, version
+            return len(changed) + len(removed)
+
+    def ranked(self, slice_key, k, min_total=0, max_turnout=100.0, search=""):
+        """The k best areas passing the filters, best first, as a table with a Rank column."""
+        with self.lock:
+            rows = self.rankings[slice_key]["rows"]
+            search = search.strip().lower()
+
+            def keep(location):
+                row = rows.loc[location]
+                return (row["Muslim_Total"] >= min_total and row["Muslim_Voted_Percent"] <= max_turnout
+                        and (not search or search in str(row["label"]).lower()))
+
+            unfiltered = not min_total and max_turnout >= 100 and not search
+            locations = self.rankings[slice_key]["topk"].top(k, None if unfiltered else keep)
+            table = rows.loc[locations, RANKED_COLUMNS].reset_index(drop=True)
+        table.insert(0, "Rank", range(1, len(table) + 1))
+        return table
+
+
+# One ranking per server process, shared by every dashboard session. It lives here rather than in
+# st.cache_resource so a hot reload (which clears those caches) keeps it, and re-ranks only what
+# the rebuild changed.
+SHARED_RANKING = GOTVRanking()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Rank every geography's areas by expected additional votes")
+    parser.add_argument("--top", type=int, default=25, help="Areas per geography")
+    parser.add_argument("--data-dir", default="", help="e.g. history/2022_General/ for a past election")
+    parser.add_argument("--mobilization-rate", type=float, default=SCORE_FACTORS["mobilization_rate"])
+    parser.add_argument("--low-turnout-boost", type=float, default=SCORE_FACTORS["low_turnout_boost"])
+    parser.add_argument("--output", default=OUTPUT_FILE)
+    args = parser.parse_args()
+
+    # Step 1: Score every geography's render table
+    ranking = GOTVRanking({"mobilization_rate": args.mobilization_rate, "low_turnout_boost": args.low_turnout_boost})
+    tables = []
+    for geo in GEOGRAPHIES:
+        ranking.sync(geo["key"], lambda: load_stats_table(geo["key"], args.data_dir)[0])
+        table = ranking.ranked(geo["key"], args.top)
+        table.insert(0, "Geography", geo["title"])
+        tables.append(table)
+
+    # Step 2: Save the top areas of each geography
+    targets = pd.concat(tables, ignore_index=True)
+    targets["Expected_Additional_Votes"] = targets["Expected_Additional_Votes"].round(1)
+    targets.to_csv(args.output, index=False)
+    print(f"✅ Saved to {args.output}")
@@ -0,0 +1,168 @@
+import pandas as pd
+import argparse
+import asyncio
+import hashlib
+import os
+import sqlite3
+import time
+import re
+
+# Geocode voter addresses to lat/lon.
+#
+# Addresses are normalized and deduplicated first, so every distinct address is geocoded once.
+# Results are cached in SQLite keyed by the normalized address and the backend's source (its
+# name plus a hash of its reference tables), so a re-run only geocodes addresses it has not seen
+# before, and updating the reference tables geocodes everything again instead of keeping
+# "unmatched" (or outdated) results forever. The backend is pluggable; the default "local" backend
+# works offline against an address-point table (e.g. an OpenAddresses or TIGER extract) with
+# columns address, city, zip, lat, lon, and falls back to ZIP centroids when given.
+
+CACHE_FILE = "geocode_cache.sqlite"
+
+SUFFIXES = {
+    "STREET": "ST", "AVENUE": "AVE", "BOULEVARD": "BLVD", "DRIVE": "DR", "ROAD": "RD",
+    "LANE": "LN", "COURT": "CT", "PLACE": "PL", "CIRCLE": "CIR", "HIGHWAY": "HWY",
+    "PARKWAY": "PKWY", "TERRACE": "TER", "NORTH": "N", "SOUTH": "S", "EAST": "E", "WEST": "W",
+}
+
+
+def normalize_address(address, city, zip_code):
+    text = f"{address} {city} {str(zip_code)[:5]}".upper()
+    text = re.sub(r"[^A-Z0-9 ]", " ", text)
+    words = [SUFFIXES.get(word, word) for word in text.split()]
+    return " ".join(words)
+
+
+class LocalLookupBackend:
+    """Offline backend: exact match on normalized address, then ZIP centroid."""
+
+    name = "local"
+
+    def __init__(self, points_file="address_points.csv", zip_file="zip_centroids.csv"):
+        digest = hashlib.sha256()
+        for path in (points_file, zip_file):
+            if os.path.exists(path):
+                with open(path, "rb") as file:
+                    for block in iter(lambda: file.read(1 << 20), b""):
+                        digest.update(block)
+            digest.update(b"\0")
+        self.source = f"{self.name}:{digest.hexdigest()[:16]}"
+
+        points = pd.read_csv(points_file, dtype=str)
+        points["key"] = [
+            normalize_address(a, c, z) for a, c, z in zip(points["address"], points["city"], points["zip"])
+        ]
+        self.points = dict(zip(points["key"], zip(points["lat"].astype(float), points["lon"].astype(float))))
+
+        self.zips = {}
+        try:
+            zips = pd.read_csv(zip_file, dtype=str)  # columns: zip, lat, lon
+            self.zips = dict(zip(zips["zip"].str[:5], zip(zips["lat"].astype(float), zips["lon"].astype(float))))
+        except FileNotFoundError:
+            pass
+
+    def lookup_batch(self, keys):
+        results = []
+        for key in keys:
+            if key in self.points:
+                lat, lon = self.points[key]
+                results.append((key, lat, lon, "address"))
+                continue
+            zip_code = key.rsplit(" ", 1)[-1]
+            if zip_code in self.zips:
+                lat, lon = self.zips[zip_code]
+                results.append((key, lat, lon, "zip"))
+            else:
+                results.append((key, None, None, "unmatched"))
+        return results
+
+    async def geocode_batch(self, keys):
+        # Table lookups are CPU work; run them off the event loop like a network call would be
+        return await asyncio.to_thread(self.lookup_batch, keys)
+
+
+BACKENDS = {
+    "local": LocalLookupBackend,
+}
+
+
+def open_cache(path=CACHE_FILE):
+    connection = sqlite3.connect(path)
+    columns = [row[1] for row in connection.execute("PRAGMA table_info(geocodes)")]
+    if columns and "source" not in columns:
+        connection.execute("DROP TABLE geocodes")  # results of an unknown backend and reference version
+    connection.execute(
+        "CREATE TABLE IF NOT EXISTS geocodes ("
+        "address TEXT, source TEXT, lat REAL, lon REAL, match_type TEXT, PRIMARY KEY (address, source))"
+    )
+    return connection
+
+
+async def geocode_all(backend, keys, batch_size, concurrency):
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def run(batch):
+        async with semaphore:
+            return await backend.geocode_batch(batch)
+
+    batches = [keys[i:i + batch_size] for i in range(0, len(keys), batch_size)]
+    results = await asyncio.gather(*(run(batch) for batch in batches))
+    return [row for batch in results for row in batch]
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Geocode voter addresses with a local cache")
+    parser.add_argument("--input", default="muslim_voters_with_vote_status.csv")
+    parser.add_argument("--output", default="muslim_voters_geocoded.csv")
+    parser.add_argument("--backend", default="local", choices=sorted(BACKENDS))
+    parser.add_argument("--address-column", default="Address")
+    parser.add_argument("--zip-column", default="Zip")
+    parser.add_argument("--batch-size", type=int, default=1000)
+    parser.add_argument("--concurrency", type=int, default=8)
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+
+    # Step 1: Normalize and deduplicate addresses
+    df = pd.read_csv(args.input, dtype={args.zip_column: str})
+    df["address_key"] = [
+        normalize_address(a, c, z)
+        for a, c, z in zip(df[args.address_column].fillna(""), df["City"].fillna(""), df[args.zip_column].fillna(""))
+    ]
+    unique_keys = df["address_key"].drop_duplicates()
+
+    # Step 2: Only geocode addresses the current backend and reference tables have not seen yet
+    backend = BACKENDS[args.backend]()
+    cache = open_cache()
+    cache.execute("DELETE FROM geocodes WHERE source LIKE ? AND source != ?", [backend.name + ":%", backend.source])
+    cache.commit()
+    cached = pd.read_sql_query("SELECT address FROM geocodes WHERE source = ?", cache, params=[backend.source])["address"]
+    new_keys = unique_keys[~unique_keys.isin(cached)].tolist()
+
+    # Step 3: Geocode the new addresses in bounded-concurrency batches and persist them
+    geocode_start = time.perf_counter()
+    if new_keys:
+        results = asyncio.run(geocode_all(backend, new_keys, args.batch_size, args.concurrency))
+        cache.executemany("INSERT OR REPLACE INTO geocodes VALUES (?, ?, ?, ?, ?)",
+                          [(key, backend.source, lat, lon, match_type) for key, lat, lon, match_type in results])
+        cache.commit()
+    geocode_seconds = time.perf_counter() - geocode_start
+
+    # Step 4: Attach coordinates to every voter row
+    geocodes = pd.read_sql_query("SELECT address AS address_key, lat, lon, match_type FROM geocodes WHERE source = ?",
+                                 cache, params=[backend.source])
+    cache.close()
+    merged = pd.merge(df, geocodes, on="address_key", how="left")
+    merged.to_csv(args.output, index=False)
+
+    # Step 5: Throughput report
+    match_counts = merged["match_type"].value_counts()
+    print(f"Voter rows:        {len(df):,}")
+    print(f"Unique addresses:  {len(unique_keys):,}")
+    print(f"Cache hits:        {len(unique_keys) - len(new_keys):,}")
+    print(f"Newly geocoded:    {len(new_keys):,} in {geocode_seconds:.2f}s "
+          f"({len(new_keys) / max(geocode_seconds, 1e-9):,.0f} addresses/s)")
+    for match_type, count in match_counts.items():
+        print(f"  {match_type:<10} {count:,} rows ({count / len(merged) * 100:.1f}%)")
+    print(f"Total time:        {time.perf_counter() - start:.2f}s")
+    print(f"✅ Saved to {args.output}")
@@ -0,0 +1,272 @@
+import numpy as np
+
+# Small GeoJSON helpers that do not need geopandas/shapely.
+
+
+def simplify_line(points, tolerance):
+    """Douglas-Peucker simplification of a polyline (array of [x, y]); both end points are kept."""
+    points = np.asarray(points, dtype=float)
+    if len(points) <= 2 or tolerance <= 0:
+        return points
+
+    keep = np.zeros(len(points), dtype=bool)
+    keep[0] = keep[-1] = True
+    stack = [(0, len(points) - 1)]
+    while stack:
+        start, end = stack.pop()
+        if end <= start + 1:
+            continue
+        segment = points[start + 1:end]
+        a, b = points[start], points[end]
+        direction = b - a
+        length = np.hypot(direction[0], direction[1])
+        if length == 0:
+            distances = np.hypot(segment[:, 0] - a[0], segment[:, 1] - a[1])
+        else:
+            distances = np.abs(direction[0] * (segment[:, 1] - a[1]) - direction[1] * (segment[:, 0] - a[0])) / length
+        farthest = int(np.argmax(distances))
+        if distances[farthest] > tolerance:
+            index = start + 1 + farthest
+            keep[index] = True
+            stack.append((start, index))
+            stack.append((index, end))
+    return points[keep]
+
+
+def simplify_topology(geojson_data, tolerance, precision=6):
+    """Return a copy of a polygon FeatureCollection simplified over its shared topology
+    (tolerance in degrees): the arcs of to_topojson() are simplified once each, so two features
+    keep exactly the same border and no gaps or slivers open between them. The arcs of a ring
+    that would drop below 4 points are kept whole."""
+    topology = to_topojson(geojson_data, precision)
+    scale, translate = topology["transform"]["scale"][0], topology["transform"]["translate"]
+    arcs = [np.cumsum(np.asarray(arc, dtype=float).reshape(-1, 2), axis=0) for arc in topology["arcs"]]
+    simplified = [simplify_line(arc, tolerance / scale) for arc in arcs]
+
+    def ring_points(arc_ids):
+        parts = [simplified[i] if i >= 0 else simplified[~i][::-1] for i in arc_ids]
+        return np.concatenate([parts[0]] + [part[1:] for part in parts[1:]])
+
+    geometries = topology["objects"]["boundaries"]["geometries"]
+    rings = [ring for g in geometries if g["type"] is not None
+             for polygon in ([g["arcs"]] if g["type"] == "Polygon" else g["arcs"]) for ring in polygon]
+    for arc_ids in rings:
+        if len(ring_points(arc_ids)) < 4:
+            for i in arc_ids:
+                simplified[i if i >= 0 else ~i] = arcs[i if i >= 0 else ~i]
+
+    def decode(arc_ids):
+        points = ring_points(arc_ids) * scale + np.asarray(translate)
+        return np.round(points, precision).tolist()
+
+    features = []
+    for feature, entry in zip(geojson_data["features"], geometries):
+        geometry = feature.get("geometry")
+        if entry["type"] == "Polygon":
+            geometry = {"type": "Polygon", "coordinates": [decode(ring) for ring in entry["arcs"]]}
+        elif entry["type"] == "MultiPolygon":
+            geometry = {"type": "MultiPolygon",
+                        "coordinates": [[decode(ring) for ring in polygon] for polygon in entry["arcs"]]}
+        features.append({"type": "Feature", "properties": feature.get("properties", {}), "geometry": geometry})
+    return {"type": "FeatureCollection", "features": features}
+
+
+def count_vertices(geojson_data):
+    total = 0
+    for feature in geojson_data["features"]:
+        geometry = feature.get("geometry") or {}
+        if geometry.get("type") == "Polygon":
+            total += sum(len(ring) for ring in geometry["coordinates"])
+        elif geometry.get("type") == "MultiPolygon":
+            total += sum(len(ring) for polygon in geometry["coordinates"] for ring in polygon)
+    return total
+
+
+def round_geojson(geojson_data, precision=5, keep_properties=None):
+    """Round every coordinate to `precision` decimals and drop repeated points.
+    keep_properties limits the properties kept on each feature (None keeps all)."""
+
+    def round_ring(ring):
+        rounded = []
+        for lon, lat in ((round(p[0], precision), round(p[1], precision)) for p in ring):
+            if not rounded or rounded[-1] != [lon, lat]:
+                rounded.append([lon, lat])
+        return rounded if len(rounded) >= 4 else [[round(p[0], precision), round(p[1], precision)] for p in ring]
+
+    features = []
+    for feature in geojson_data["features"]:
+        properties = feature.get("properties", {})
+        if keep_properties is not None:
+            properties = {k: properties.get(k) for k in keep_properties}
+        geometry = feature.get("geometry")
+        if geometry and geometry["type"] == "Polygon":
+            geometry = {"type": "Polygon", "coordinates": [round_ring(r) for r in geometry["coordinates"]]}
+        elif geometry and geometry["type"] == "MultiPolygon":
+            geometry = {"type": "MultiPolygon",
+                        "coordinates": [[round_ring(r) for r in polygon] for polygon in geometry["coordinates"]]}
+        features.append({"type": "Feature", "properties": properties, "geometry": geometry})
+    return {"type": "FeatureCollection", "features": features}
+
+
+def to_topojson(geojson_data, precision=5):
+    """TopoJSON-style encoding of a polygon FeatureCollection: coordinates are quantized to
+    `precision` decimals, rings are cut at junctions into arcs, and every arc shared by two
+    neighbouring features (in either direction) is stored once, delta-encoded."""
+    scale = 10.0 ** -precision
+    all_points = [p for f in geojson_data["features"] for ring in _rings(f.get("geometry")) for p in ring]
+    x0 = round(min(p[0] for p in all_points), precision) if all_points else 0.0
+    y0 = round(min(p[1] for p in all_points), precision) if all_points else 0.0
+
+    def quantize(ring):
+        points = []
+        for p in ring:
+            q = (int(round((p[0] - x0) / scale)), int(round((p[1] - y0) / scale)))
+            if not points or points[-1] != q:
+                points.append(q)
+        if points[0] != points[-1]:
+            points.append(points[0])
+        return points
+
+    # Step 1: Quantize every ring and collect each point's neighbours
+    geometries = []
+    neighbours = {}
+    for feature in geojson_data["features"]:
+        geometry = feature.get("geometry")
+        if geometry is None or geometry["type"] not in ("Polygon", "MultiPolygon"):
+            geometries.append((feature, None))
+            continue
+        polygons = [geometry["coordinates"]] if geometry["type"] == "Polygon" else geometry["coordinates"]
+        quantized = [[quantize(ring) for ring in polygon] for polygon in polygons]
+        for polygon in quantized:
+            for ring in polygon:
+                n = len(ring) - 1
+                for i in range(n):
+                    neighbours.setdefault(ring[i], set()).update((ring[(i - 1) % n], ring[(i + 1) % n]))
+        geometries.append((feature, quantized))
+
+    # Step 2: Cut rings at junctions (points with more than two neighbours) and dedupe the arcs
+    arcs, arc_ids = [], {}
+
+    def arc_id(points):
+        key = tuple(points)
+        if key in arc_ids:
+            return arc_ids[key]
+        reverse_key = key[::-1]
+        if reverse_key in arc_ids:
+            return ~arc_ids[reverse_key]
+        arc_ids[key] = len(arcs)
+        arcs.append(points)
+        return arc_ids[key]
+
+    def encode_ring(ring):
+        open_ring = ring[:-1]
+        junctions = [i for i, p in enumerate(open_ring) if len(neighbours[p]) > 2]
+        if not junctions:
+            # Closed ring with no junction: start at the smallest point, in a canonical direction
+            start = open_ring.index(min(open_ring))
+            rotated = open_ring[start:] + open_ring[:start]
+            reverse = [rotated[0]] + rotated[:0:-1]
+            forward = rotated + [rotated[0]]
+            backward = reverse + [reverse[0]]
+            if tuple(backward) < tuple(forward):
+                return [~arc_id(backward)]
+            return [arc_id(forward)]
+        rotated = open_ring[junctions[0]:] + open_ring[:junctions[0]] + [open_ring[junctions[0]]]
+        cut_points = [i for i, p in enumerate(rotated) if len(neighbours[p]) > 2]
+        return [arc_id(rotated[a:b + 1]) for a, b in zip(cut_points, cut_points[1:])]
+
+    topology_geometries = []
+    for feature, quantized in geometries:
+        entry = {"properties": feature.get("properties", {})}
+        if quantized is None:
+            entry["type"] = None
+        elif feature["geometry"]["type"] == "Polygon":
+            entry["type"] = "Polygon"
+            entry["arcs"] = [encode_ring(ring) for ring in quantized[0]]
+        else:
+            entry["type"] = "MultiPolygon"
+            entry["arcs"] = [[encode_ring(ring) for ring in polygon] for polygon in quantized]
+        topology_geometries.append(entry)
+
+    # Step 3: Delta-encode the arcs
+    encoded_arcs = []
+    for points in arcs:
+        previous = (0, 0)
+        deltas = []
+        for point in points:
+            deltas.append([point[0] - previous[0], point[1] - previous[1]])
+            previous = point
+        encoded_arcs.append(deltas)
+
+    return {
+        "type": "Topology",
+        "transform": {"scale": [scale, scale], "translate": [x0, y0]},
+        "objects": {"boundaries": {"type": "GeometryCollection", "geometries": topology_geometries}},
+        "arcs": encoded_arcs,
+    }
+
+
+def _rings(geometry):
+    if not geometry:
+        return []
+    if geometry["type"] == "Polygon":
+        return geometry["coordinates"]
+    if geometry["type"] == "MultiPolygon":
+        return [ring for polygon in geometry["coordinates"] for ring in polygon]
+    return []
+
+
+def feature_bounds(geojson_data):
+    """(n, 4) array of [min_lon, min_lat, max_lon, max_lat] per feature (NaN for empty geometries)."""
+    bounds = np.full((len(geojson_data["features"]), 4), np.nan)
+    for i, feature in enumerate(geojson_data["features"]):
+        rings = _rings(feature.get("geometry"))
+        if rings:
+            points = np.concatenate([np.asarray(ring, dtype=float)[:, :2] for ring in rings])
+            bounds[i] = [points[:, 0].min(), points[:, 1].min(), points[:, 0].max(), points[:, 1].max()]
+    return bounds
+
+
+def build_rtree(bounds, node_size=16):
+    """Packed (Sort-Tile-Recursive) R-tree over feature bounds.
+    Returns {"node_size", "order", "levels"}: levels[0] holds the feature boxes in `order`,
+    and node i of levels[k] covers nodes i*node_size .. (i+1)*node_size-1 of levels[k-1]."""
+    valid = np.flatnonzero(~np.isnan(bounds).any(axis=1))
+    centers = (bounds[valid, :2] + bounds[valid, 2:]) / 2
+
+    # Sort into vertical slabs by x, then by y inside each slab
+    slab_size = node_size * int(np.ceil(np.sqrt(max(len(valid), 1) / node_size)))
+    by_x = np.argsort(centers[:, 0], kind="stable")
+    order = np.concatenate([
+        by_x[start:start + slab_size][np.argsort(centers[by_x[start:start + slab_size], 1], kind="stable")]
+        for start in range(0, len(valid), slab_size)
+    ]) if len(valid) else by_x
+    boxes = bounds[valid[order]]
+
+    levels = [boxes]
+    while len(levels[-1]) > 1:
+        children = levels[-1]
+        starts = np.arange(0, len(children), node_size)
+        levels.append(np.column_stack([
+            np.minimum.reduceat(children[:, 0], starts), np.minimum.reduceat(children[:, 1], starts),
+            np.maximum.reduceat(children[:, 2], starts), np.maximum.reduceat(children[:, 3], starts),
+        ]))
+    return {"node_size": node_size, "order": valid[order].tolist(), "levels": [level.tolist() for level in levels]}
+
+
+def query_rtree(tree, bbox):
+    """Indices of the features whose bounds intersect bbox = [min_lon, min_lat, max_lon, max_lat]."""
+    levels, node_size = tree["levels"], tree["node_size"]
+    min_x, min_y, max_x, max_y = bbox
+    found = []
+    stack = [(len(levels) - 1, i) for i in range(len(levels[-1]))]
+    while stack:
+        level, i = stack.pop()
+        box = levels[level][i]
+        if box[2] < min_x or box[0] > max_x or box[3] < min_y or box[1] > max_y:
+            continue
+        if level == 0:
+            found.append(tree["order"][i])
+        else:
+            stack.extend((level - 1, j) for j in range(i * node_size, min((i + 1) * node_size, len(levels[level - 1]))))
+    return sorted(found)
@@ -0,0 +1,179 @@
+import argparse
+import os
+import time
+import numpy as np
+import pandas as pd
+from RenderTables import MIN_VOTERS
+from Step11_publishAggregates import complementary_suppression, primary_suppression
+
+# Hexagon grid layer: geocoded voters (GeocodeVoters.py) binned into equal-area hexagons, so
+# areas can be compared without huge rural counties or tiny cities skewing the picture.
+#
+# The grid is a pure numpy stand-in for H3 (not a dependency): pointy-top hexagons in axial
+# (q, r) coordinates on a cylindrical equal-area projection with its standard parallel through
+# California, so every cell at a resolution has the same area. Resolutions are numbered like H3
+# and use about the same edge lengths.
+#
+# Voters are binned once, at the finest resolution. Every coarser level is rolled up from the
+# level below it: a cell's parent is the coarser cell containing its center (as with H3, parents
+# only approximately cover their children), and counts are summed with a bincount.
+#
+# Cells are suppressed like the published aggregates (Step11_publishAggregates.py, with
+# k = MIN_VOTERS): fewer than k voters hides the cell's counts, and a voted or not-voted count
+# between 1 and k - 1 hides its turnout. Complementary suppression over the parent -> children
+# hierarchy, for both, hides more cells where a hidden one could otherwise be worked out from its
+# parent minus its siblings.
+#
+# hexbins.npz holds per resolution r<res>_q, _r, _total, _voted and _percent (_total NaN where the
+# cell is suppressed, _voted and _percent NaN where its turnout is), the same fields as the
+# aggregate files.
+
+HEX_FILE = "hexbins.npz"
+GEOCODED_FILE = "muslim_voters_geocoded.csv"
+HEX_RESOLUTIONS = {5: 8.544, 6: 3.229, 7: 1.221, 8: 0.461}  # resolution -> edge length (km)
+
+EARTH_RADIUS_KM = 6371.0088
+STANDARD_PARALLEL = np.radians(37.5)
+SQRT3 = np.sqrt(3.0)
+
+
+def project(lon, lat):
+    """Lon/lat degrees -> x/y km (cylindrical equal-area, true scale along STANDARD_PARALLEL)."""
+    x = EARTH_RADIUS_KM * np.radians(lon) * np.cos(STANDARD_PARALLEL)
+    y = EARTH_RADIUS_KM * np.sin(np.radians(lat)) / np.cos(STANDARD_PARALLEL)
+    return x, y
+
+
+def unproject(x, y):
+    lon = np.degrees(x / (EARTH_RADIUS_KM * np.cos(STANDARD_PARALLEL)))
+    lat = np.degrees(np.arcsin(np.clip(y * np.cos(STANDARD_PARALLEL) / EARTH_RADIUS_KM, -1, 1)))
+    return lon, lat
+
+
+def hex_cells(x, y, edge):
+    """Axial (q, r) of the hexagon containing each point (cube rounding)."""
+    q = (SQRT3 / 3 * x - y / 3) / edge
+    r = (2 / 3 * y) / edge
+    s = -q - r
+    rq, rr, rs = np.round(q), np.round(r), np.round(s)
+    dq, dr, ds = np.abs(rq - q), np.abs(rr - r), np.abs(rs - s)
+    fix_q = (dq > dr) & (dq > ds)
+    fix_r = ~fix_q & (dr > ds)
+    rq = np.where(fix_q, -rr - rs, rq)
+    rr = np.where(fix_r, -rq - rs, rr)
+    return rq.astype(np.int64), rr.astype(np.int64)
+
+
+def hex_centers(q, r, edge):
+    return edge * SQRT3 * (q + r / 2), edge * 1.5 * r
+
+
+def aggregate_cells(q, r, weights):
+    """Unique (q, r) cells, the summed weights (dict of arrays) per cell and the cell of each input."""
+    keys = q * (1 << 32) + (r + (1 << 31))
+    cells, first, inverse = np.unique(keys, return_index=True, return_inverse=True)
+    sums = {name: np.bincount(inverse, weights=w, minlength=len(cells)).astype(np.int64)
+            for name, w in weights.items()}
+    return q[first], r[first], sums, inverse
+
+
+def hex_geojson(q, r, edge):
+    """FeatureCollection of the hexagons, feature id = position in the arrays."""
+    cx, cy = hex_centers(q, r, edge)
+    angles = np.radians(30 + 60 * np.arange(7))  # pointy-top corners, closed ring
+    lon, lat = unproject(cx[:, None] + edge * np.cos(angles), cy[:, None] + edge * np.sin(angles))
+    rings = np.round(np.stack([lon, lat], axis=-1), 5).tolist()
+    return {
+        "type": "FeatureCollection",
+        "features": [
+            {"type": "Feature", "id": str(i), "properties": {}, "geometry": {"type": "Polygon", "coordinates": [ring]}}
+            for i, ring in enumerate(rings)
+        ],
+    }
+
+
+def load_hexbins(path=HEX_FILE):
+    if not os.path.exists(path):
+        return None
+    with np.load(path, allow_pickle=False) as store:
+        return {name: store[name] for name in store.files}
+
+
+def hex_layer(hexbins, resolution):
+    """(DataFrame of the cells at one resolution, its GeoJSON)."""
+    prefix = f"r{resolution}_"
+    cells = pd.DataFrame({
+        "Muslim_Total": hexbins[prefix + "total"],
+        "Muslim_Voted": hexbins[prefix + "voted"],
+        "Muslim_Voted_Percent": hexbins[prefix + "percent"],
+    })
+    return cells, hex_geojson(hexbins[prefix + "q"], hexbins[prefix + "r"], HEX_RESOLUTIONS[resolution])
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Bin geocoded voters into a multi-resolution hexagon grid")
+    parser.add_argument("--input", default=GEOCODED_FILE)
+    args = parser.parse_args()
+    start = time.perf_counter()
+
+    # Step 1: Geocoded voters (rows without coordinates are not binned)
+    voters = pd.read_csv(args.input, usecols=["lat", "lon", "Voted"])
+    located = voters.dropna(subset=["lat", "lon"])
+    voted = (located["Voted"].astype(str).str.lower() == "yes").to_numpy(dtype=np.int64)
+    x, y = project(located["lon"].to_numpy(dtype=float), located["lat"].to_numpy(dtype=float))
+
+    # Step 2: Bin every voter at the finest resolution
+    resolutions = sorted(HEX_RESOLUTIONS, reverse=True)
+    finest = resolutions[0]
+    q, r = hex_cells(x, y, HEX_RESOLUTIONS[finest])
+    q, r, sums, _ = aggregate_cells(q, r, {"total": np.ones(len(q), dtype=np.int64), "voted": voted})
+    levels = {finest: (q, r, sums)}
+
+    # Step 3: Roll every coarser level up from the one below it (cell centers, not voters)
+    parents = {}  # resolution -> index of each cell's parent one level coarser
+    for child, parent in zip(resolutions, resolutions[1:]):
+        child_q, child_r, child_sums = levels[child]
+        cx, cy = hex_centers(child_q, child_r, HEX_RESOLUTIONS[child])
+        parent_q, parent_r = hex_cells(cx, cy, HEX_RESOLUTIONS[parent])
+        parent_q, parent_r, parent_sums, parents[child] = aggregate_cells(parent_q, parent_r, child_sums)
+        levels[parent] = (parent_q, parent_r, parent_sums)
+
+    # Step 4: Small-cell suppression over all levels at once. Cell i (numbered across levels) has
+    # child group 1 + i; the cells of one parent form its child group, the coarsest cells group 0
+    sizes = [len(levels[resolution][0]) for resolution in resolutions]
+    offset = dict(zip(resolutions, np.cumsum([0] + sizes)))
+    totals = np.concatenate([levels[resolution][2]["total"] for resolution in resolutions])
+    groups = np.zeros(len(totals), dtype=np.int64)
+    child_groups = np.full(len(totals), -1, dtype=np.int64)
+    for child, parent in zip(resolutions, resolutions[1:]):
+        groups[offset[child]:offset[parent]] = 1 + offset[parent] + parents[child]
+        child_groups[offset[parent]:offset[parent] + len(levels[parent][0])] = \
+            1 + offset[parent] + np.arange(len(levels[parent][0]))
+    voted_counts = np.concatenate([levels[resolution][2]["voted"] for resolution in resolutions])
+    total_primary, turnout_primary = primary_suppression(totals, voted_counts, MIN_VOTERS)
+    cells = np.arange(len(totals))
+    total_hidden = complementary_suppression(totals, groups, child_groups, total_primary, cells)
+    turnout_hidden = complementary_suppression(totals, groups, child_groups, turnout_primary | total_hidden, cells)
+
+    # Step 5: Save the arrays with the suppressed counts and turnout left empty
+    store = {}
+    print(f"{'Resolution':>10} {'Edge':>9} {'Cells':>9} {'Median voters':>14} {'Suppressed':>11} {'Turnout hidden':>15}")
+    for resolution in sorted(levels):
+        q, r, sums = levels[resolution]
+        suppressed = total_hidden[offset[resolution]:offset[resolution] + len(q)]
+        turnout_suppressed = turnout_hidden[offset[resolution]:offset[resolution] + len(q)]
+        total = np.where(suppressed, np.nan, sums["total"])
+        voted_count = np.where(turnout_suppressed, np.nan, sums["voted"])
+        with np.errstate(divide="ignore", invalid="ignore"):
+            percent = np.round(voted_count / total * 100, 2)
+        prefix = f"r{resolution}_"
+        store.update({prefix + "q": q.astype(np.int32), prefix + "r": r.astype(np.int32),
+                      prefix + "total": total, prefix + "voted": voted_count, prefix + "percent": percent})
+        print(f"{resolution:>10} {HEX_RESOLUTIONS[resolution]:>7.3f}km {len(q):>9,} "
+              f"{np.median(sums['total']):>14,.0f} {suppressed.mean():>10.0%} {turnout_suppressed.mean():>14.0%}")
+
+    temp_file = HEX_FILE + ".tmp.npz"
+    np.savez_compressed(temp_file, **store)
+    os.replace(temp_file, HEX_FILE)
+    print(f"✅ Saved to {HEX_FILE} ({len(located):,} of {len(voters):,} voters located) "
+          f"in {time.perf_counter() - start:.1f}s")
@@ -1,22 +1,313 @@
 import streamlit as st
 import pandas as pd
 import plotly.graph_objects as go
+import streamlit.components.v1 as components
 import json
-import geopandas as gpd
 import re
-st.set_page_config(layout="wide", page_title="California Map")
+import os
+from concurrent.futures import ThreadPoolExecutor
+from DashboardBundle import read_bundle, read_artifacts_version
+from BuildMapPayloads import read_manifest
+from PreprocessBoundaries import boundary_path
+from RenderTables import GEOGRAPHIES, load_stats_table, classed_trace_args
+from VoterDB import read_aggregate
+from States import STATE, read_county_lookup
+st.set_page_config(layout="wide", page_title=f"{STATE['name']} Map")
+
+# Startup data comes from dashboard_bundle.pkl (DashboardBundle.py) in one read; without the
+# bundle, aggregates come from muslim_voters.sqlite (or their CSVs) and boundary files (preprocessed copies from
+# PreprocessBoundaries.py when present) are read in parallel. The modules behind the extra panels
+# (Crosswalks, HexGrid, DotDensity, ChangeReport) are imported by the panels that use them.
+@st.cache_resource
+def load_bundle():
+    return read_bundle()
+
+@st.cache_data
+def load_aggregate(file_name):
+    bundle = load_bundle()
+    if bundle is not None:
+        return bundle["aggregates"][file_name]
+    return read_aggregate(file_name)
+
+# Precomputed color classes, confidence intervals and small-n suppression (Step10_computeMapStats.py)
+@st.cache_data
+def load_map_stats(key):
+    bundle = load_bundle()
+    if bundle is not None:
+        return bundle["stats"][("", key)]
+    return load_stats_table(key)
+
+@st.cache_resource
+def load_geojsons():
+    bundle = load_bundle()
+    if bundle is not None:
+        return bundle["geojson"]
+
+    def read_geojson(path):
+        with open(boundary_path(path), "r") as file:
+            return path, json.load(file)
+
+    with ThreadPoolExecutor() as pool:
+        return dict(pool.map(read_geojson, [geo["geojson_file"] for geo in GEOGRAPHIES]))
+
+# Boundaries as a URL to the pre-built payload (BuildMapPayloads.py, served from ./static): the
+# browser downloads each file once, gzip-compressed, and caches it across sections and reruns.
+# Without the payloads the GeoJSON is embedded in the figure as before. Only ./static next to this
+# script is served, so an app run from a state's working directory (RunStates.py) embeds it too.
+STATIC_SERVED = os.path.realpath("static") == os.path.join(os.path.dirname(os.path.realpath(__file__)), "static")
+
+@st.cache_data
+def load_payload_manifest():
+    return read_manifest() if STATIC_SERVED else None
+
+def geojson_source(file_name):
+    manifest = load_payload_manifest()
+    if manifest is not None and file_name in manifest["files"]:
+        asset = manifest["files"][file_name]["geojson"]
+        return f"app/static/geo/{asset}?v={asset.split('.')[1]}"
+    return load_geojsons()[file_name]
+
+# === Hot reload ===
+# WatchPipeline.py bumps artifacts_version.json after it swaps in rebuilt artifacts. The first
+# session to see a new version clears the shared caches; every open session polls the version
+# and reruns itself, so viewers get the new data without a restart.
+@st.cache_resource
+def loaded_artifacts_version():
+    return {"version": read_artifacts_version()}
+
+artifacts_version = read_artifacts_version()
+if loaded_artifacts_version()["version"] != artifacts_version:
+    st.cache_data.clear()
+    st.cache_resource.clear()
+    loaded_artifacts_version()
+st.session_state["artifacts_version"] = artifacts_version
+
+@st.fragment(run_every="5s")
+def watch_artifacts():
+    if read_artifacts_version() != st.session_state["artifacts_version"]:
+        st.rerun()
+
+watch_artifacts()
+
+# === Cross-geography breakdown ===
+# Precomputed sparse crosswalks (Crosswalks.py): e.g. a city's voters by congressional district
+# without another pass over the voter file. Shown under the map in both views.
+@st.cache_resource
+def load_crosswalk_store():
+    from Crosswalks import load_crosswalks
+    return load_crosswalks()
+
+@st.cache_data
+def county_names():
+    lookup = read_county_lookup()
+    return dict(zip(lookup["CountyCode"].astype(str), lookup["County_Name"].str.strip().str.title()))
+
+def crosstab_panel():
+    from Crosswalks import crosstab, labels
+    crosswalks = load_crosswalk_store()
+    if crosswalks is None:
+        return
+    titles = {geo["key"]: geo["title"] for geo in GEOGRAPHIES}
+    def label(key, value):
+        return county_names().get(value, value) if key == "county" else (value or "(none)")
+
+    st.header("Muslim Voters Across Geographies")
+    col1, col2, col3 = st.columns(3)
+    source = col1.selectbox("Geography", list(titles), index=1, format_func=titles.get)
+    targets = [k for k in titles if k != source]
+    target = col2.selectbox("Broken down by", targets, index=targets.index("congressional_district")
+                            if "congressional_district" in targets else 0, format_func=titles.get)
+    value = col3.selectbox(titles[source], sorted(labels(crosswalks, source)), format_func=lambda v: label(source, v))
+
+    table = crosstab(crosswalks, source, target, [value]).drop(columns=[source])
+    table[target] = [label(target, v) for v in table[target]]
+    st.dataframe(table.rename(columns={target: titles[target]}), hide_index=True, use_container_width=True)
+
+# === Hexagon grid ===
+# Geocoded voters in equal-area hexagons (HexGrid.py), so areas compare on the same footing
+# regardless of county or city size. Cells and their GeoJSON come straight from the arrays.
+@st.cache_resource
+def load_hex_store():
+    from HexGrid import load_hexbins
+    return load_hexbins()
+
+@st.cache_resource
+def load_hex_layer(resolution):
+    from HexGrid import hex_layer
+    return hex_layer(load_hex_store(), resolution)
+
+def hex_panel():
+    from HexGrid import HEX_RESOLUTIONS
+    if load_hex_store() is None:
+        return
+    st.header("Muslim Voters on a Hexagon Grid")
+    col1, col2 = st.columns(2)
+    resolution = col1.select_slider("Hexagon size", sorted(HEX_RESOLUTIONS), value=6,
+                                    format_func=lambda r: f"{HEX_RESOLUTIONS[r]:g} km edge")
+    metric = col2.radio("Show", ["Muslim_Total", "Muslim_Voted_Percent"], horizontal=True,
+                        format_func={"Muslim_Total": "Muslim Voter Count", "Muslim_Voted_Percent": "Muslim Voting %"}.get)
+    cells, geojson_data = load_hex_layer(resolution)
+    values = cells[metric]
+    hover_text = ("Muslim Voters: " + cells["Muslim_Total"].map(lambda n: "suppressed" if pd.isna(n) else f"{n:,.0f}")
+                  + "<br>Voted: " + cells["Muslim_Voted_Percent"].map(lambda p: "suppressed" if pd.isna(p) else f"{p:.2f}%"))
+    fig = go.Figure(go.Choroplethmapbox(
+        geojson=geojson_data,
+        locations=cells.index.astype(str),
+        z=values,
+        zmin=0,
+        zmax=100 if metric == "Muslim_Voted_Percent" else max(float(values.fillna(0).quantile(0.95)), 1.0),
+        colorscale="Greens",
+        colorbar=dict(title="Muslim Voting %" if metric == "Muslim_Voted_Percent" else "Muslim Voter Count"),
+        text=hover_text,
+        hovertemplate="%{text}<extra></extra>",
+        marker_opacity=0.7,
+        marker_line_width=0,
+    ))
+    fig.update_layout(
+        mapbox_style="carto-positron",
+        mapbox_zoom=STATE["zoom"],
+        mapbox_center=STATE["center"],
+        margin={"r": 0, "t": 0, "l": 0, "b": 0},
+        height=600,
+    )
+    st.plotly_chart(fig, use_container_width=True)
+
+# === Dot density ===
+# One dot per few Muslim voters, placed at random inside its school district or city
+# (DotDensity.py). All dots are a single WebGL scatter trace colored by category; numpy arrays
+# go to the browser as binary typed arrays, so even millions of dots stay responsive.
+DOT_COLORS = ["#9e9e9e", "#1b7837", "#c2a5cf"]
+
+@st.cache_resource
+def load_dot_layer(key):
+    from DotDensity import load_dots
+    return load_dots(key)
+
+def dot_panel():
+    from DotDensity import DOT_LAYERS, DOT_CATEGORIES
+    available = [key for key in DOT_LAYERS if load_dot_layer(key) is not None]
+    if not available:
+        return
+    titles = {geo["key"]: geo["title"] for geo in GEOGRAPHIES}
+    st.header("Muslim Voters as Dots")
+    key = st.selectbox("Dots placed by", available, format_func=titles.get)
+    dots = load_dot_layer(key)
+    colorscale = []
+    for i, color in enumerate(DOT_COLORS):
+        colorscale += [[i / len(DOT_COLORS), color], [(i + 1) / len(DOT_COLORS), color]]
+    fig = go.Figure(go.Scattermapbox(
+        lon=dots["lon"],
+        lat=dots["lat"],
+        mode="markers",
+        marker=dict(
+            size=3,
+            opacity=0.7,
+            color=dots["category"] + 0.5,
+            cmin=0,
+            cmax=len(DOT_COLORS),
+            colorscale=colorscale,
+            colorbar=dict(tickvals=[i + 0.5 for i in range(len(DOT_CATEGORIES))], ticktext=DOT_CATEGORIES),
+        ),
+        hoverinfo="skip",
+    ))
+    fig.update_layout(
+        mapbox_style="carto-positron",
+        mapbox_zoom=STATE["zoom"],
+        mapbox_center=STATE["center"],
+        margin={"r": 0, "t": 0, "l": 0, "b": 0},
+        height=600,
+    )
+    st.plotly_chart(fig, use_container_width=True)
+    st.caption(f"{len(dots['lon']):,} dots")
+
+# === What changed ===
+# Differences between two aggregate snapshots (ChangeReport.py), e.g. before and after the last
+# voter-file refresh. Areas with a significant turnout change or a material change in voter
+# count are colored; the rest of the layer stays empty.
+@st.cache_resource
+def load_change_history(key, paths):
+    from ChangeReport import load_history
+    return load_history(key, paths)
+
+def turnout_text(percent):
+    return "not shown" if pd.isna(percent) else f"{percent}%"
+
+def change_panel():
+    from ChangeReport import snapshot_paths, compare
+    paths = tuple(snapshot_paths())
+    if len(paths) < 2:
+        return
+    titles = {geo["key"]: geo["title"] for geo in GEOGRAPHIES}
+    st.header("What Changed")
+    col1, col2, col3 = st.columns(3)
+    key = col1.selectbox("Geography", list(titles), format_func=titles.get, key="change_geography")
+    history = load_change_history(key, paths)
+    labels = history["labels"]
+    before = col2.selectbox("Compared with", range(len(labels) - 1), index=len(labels) - 2,
+                            format_func=lambda i: labels[i])
+    metric = col3.radio("Show", ["Turnout_Change", "Total_Change"], horizontal=True, key="change_metric",
+                        format_func={"Turnout_Change": "Turnout change", "Total_Change": "Voter count change"}.get)
+    changes = compare(history, before, len(labels) - 1)
+    flagged = changes[changes["Significant"] if metric == "Turnout_Change" else changes["Material"]]
+    geo = next(g for g in GEOGRAPHIES if g["key"] == key)
+    limit = max(float(flagged[metric].abs().max()), 1.0) if len(flagged) else 1.0
+    fig = go.Figure(go.Choroplethmapbox(
+        geojson=geojson_source(geo["geojson_file"]),
+        featureidkey=geo["featureidkey"],
+        locations=flagged.index,
+        z=flagged[metric],
+        zmin=-limit,
+        zmax=limit,
+        colorscale="RdBu",
+        colorbar=dict(title="Turnout change (pts)" if metric == "Turnout_Change" else "Voter count change"),
+        text=flagged.index + "<br>Voters: " + flagged["Total_Before"].map("{:,.0f}".format) + " → "
+             + flagged["Total_After"].map("{:,.0f}".format) + "<br>Turnout: "
+             + flagged["Turnout_Before"].map(turnout_text) + " → " + flagged["Turnout_After"].map(turnout_text),
+        hovertemplate="%{text}<extra></extra>",
+        marker_opacity=0.8,
+        marker_line_width=0.5,
+    ))
+    fig.update_layout(
+        mapbox_style="carto-positron",
+        mapbox_zoom=STATE["zoom"],
+        mapbox_center=STATE["center"],
+        margin={"r": 0, "t": 0, "l": 0, "b": 0},
+        height=600,
+    )
+    st.plotly_chart(fig, use_container_width=True)
+    st.caption(f"{len(flagged):,} of {len(changes):,} areas changed since {labels[before]}")
+    st.dataframe(changes[changes["Status"] != ""].sort_values(metric, key=abs, ascending=False),
+                 use_container_width=True)
+
+# === Map view ===
+# One zoomable map (ExportZoomMap.py) that loads only the county layer up front and fetches the
+# finer layers as the map is zoomed; the six full-state maps below render only when asked for.
+@st.cache_data
+def load_zoom_page(path):
+    with open(path, "r") as file:
+        return file.read()
+
+ZOOM_PAGE = os.path.join("static", "zoom", "count.embed.html")
+if STATIC_SERVED and os.path.exists(ZOOM_PAGE) and st.sidebar.radio("Map view", ["Zoomable map", "All maps"]) == "Zoomable map":
+    st.title(f"Eligible Muslim Voters in {STATE['name']}")
+    components.html(load_zoom_page(ZOOM_PAGE), height=700)
+    hex_panel()
+    dot_panel()
+    change_panel()
+    crosstab_panel()
+    st.stop()
 
 # App title
-st.title("Eligible Muslim Voters by County in California")
+st.title(f"Eligible Muslim Voters by County in {STATE['name']}")
 
 # === Load Data ===
-muslim_data = pd.read_csv("MuslimVoterStatsByCountyCode.csv")               # Contains countyCode, count
-county_lookup = pd.read_csv("DHCS_County_Code_Reference_Table.csv")           # Contains DHCS_County_Code, County_Name
+muslim_data = load_aggregate("MuslimVoterStatsByCountyCode.csv")               # Contains countyCode, count
+county_lookup = read_county_lookup()                                          # Contains CountyCode, County_Name
 
 # === Join the two datasets on county code ===
 merged_df = pd.merge(
     muslim_data,
-    county_lookup.rename(columns={"DHCS_County_Code": "CountyCode"}),  # Rename for merging
+    county_lookup,
     on="CountyCode",
     how="left"
 )
@@ -36,34 +327,17 @@ merged_df["hover_text"] = (
     "Voting %: <span style='color:red'>" + merged_df["Muslim_Voted_Percent"].astype(str) + "%</span>"
 )
 
-population_min = merged_df["Muslim_Numbers"].min()
-population_max = merged_df["Muslim_Numbers"].max()
 # Create hover text
 # merged_df["hover_text"] = merged_df["County_Name"] + ": " + merged_df["Muslim_Numbers"].apply(lambda x: f"{x:,}") + " people"
-population_min = max(1, population_min)  # Ensures that the smallest value is at least 1
-
-# === Load GeoJSON for California counties ===
-with open("California_County_Boundaries.geojson", "r") as file:
-    geojson_data = json.load(file)
 
 # === Plot Choropleth ===
+stats = load_map_stats("county")
 fig = go.Figure(go.Choroplethmapbox(
-    geojson=geojson_data,
+    geojson=geojson_source("California_County_Boundaries.geojson"),
     locations=merged_df["County_Name"],  # Match with featureidkey
-    z=merged_df["Muslim_Numbers"],  # Use Muslim population as color scale
-    text=merged_df["hover_text"],
+    **classed_trace_args(stats, "Muslim_Total", merged_df["County_Name"]),
     featureidkey="properties.CountyName",  # Match with GeoJSON property
     hovertemplate="%{text}<extra></extra>",
-    colorscale=[
-        [0, "white"],  # 0% of the range (minimum population) is white
-        [0.05, "yellow"],  # 5% of the range is a very light yellow (just above white)
-        [0.2, "lightgreen"],  # 20% of the range is yellow
-        # [0.4, "lightgreen"],  # 40% of the range is light green
-        [0.7, "green"],  # 70% of the range is green
-        [1, "darkgreen"]  # 100% of the range (maximum population) is dark green
-    ],
-    zmin=population_min,  # Set min value for color scale
-    zmax=population_max,  # Set max value for color scale
     marker_opacity=0.8,
     marker_line_width=1.2
 ))
@@ -71,8 +345,8 @@ fig = go.Figure(go.Choroplethmapbox(
 # Map layout
 fig.update_layout(
     mapbox_style="carto-positron",
-    mapbox_zoom=5,
-    mapbox_center={"lat": 36.7783, "lon": -119.4179},  # California center
+    mapbox_zoom=STATE["zoom"],
+    mapbox_center=STATE["center"],
     margin={"r": 0, "t": 0, "l": 0, "b": 0},
     height=600,
     width=500,
@@ -81,15 +355,57 @@ fig.update_layout(
     )
 )
 
-# Show in Streamlit
-st.plotly_chart(fig, use_container_width=True)
+# Show in Streamlit (clicking a county opens the drill-down panel below)
+county_event = st.plotly_chart(
+    fig,
+    use_container_width=True,
+    on_select="rerun",
+    selection_mode="points",
+    key="county_map"
+)
+
+# === Drill-down: county -> city -> school district ===
+# DrilldownIndex.json is built by Step7_buildDrilldownIndex.py and kept in memory,
+# so a click is a dict lookup instead of a rescan of the voter file.
+@st.cache_resource
+def load_drilldown_index():
+    bundle = load_bundle()
+    if bundle is not None and bundle["drilldown"] is not None:
+        return bundle["drilldown"]
+    with open("DrilldownIndex.json", "r") as file:
+        return json.load(file)
+
+def children_table(children):
+    rows = [
+        {"Name": name, "Muslim_Total": c["Muslim_Total"], "Muslim_Voted": c["Muslim_Voted"],
+         "Muslim_Voted_Percent": c["Muslim_Voted_Percent"]}
+        for name, c in children.items()
+    ]
+    return pd.DataFrame(rows).sort_values("Muslim_Total", ascending=False)
+
+selected_points = county_event.selection.points if county_event else []
+if selected_points:
+    drilldown_index = load_drilldown_index()
+    selected_county = selected_points[0].get("location")
+    county_entry = drilldown_index.get(selected_county)
+
+    if county_entry is None:
+        st.info(f"No drill-down data for {selected_county}.")
+    else:
+        st.subheader(f"{selected_county} County by City")
+        st.dataframe(children_table(county_entry["children"]), hide_index=True, use_container_width=True)
+
+        selected_city = st.selectbox("Show school districts for city", sorted(county_entry["children"]))
+        city_entry = county_entry["children"][selected_city]
+        st.subheader(f"{selected_city} by School District")
+        st.dataframe(children_table(city_entry["children"]), hide_index=True, use_container_width=True)
 
 ######################## City ########################
 # Streamlit app title
-st.title("Eligible Muslim Voters by City in California")
+st.title(f"Eligible Muslim Voters by City in {STATE['name']}")
 
 # Load the data
-data = pd.read_csv("MuslimsPerCityVoting.csv")
+data = load_aggregate("MuslimsPerCityVoting.csv")
 data["City"] = data["City"].str.strip().str.title()
 
 data["Muslim_Numbers"] = data["Muslim_Total"].astype(int)
@@ -103,44 +419,27 @@ data["hover_text"] = (
     "Voting %: <span style='color:red'>" + data["Muslim_Voted_Percent"].astype(str) + "%</span>"
 )
 
-population_min = data["Muslim_Numbers"].min()
-population_max = data["Muslim_Numbers"].max()
-population_min = max(1, population_min)  # Ensures that the smallest value is at least 1
 
 # Hover text
 # data["hover_text"] = data["City"] + ": " + data["MuslimNumbers"].apply(lambda x: f"{x:,}")
 
-# Load GeoJSON
-with open("California_Incorporated_Cities.geojson", "r") as file:
-    geojson_data = json.load(file)
-
 # Choropleth map
+stats = load_map_stats("city")
 fig = go.Figure(go.Choroplethmapbox(
-    geojson=geojson_data,
+    geojson=geojson_source("California_Incorporated_Cities.geojson"),
     locations=data["City"],  # Match with featureidkey
-    z=data["Muslim_Numbers"],  # Use Muslim population as color scale
+    **classed_trace_args(stats, "Muslim_Total", data["City"]),
     featureidkey="properties.CITY",  # Match with GeoJSON property
-    colorscale=[
-        [0, "white"],  # 0% of the range (minimum population) is white
-        [0.05, "yellow"],  # 5% of the range is light yellow (just above white)
-        [0.2, "lightgreen"],  # 20% of the range is light green
-        [0.4, "green"],  # 40% of the range is green
-        [0.7, "darkgreen"],  # 70% of the range is dark green
-        [1, "darkgreen"]  # 100% of the range (maximum population) remains dark green
-    ],
-    zmin=population_min,  # Set min value for color scale
-    zmax=population_max,  # Set max value for color scale
     marker_opacity=0.8,
     marker_line_width=1,
-    text=data["hover_text"],
     hovertemplate="%{text}<extra></extra>"
 ))
 
 # Layout
 fig.update_layout(
     mapbox_style="carto-positron",
-    mapbox_zoom=5,
-    mapbox_center={"lat": 36.7783, "lon": -119.4179},  # California center
+    mapbox_zoom=STATE["zoom"],
+    mapbox_center=STATE["center"],
     margin={"r": 0, "t": 0, "l": 0, "b": 0},
     height=600,
     width=500,
@@ -155,10 +454,10 @@ st.plotly_chart(fig, use_container_width=True)
 ######################## School district ############
 
 # Title
-st.title("Eligible Muslim Voters by School District in California")
+st.title(f"Eligible Muslim Voters by School District in {STATE['name']}")
 
 # === Step 1: Load Muslim voter data and matching results ===
-data = pd.read_csv("MuslimPerSchoolDistrictVoted2.csv")  # columns: school_district, count
+data = load_aggregate("MuslimPerSchoolDistrictVoted2.csv")  # columns: school_district, count
 matches = pd.read_csv("district_name_matching_results.csv")  # columns: School District, Matched DistrictName
 
 # Merge the cleaned district names
@@ -171,9 +470,8 @@ merged = merged[merged["Matched DistrictName"].str.strip() != ""]
 
 
 
-# === Step 2: Load California School District GeoJSON ===
-with open("California_School_District_Areas_2022-23.geojson", "r") as file:
-    geojson_data = json.load(file)
+# === Step 2: Load School District GeoJSON ===
+geojson_data = load_geojsons()["California_School_District_Areas_2022-23.geojson"]
 
 
 # Format data types
@@ -188,36 +486,18 @@ merged["hover_text"] = (
     "Voted Muslims: <span style='color:red'>" + merged["Muslim_Voted"].apply(lambda x: f"{x:,}") + "</span><br>" +
     "Voting %: <span style='color:red'>" + merged["Muslim_Voted_Percent"].astype(str) + "%</span>"
 )
-population_min = merged["Muslim_Total"].min()
-population_max = merged["Muslim_Total"].max()
-population_min = max(1, population_min)  # Ensures that the smallest value is at least 1
-
-# z_values = merged["Muslim_Voted_Percent"]
-#
-# # Voting % dynamic range
-# voting_min = z_values.min()
-# voting_max = z_values.max()
+
 # === Step 3: Create hover text ===
 # merged["hover_text"] = merged["Matched DistrictName"] + ": " + merged["count"].apply(lambda x: f"{x:,}") + " people"
 
 # === Step 4: Choropleth Map ===
+stats = load_map_stats("school_district")
 fig = go.Figure(go.Choroplethmapbox(
-    geojson=geojson_data,
+    geojson=geojson_source("California_School_District_Areas_2022-23.geojson"),
     locations=merged["Matched DistrictName"],
-    z=merged["Muslim_Total"],  # Use Muslim population as color scale
-    text=merged["hover_text"],
+    **classed_trace_args(stats, "Muslim_Total", merged["Matched DistrictName"]),
     featureidkey="properties.DistrictName",  # Match with GeoJSON property
     hovertemplate="%{text}<extra></extra>",
-    colorscale=[
-        [0, "white"],  # 0% of the range (minimum population) is white
-        [0.01, "yellow"],  # 5% of the range is light yellow (just above white)
-        [0.1, "lightgreen"],  # 20% of the range is light green
-        [0.2, "green"],  # 40% of the range is green
-        [0.5, "darkgreen"],  # 70% of the range is dark green
-        [1, "darkgreen"]  # 100% of the range (maximum population) remains dark green
-    ],
-    zmin=population_min,  # Set min value for color scale
-    zmax=population_max,  # Set max value for color scale
     marker_opacity=0.8,
     marker_line_width=1.2
 ))
@@ -259,8 +539,8 @@ for _, row in centroid_df.iterrows():
 # === Step 6: Layout ===
 fig.update_layout(
     mapbox_style="carto-positron",
-    mapbox_zoom=5,
-    mapbox_center={"lat": 36.7783, "lon": -119.4179},  # California center
+    mapbox_zoom=STATE["zoom"],
+    mapbox_center=STATE["center"],
     margin={"r": 0, "t": 0, "l": 0, "b": 0},
     height=600,
     width=500,
@@ -270,10 +550,10 @@ fig.update_layout(
 # === Step 7: Show the Map ===
 st.plotly_chart(fig, use_container_width=True)
 ################### CD ##################
-st.title("Eligible Muslim Voters by Congressional District in California")
+st.title(f"Eligible Muslim Voters by Congressional District in {STATE['name']}")
 
 # === Load Data ===
-data = pd.read_csv("MuslimsPerCongressionalDistrictVoting.csv")
+data = load_aggregate("MuslimsPerCongressionalDistrictVoting.csv")
 def extract_district_number(text):
     match = re.search(r'(\d+)', str(text))
     if match:
@@ -285,9 +565,6 @@ data["District_Number"] = data["Congressional District"].apply(extract_district_
 # Step 2: Force proper formatting
 data["District_Number"] = data["District_Number"].apply(lambda x: f"{int(x):02d}" if pd.notna(x) else None)
 
-# === Load GeoJSON ===
-with open("Congressional_Districts_CA.geojson", "r") as file:
-    geojson_data = json.load(file)
 
 # === Format the hover text ===
 data["Muslim_Total"] = data["Muslim_Total"].astype(int)
@@ -301,34 +578,14 @@ data["hover_text"] = (
     "Voting %: <span style='color:red'>" + data["Muslim_Voted_Percent"].astype(str) + "%</span>"
 )
 
-# Choose to color by % instead of total number
-# z_values = data["Muslim_Voted_Percent"]
-#
-# # Voting % dynamic range
-# voting_min = z_values.min()
-# voting_max = z_values.max()
-population_min = merged["Muslim_Total"].min()
-population_max = merged["Muslim_Total"].max()
-population_min = max(1, population_min)  # Ensures that the smallest value is at least 1
-
 # Choropleth
+stats = load_map_stats("congressional_district")
 fig = go.Figure(go.Choroplethmapbox(
-    geojson=geojson_data,
+    geojson=geojson_source("Congressional_Districts_CA.geojson"),
     locations='Congressional District ' + data["District_Number"],  # Match with featureidkey
-    z=data["Muslim_Total"],  # Use Muslim population as color scale
-    zmin=population_min,  # Set min value for color scale
-    zmax=population_max,  # Set max value for color scale
+    **classed_trace_args(stats, "Muslim_Total", 'Congressional District ' + data["District_Number"]),
     featureidkey="properties.CongDistri",  # Match with GeoJSON property
-    text=data["hover_text"],
     hovertemplate="%{text}<extra></extra>",
-    colorscale=[
-        [0, "white"],  # 0% of the range (minimum population) is white
-        [0.01, "yellow"],  # 5% of the range is light yellow (just above white)
-        [0.1, "lightgreen"],  # 20% of the range is light green
-        [0.2, "green"],  # 40% of the range is green
-        [0.5, "darkgreen"],  # 70% of the range is dark green
-        [1, "darkgreen"]  # 100% of the range (maximum population) remains dark green
-    ],
     marker_opacity=0.8,
     marker_line_width=1.2
 ))
@@ -337,8 +594,8 @@ fig = go.Figure(go.Choroplethmapbox(
 # Layout
 fig.update_layout(
     mapbox_style="carto-positron",
-    mapbox_zoom=5,
-    mapbox_center={"lat": 36.7783, "lon": -119.4179},
+    mapbox_zoom=STATE["zoom"],
+    mapbox_center=STATE["center"],
     margin={"r": 0, "t": 0, "l": 0, "b": 0},
     height=600,
     width=500,
@@ -352,12 +609,12 @@ st.plotly_chart(fig, use_container_width=True)
 ################## LD ##################
 
 # Title
-st.title("Eligible Muslim Voters by Legislative District in California")
+st.title(f"Eligible Muslim Voters by Legislative District in {STATE['name']}")
 st.subheader("State Assembly District")
 
 
 # --- Load Data ---
-data = pd.read_csv("MuslimsPerStateAssemblyDistrictVoting.csv")
+data = load_aggregate("MuslimsPerStateAssemblyDistrictVoting.csv")
 data["State Assembly District"] = data["State Assembly District"].astype(str).str.strip()
 
 # Extract District Numbers
@@ -375,8 +632,7 @@ data = data.dropna(subset=["District_Number"])
 data["AssemblyDistrictName"] = "Assembly District " + data["District_Number"]
 
 
-with open("CA_AssemblyDistricts_WGS84.geojson") as f:
-    geojson_data = json.load(f)
+geojson_data = load_geojsons()["CA_AssemblyDistricts_WGS84.geojson"]
 
 # --- Load GeoJSON ---
 # with open("Legislative-AssemblyDistrict.geojson", "r") as f:
@@ -395,11 +651,6 @@ data["hover_text"] = (
 )
 
 # --- Choropleth Map ---
-# voting_min = data["Muslim_Voted_Percent"].min()
-# voting_max = data["Muslim_Voted_Percent"].max()
-population_min = merged["Muslim_Total"].min()
-population_max = merged["Muslim_Total"].max()
-population_min = max(1, population_min)  # Ensures that the smallest value is at least 1
 
 # 1. Extract valid Assembly District names from GeoJSON
 valid_district_names = {
@@ -412,30 +663,21 @@ valid_district_names = {
 valid_names = {f["properties"]["AssemblyDistrictName"] for f in geojson_data["features"]}
 data = data[data["AssemblyDistrictName"].isin(valid_names)]
 
+stats = load_map_stats("assembly_district")
 fig = go.Figure(go.Choroplethmapbox(
-    geojson=geojson_data,
+    geojson=geojson_source("CA_AssemblyDistricts_WGS84.geojson"),
     locations=data["AssemblyDistrictName"],  # Match with featureidkey
-    z=data["Muslim_Total"],  # Use Muslim population as color scale
-    zmin=population_min,  # Set min value for color scale
-    zmax=population_max,  # Set max value for color scale
+    **classed_trace_args(stats, "Muslim_Total", data["AssemblyDistrictName"]),
     featureidkey="properties.AssemblyDistrictName",  # Match with GeoJSON property
-    text=data["hover_text"],
     hovertemplate="%{text}<extra></extra>",
-    colorscale=[
-        [0, "white"],  # 0% of the range (minimum population) is white
-        [0.05, "yellow"],  # 5% of the range is light yellow (just above white)
-        [0.1, "lightgreen"],  # 20% of the range is light green
-        [0.4, "green"],  # 40% of the range is green
-        [1, "darkgreen"]  # 100% of the range (maximum population) remains dark green
-    ],
     marker_opacity=0.8,
     marker_line_width=1.2
 ))
 
 fig.update_layout(
     mapbox_style="carto-positron",
-    mapbox_zoom=5,
-    mapbox_center={"lat": 36.7783, "lon": -119.4179},
+    mapbox_zoom=STATE["zoom"],
+    mapbox_center=STATE["center"],
     margin={"r": 0, "t": 0, "l": 0, "b": 0},
     height=600,
     width=700,
@@ -448,7 +690,7 @@ st.plotly_chart(fig, use_container_width=True)
 
 ################### Senta
 st.subheader("State Senate District")
-data = pd.read_csv("MuslimsPerStateSenateDistrictVoting.csv")
+data = load_aggregate("MuslimsPerStateSenateDistrictVoting.csv")
 
 # Extract and clean District Numbers
 def extract_district_numberSenta(text):
@@ -460,10 +702,8 @@ def extract_district_numberSenta(text):
 data["District_Number"] = data["State Senate District"].apply(extract_district_numberSenta)
 data = data.dropna(subset=["District_Number"])
 
-import json
 
-with open("CA_SenateDistricts_WGS84.geojson") as f:
-    geojson_data = json.load(f)
+geojson_data = load_geojsons()["CA_SenateDistricts_WGS84.geojson"]
 
 # === Prepare Hover Text ===
 data["Muslim_Total"] = data["Muslim_Total"].astype(int)
@@ -477,12 +717,6 @@ data["hover_text"] = (
     "Voting %: <span style='color:red'>" + data["Muslim_Voted_Percent"].astype(str) + "%</span>"
 )
 
-# z_values = data["Muslim_Voted_Percent"]
-# voting_min = data["Muslim_Voted_Percent"].min()
-# voting_max = data["Muslim_Voted_Percent"].max()
-population_min = merged["Muslim_Total"].min()
-population_max = merged["Muslim_Total"].max()
-population_min = max(1, population_min)  # Ensures that the smallest value is at least 1
 
 # === Build Choropleth Map ===
 # Check GeoJSON keys
@@ -491,22 +725,13 @@ population_min = max(1, population_min)  # Ensures that the smallest value is at
 geojson_districts = {str(f["properties"]["district"]).strip() for f in geojson_data["features"]}
 data = data[data["District_Number"].isin(geojson_districts)].copy()
 
+stats = load_map_stats("senate_district")
 fig = go.Figure(go.Choroplethmapbox(
-    geojson=geojson_data,
+    geojson=geojson_source("CA_SenateDistricts_WGS84.geojson"),
     locations=data["District_Number"],
-    z=data["Muslim_Total"],
-    zmin=population_min,
-    zmax=population_max,
+    **classed_trace_args(stats, "Muslim_Total", data["District_Number"]),
     featureidkey="properties.district",
-    text=data["hover_text"],
     hovertemplate="%{text}<extra></extra>",
-    colorscale=[
-        [0, "white"],  # 0% of the range (minimum population) is white
-        [0.05, "yellow"],  # 5% of the range is light yellow (just above white)
-        [0.1, "lightgreen"],  # 20% of the range is light green
-        [0.4, "green"],  # 40% of the range is green
-        [1, "darkgreen"]  # 100% of the range (maximum population) remains dark green
-    ],
     marker_opacity=0.8,
     marker_line_width=1.2,
 ))
@@ -515,8 +740,8 @@ fig = go.Figure(go.Choroplethmapbox(
 # Layout
 fig.update_layout(
     mapbox_style="carto-positron",
-    mapbox_zoom=5,
-    mapbox_center={"lat": 36.7783, "lon": -119.4179},
+    mapbox_zoom=STATE["zoom"],
+    mapbox_center=STATE["center"],
     margin={"r": 0, "t": 0, "l": 0, "b": 0},
     height=600,
     width=600,
@@ -528,3 +753,8 @@ fig.update_layout(
 )
 
 st.plotly_chart(fig, use_container_width=True)
+
+hex_panel()
+dot_panel()
+change_panel()
+crosstab_panel()
@@ -1,22 +1,154 @@
 import streamlit as st
 import pandas as pd
 import plotly.graph_objects as go
+import streamlit.components.v1 as components
 import json
-import geopandas as gpd
 import re
-st.set_page_config(layout="wide", page_title="California Map")
+import os
+from concurrent.futures import ThreadPoolExecutor
+from DashboardBundle import read_bundle, read_artifacts_version
+from BuildMapPayloads import read_manifest
+from PreprocessBoundaries import boundary_path
+from RenderTables import GEOGRAPHIES, load_stats_table, classed_trace_args
+from GOTVRanking import SHARED_RANKING
+from VoterDB import read_aggregate
+from States import STATE, read_county_lookup
+st.set_page_config(layout="wide", page_title=f"{STATE['name']} Map")
+
+# Startup data comes from dashboard_bundle.pkl (DashboardBundle.py) in one read; without the
+# bundle, aggregates come from muslim_voters.sqlite (or their CSVs) and boundary files (preprocessed copies from
+# PreprocessBoundaries.py when present) are read in parallel.
+@st.cache_resource
+def load_bundle():
+    return read_bundle()
+
+@st.cache_data
+def load_aggregate(file_name):
+    bundle = load_bundle()
+    if bundle is not None:
+        return bundle["aggregates"][file_name]
+    return read_aggregate(file_name)
+
+# Precomputed color classes, confidence intervals and small-n suppression (Step10_computeMapStats.py)
+@st.cache_data
+def load_map_stats(key, data_dir=""):
+    bundle = load_bundle()
+    if bundle is not None:
+        return bundle["stats"][(data_dir, key)]
+    return load_stats_table(key, data_dir)
+
+@st.cache_resource
+def load_geojsons():
+    bundle = load_bundle()
+    if bundle is not None:
+        return bundle["geojson"]
+
+    def read_geojson(path):
+        with open(boundary_path(path), "r") as file:
+            return path, json.load(file)
+
+    with ThreadPoolExecutor() as pool:
+        return dict(pool.map(read_geojson, [geo["geojson_file"] for geo in GEOGRAPHIES]))
+
+# Boundaries as a URL to the pre-built payload (BuildMapPayloads.py, served from ./static): the
+# browser downloads each file once, gzip-compressed, and caches it across sections and reruns.
+# Without the payloads the GeoJSON is embedded in the figure as before. Only ./static next to this
+# script is served, so an app run from a state's working directory (RunStates.py) embeds it too.
+STATIC_SERVED = os.path.realpath("static") == os.path.join(os.path.dirname(os.path.realpath(__file__)), "static")
+
+@st.cache_data
+def load_payload_manifest():
+    return read_manifest() if STATIC_SERVED else None
+
+def geojson_source(file_name):
+    manifest = load_payload_manifest()
+    if manifest is not None and file_name in manifest["files"]:
+        asset = manifest["files"][file_name]["geojson"]
+        return f"app/static/geo/{asset}?v={asset.split('.')[1]}"
+    return load_geojsons()[file_name]
+
+# === Hot reload ===
+# WatchPipeline.py bumps artifacts_version.json after it swaps in rebuilt artifacts. The first
+# session to see a new version clears the shared caches; every open session polls the version
+# and reruns itself, so viewers get the new data without a restart.
+@st.cache_resource
+def loaded_artifacts_version():
+    return {"version": read_artifacts_version()}
+
+artifacts_version = read_artifacts_version()
+if loaded_artifacts_version()["version"] != artifacts_version:
+    st.cache_data.clear()
+    st.cache_resource.clear()
+    loaded_artifacts_version()
+st.session_state["artifacts_version"] = artifacts_version
+
+@st.fragment(run_every="5s")
+def watch_artifacts():
+    if read_artifacts_version() != st.session_state["artifacts_version"]:
+        st.rerun()
+
+watch_artifacts()
+
+# === Election selector ===
+# Per-election slices are precomputed by Step9_countTurnoutHistory.py into history/<election>/
+# with the same file names as the Step outputs; without them the maps use the current files.
+data_dir = ""
+if os.path.exists("history/elections.json"):
+    with open("history/elections.json", "r") as file:
+        election_slices = json.load(file)
+    election_labels = [e["election"] for e in election_slices]
+    selected_election = st.sidebar.selectbox("Election", election_labels, index=len(election_labels) - 1)
+    data_dir = os.path.join("history", election_slices[election_labels.index(selected_election)]["folder"], "")
+
+# === GOTV targets ===
+# Areas ranked by the votes turnout work could add (GOTVRanking.py), under each map. The ranking
+# syncs with a map's render table once per artifacts version; the filters only read the top of
+# its heap, so changing them does not rescan the data.
+def gotv_table(key):
+    SHARED_RANKING.sync((data_dir, key), lambda: load_map_stats(key, data_dir)[0], artifacts_version)
+    st.subheader("Get-out-the-vote targets")
+    col1, col2, col3, col4 = st.columns(4)
+    top = col1.number_input("Show top", 5, 500, 15, step=5, key=f"gotv_top_{key}")
+    min_total = col2.number_input("Min. Muslim voters", 0, value=0, step=50, key=f"gotv_min_{key}")
+    max_turnout = col3.slider("Max. turnout %", 0, 100, 100, key=f"gotv_turnout_{key}")
+    search = col4.text_input("Search", key=f"gotv_search_{key}")
+    table = SHARED_RANKING.ranked((data_dir, key), top, min_total, max_turnout, search)
+    st.dataframe(
+        table.rename(columns={"label": "Area", "Muslim_Total": "Muslim Voters", "Muslim_Voted": "Voted",
+                              "Muslim_Voted_Percent": "Turnout %",
+                              "Expected_Additional_Votes": "Expected Additional Votes"}),
+        hide_index=True,
+        use_container_width=True,
+        column_config={"Expected Additional Votes": st.column_config.NumberColumn(format="%.1f")},
+    )
+
+# === Map view ===
+# One zoomable map (ExportZoomMap.py) that loads only the county layer up front and fetches the
+# finer layers as the map is zoomed; the six full-state maps below render only when asked for.
+@st.cache_data
+def load_zoom_page(path):
+    with open(path, "r") as file:
+        return file.read()
+
+ZOOM_PAGE = os.path.join("static", "zoom", "turnout.embed.html")
+if STATIC_SERVED and os.path.exists(ZOOM_PAGE) and st.sidebar.radio("Map view", ["Zoomable map", "All maps"]) == "Zoomable map":
+    st.title(f"Muslim Voter Turnout in {STATE['name']}")
+    components.html(f"<script>window.zoomSlice = {json.dumps(data_dir)};</script>" + load_zoom_page(ZOOM_PAGE), height=700)
+    titles = {geo["key"]: geo["title"] for geo in GEOGRAPHIES}
+    gotv_table(st.selectbox("Rank areas by", list(titles), format_func=titles.get))
+    st.stop()
 
 # App title
-st.title("Muslim Voter Turnout by County in California")
+st.title(f"Muslim Voter Turnout by County in {STATE['name']}")
 
 # === Load Data ===
-muslim_data = pd.read_csv("MuslimVoterStatsByCountyCode.csv")               # Contains countyCode, count
-county_lookup = pd.read_csv("DHCS_County_Code_Reference_Table.csv")           # Contains DHCS_County_Code, County_Name
+muslim_data = load_aggregate(data_dir + "MuslimVoterStatsByCountyCode.csv")               # Contains countyCode, count
+county_lookup = read_county_lookup()                                          # Contains CountyCode, County_Name
 
 # === Join the two datasets on county code ===
 merged_df = pd.merge(
     muslim_data,
-    county_lookup.rename(columns={"DHCS_County_Code": "CountyCode"}),  # Rename for merging
+    county_lookup,
     on="CountyCode",
     how="left"
 )
@@ -36,31 +168,15 @@ merged_df["hover_text"] = (
     "Voting %: <span style='color:red'>" + merged_df["Muslim_Voted_Percent"].astype(str) + "%</span>"
 )
 
-voting_min = merged_df["Muslim_Voted_Percent"].min()
-voting_max = merged_df["Muslim_Voted_Percent"].max()
-
-# === Load GeoJSON for California counties ===
-with open("California_County_Boundaries.geojson", "r") as file:
-    geojson_data = json.load(file)
 
 # === Plot Choropleth ===
+stats = load_map_stats("county", data_dir)
 fig = go.Figure(go.Choroplethmapbox(
-    geojson=geojson_data,
+    geojson=geojson_source("California_County_Boundaries.geojson"),
     locations=merged_df["County_Name"],  # Match with featureidkey
-    z=merged_df["Muslim_Voted_Percent"],  # Use Voting Percentage as color scale
-    text=merged_df["hover_text"],
+    **classed_trace_args(stats, "Muslim_Voted_Percent", merged_df["County_Name"]),
     featureidkey="properties.CountyName",  # Match with GeoJSON property
     hovertemplate="%{text}<extra></extra>",
-    colorscale=[
-        [0, "white"],
-        [0.05, "yellow"],
-        [0.2, "lightgreen"],
-        [0.4, "green"],
-        [0.7, "darkgreen"],
-        [1, "darkgreen"]
-    ],
-    zmin=voting_min,  # Set min value for color scale
-    zmax=voting_max,  # Set max value for color scale
     marker_opacity=0.8,
     marker_line_width=1.2
 ))
@@ -68,8 +184,8 @@ fig = go.Figure(go.Choroplethmapbox(
 # Map layout
 fig.update_layout(
     mapbox_style="carto-positron",
-    mapbox_zoom=5,
-    mapbox_center={"lat": 36.7783, "lon": -119.4179},  # California center
+    mapbox_zoom=STATE["zoom"],
+    mapbox_center=STATE["center"],
     margin={"r": 0, "t": 0, "l": 0, "b": 0},
     height=600,
     width=500,
@@ -80,13 +196,14 @@ fig.update_layout(
 
 # Show in Streamlit
 st.plotly_chart(fig, use_container_width=True)
+gotv_table("county")
 
 ######################## City ########################
 # Streamlit app title
-st.title("Muslim Voter Turnout by City in California")
+st.title(f"Muslim Voter Turnout by City in {STATE['name']}")
 
 # Load the data
-data = pd.read_csv("MuslimsPerCityVoting.csv")
+data = load_aggregate(data_dir + "MuslimsPerCityVoting.csv")
 data["City"] = data["City"].str.strip().str.title()
 
 data["Muslim_Numbers"] = data["Muslim_Total"].astype(int)
@@ -104,38 +221,23 @@ data["hover_text"] = (
 # Hover text
 # data["hover_text"] = data["City"] + ": " + data["MuslimNumbers"].apply(lambda x: f"{x:,}")
 
-# Load GeoJSON
-with open("California_Incorporated_Cities.geojson", "r") as file:
-    geojson_data = json.load(file)
-
 # Choropleth map
-voting_min = data["Muslim_Voted_Percent"].min()
-voting_max = data["Muslim_Voted_Percent"].max()
 
+stats = load_map_stats("city", data_dir)
 fig = go.Figure(go.Choroplethmapbox(
-    geojson=geojson_data,
+    geojson=geojson_source("California_Incorporated_Cities.geojson"),
     locations=data["City"],  # Match with featureidkey
-    z=data["Muslim_Voted_Percent"],  # Use Voting Percentage as color scale
+    **classed_trace_args(stats, "Muslim_Voted_Percent", data["City"]),
     featureidkey="properties.CITY",  # Match with GeoJSON property
-    colorscale=[
-        [0, "white"],
-        [0.4, "yellow"],
-        [0.5, "lightgreen"],
-        [0.7, "green"],
-        [1, "darkgreen"]
-    ],
-    zmin=voting_min,  # Set min value for color scale
-    zmax=voting_max,  # Set max value for color scale
     marker_opacity=0.8,
     marker_line_width=1,
-    text=data["hover_text"],
     hovertemplate="%{text}<extra></extra>"
 ))
 # Layout
 fig.update_layout(
     mapbox_style="carto-positron",
-    mapbox_zoom=5,
-    mapbox_center={"lat": 36.7783, "lon": -119.4179},  # California center
+    mapbox_zoom=STATE["zoom"],
+    mapbox_center=STATE["center"],
     margin={"r": 0, "t": 0, "l": 0, "b": 0},
     height=600,
     width=500,
@@ -145,15 +247,16 @@ fig.update_layout(
 )
 
 st.plotly_chart(fig, use_container_width=True)
+gotv_table("city")
 
 
 ######################## School district ############
 
 # Title
-st.title("Muslim Voter Turnout by School District in California")
+st.title(f"Muslim Voter Turnout by School District in {STATE['name']}")
 
 # === Step 1: Load Muslim voter data and matching results ===
-data = pd.read_csv("MuslimPerSchoolDistrictVoted2.csv")  # columns: school_district, count
+data = load_aggregate(data_dir + "MuslimPerSchoolDistrictVoted2.csv")  # columns: school_district, count
 matches = pd.read_csv("district_name_matching_results.csv")  # columns: School District, Matched DistrictName
 
 # Merge the cleaned district names
@@ -166,9 +269,8 @@ merged = merged[merged["Matched DistrictName"].str.strip() != ""]
 
 
 
-# === Step 2: Load California School District GeoJSON ===
-with open("California_School_District_Areas_2022-23.geojson", "r") as file:
-    geojson_data = json.load(file)
+# === Step 2: Load School District GeoJSON ===
+geojson_data = load_geojsons()["California_School_District_Areas_2022-23.geojson"]
 
 
 # Format data types
@@ -184,31 +286,19 @@ merged["hover_text"] = (
     "Voting %: <span style='color:red'>" + merged["Muslim_Voted_Percent"].astype(str) + "%</span>"
 )
 
-z_values = merged["Muslim_Voted_Percent"]
 
 # Voting % dynamic range
-voting_min = z_values.min()
-voting_max = z_values.max()
 # === Step 3: Create hover text ===
 # merged["hover_text"] = merged["Matched DistrictName"] + ": " + merged["count"].apply(lambda x: f"{x:,}") + " people"
 
 # === Step 4: Choropleth Map ===
+stats = load_map_stats("school_district", data_dir)
 fig = go.Figure(go.Choroplethmapbox(
-    geojson=geojson_data,
+    geojson=geojson_source("California_School_District_Areas_2022-23.geojson"),
     locations=merged["Matched DistrictName"],
-    z=z_values,
-    zmin=voting_min,
-    zmax=voting_max,
-    text=merged["hover_text"],
+    **classed_trace_args(stats, "Muslim_Voted_Percent", merged["Matched DistrictName"]),
     featureidkey="properties.DistrictName",
     hovertemplate="%{text}<extra></extra>",
-    colorscale=[
-        [0.0, "white"],
-        [0.2, "yellow"],
-        [0.4, "lightgreen"],
-        [0.7, "green"],
-        [1.0, "darkgreen"]
-    ],
     marker_opacity=0.8,
     marker_line_width=1.2
 ))
@@ -250,8 +340,8 @@ for _, row in centroid_df.iterrows():
 # === Step 6: Layout ===
 fig.update_layout(
     mapbox_style="carto-positron",
-    mapbox_zoom=5,
-    mapbox_center={"lat": 36.7783, "lon": -119.4179},  # California center
+    mapbox_zoom=STATE["zoom"],
+    mapbox_center=STATE["center"],
     margin={"r": 0, "t": 0, "l": 0, "b": 0},
     height=600,
     width=500,
@@ -260,11 +350,12 @@ fig.update_layout(
 
 # === Step 7: Show the Map ===
 st.plotly_chart(fig, use_container_width=True)
+gotv_table("school_district")
 ################### CD ##################
-st.title("Muslim Voter Turnout by Congressional District in California")
+st.title(f"Muslim Voter Turnout by Congressional District in {STATE['name']}")
 
 # === Load Data ===
-data = pd.read_csv("MuslimsPerCongressionalDistrictVoting.csv")
+data = load_aggregate(data_dir + "MuslimsPerCongressionalDistrictVoting.csv")
 def extract_district_number(text):
     match = re.search(r'(\d+)', str(text))
     if match:
@@ -276,10 +367,6 @@ data["District_Number"] = data["Congressional District"].apply(extract_district_
 # Step 2: Force proper formatting
 data["District_Number"] = data["District_Number"].apply(lambda x: f"{int(x):02d}" if pd.notna(x) else None)
 
-# === Load GeoJSON ===
-with open("Congressional_Districts_CA.geojson", "r") as file:
-    geojson_data = json.load(file)
-
 # === Format the hover text ===
 data["Muslim_Total"] = data["Muslim_Total"].astype(int)
 data["Muslim_Voted"] = data["Muslim_Voted"].fillna(0).astype(int)
@@ -292,30 +379,16 @@ data["hover_text"] = (
     "Voting %: <span style='color:red'>" + data["Muslim_Voted_Percent"].astype(str) + "%</span>"
 )
 
-# Choose to color by % instead of total number
-z_values = data["Muslim_Voted_Percent"]
-
 # Voting % dynamic range
-voting_min = z_values.min()
-voting_max = z_values.max()
 
 # Choropleth
+stats = load_map_stats("congressional_district", data_dir)
 fig = go.Figure(go.Choroplethmapbox(
-    geojson=geojson_data,
+    geojson=geojson_source("Congressional_Districts_CA.geojson"),
     locations='Congressional District '+data["District_Number"],
-    z=z_values,
-    zmin=voting_min,
-    zmax=voting_max,
+    **classed_trace_args(stats, "Muslim_Voted_Percent", 'Congressional District '+data["District_Number"]),
     featureidkey="properties.CongDistri",
-    text=data["hover_text"],
     hovertemplate="%{text}<extra></extra>",
-    colorscale=[
-        [0, "white"],
-        [0.4, "yellow"],
-        [0.5, "lightgreen"],
-        [0.7, "green"],
-        [1, "darkgreen"]
-    ],
     marker_opacity=0.8,
     marker_line_width=1.2
 ))
@@ -324,8 +397,8 @@ fig = go.Figure(go.Choroplethmapbox(
 # Layout
 fig.update_layout(
     mapbox_style="carto-positron",
-    mapbox_zoom=5,
-    mapbox_center={"lat": 36.7783, "lon": -119.4179},
+    mapbox_zoom=STATE["zoom"],
+    mapbox_center=STATE["center"],
     margin={"r": 0, "t": 0, "l": 0, "b": 0},
     height=600,
     width=500,
@@ -335,16 +408,17 @@ fig.update_layout(
 )
 
 st.plotly_chart(fig, use_container_width=True)
+gotv_table("congressional_district")
 
 ################## LD ##################
 
 # Title
-st.title("Muslim Voter Turnout by Legislative District in California")
+st.title(f"Muslim Voter Turnout by Legislative District in {STATE['name']}")
 st.subheader("State Assembly District")
 
 
 # --- Load Data ---
-data = pd.read_csv("MuslimsPerStateAssemblyDistrictVoting.csv")
+data = load_aggregate(data_dir + "MuslimsPerStateAssemblyDistrictVoting.csv")
 data["State Assembly District"] = data["State Assembly District"].astype(str).str.strip()
 
 # Extract District Numbers
@@ -362,8 +436,7 @@ data = data.dropna(subset=["District_Number"])
 data["AssemblyDistrictName"] = "Assembly District " + data["District_Number"]
 
 
-with open("CA_AssemblyDistricts_WGS84.geojson") as f:
-    geojson_data = json.load(f)
+geojson_data = load_geojsons()["CA_AssemblyDistricts_WGS84.geojson"]
 
 # --- Load GeoJSON ---
 # with open("Legislative-AssemblyDistrict.geojson", "r") as f:
@@ -382,8 +455,6 @@ data["hover_text"] = (
 )
 
 # --- Choropleth Map ---
-voting_min = data["Muslim_Voted_Percent"].min()
-voting_max = data["Muslim_Voted_Percent"].max()
 # 1. Extract valid Assembly District names from GeoJSON
 valid_district_names = {
     feature["properties"]["AssemblyDistrictName"]
@@ -395,30 +466,21 @@ valid_district_names = {
 valid_names = {f["properties"]["AssemblyDistrictName"] for f in geojson_data["features"]}
 data = data[data["AssemblyDistrictName"].isin(valid_names)]
 
+stats = load_map_stats("assembly_district", data_dir)
 fig = go.Figure(go.Choroplethmapbox(
-    geojson=geojson_data,
+    geojson=geojson_source("CA_AssemblyDistricts_WGS84.geojson"),
     locations=data["AssemblyDistrictName"],
-    z=data["Muslim_Voted_Percent"],
+    **classed_trace_args(stats, "Muslim_Voted_Percent", data["AssemblyDistrictName"]),
     featureidkey="properties.AssemblyDistrictName",  # check your geojson key
-    text=data["hover_text"],
     hovertemplate="%{text}<extra></extra>",
-    colorscale=[
-        [0.0, "white"],
-        [0.3, "yellow"],
-        [0.5, "lightgreen"],
-        [0.7, "green"],
-        [1.0, "darkgreen"]
-    ],
-    zmin=voting_min,
-    zmax=voting_max,
     marker_opacity=0.8,
     marker_line_width=1.2
 ))
 
 fig.update_layout(
     mapbox_style="carto-positron",
-    mapbox_zoom=5,
-    mapbox_center={"lat": 36.7783, "lon": -119.4179},
+    mapbox_zoom=STATE["zoom"],
+    mapbox_center=STATE["center"],
     margin={"r": 0, "t": 0, "l": 0, "b": 0},
     height=600,
     width=700,
@@ -428,10 +490,11 @@ fig.update_layout(
 )
 
 st.plotly_chart(fig, use_container_width=True)
+gotv_table("assembly_district")
 
 ################### Senta
 st.subheader("State Senate District")
-data = pd.read_csv("MuslimsPerStateSenateDistrictVoting.csv")
+data = load_aggregate(data_dir + "MuslimsPerStateSenateDistrictVoting.csv")
 
 # Extract and clean District Numbers
 def extract_district_numberSenta(text):
@@ -443,10 +506,8 @@ def extract_district_numberSenta(text):
 data["District_Number"] = data["State Senate District"].apply(extract_district_numberSenta)
 data = data.dropna(subset=["District_Number"])
 
-import json
 
-with open("CA_SenateDistricts_WGS84.geojson") as f:
-    geojson_data = json.load(f)
+geojson_data = load_geojsons()["CA_SenateDistricts_WGS84.geojson"]
 
 # === Prepare Hover Text ===
 data["Muslim_Total"] = data["Muslim_Total"].astype(int)
@@ -460,9 +521,6 @@ data["hover_text"] = (
     "Voting %: <span style='color:red'>" + data["Muslim_Voted_Percent"].astype(str) + "%</span>"
 )
 
-z_values = data["Muslim_Voted_Percent"]
-voting_min = data["Muslim_Voted_Percent"].min()
-voting_max = data["Muslim_Voted_Percent"].max()
 
 # === Build Choropleth Map ===
 # Check GeoJSON keys
@@ -471,22 +529,13 @@ voting_max = data["Muslim_Voted_Percent"].max()
 geojson_districts = {str(f["properties"]["district"]).strip() for f in geojson_data["features"]}
 data = data[data["District_Number"].isin(geojson_districts)].copy()
 
+stats = load_map_stats("senate_district", data_dir)
 fig = go.Figure(go.Choroplethmapbox(
-    geojson=geojson_data,
+    geojson=geojson_source("CA_SenateDistricts_WGS84.geojson"),
     locations=data["District_Number"],
-    z=data["Muslim_Voted_Percent"],
-    zmin=voting_min,
-    zmax=voting_max,
+    **classed_trace_args(stats, "Muslim_Voted_Percent", data["District_Number"]),
     featureidkey="properties.district",
-    text=data["hover_text"],
     hovertemplate="%{text}<extra></extra>",
-    colorscale=[
-        [0.0, "white"],
-        [0.5, "yellow"],
-        [0.7, "lightgreen"],
-        [0.8, "green"],
-        [1.0, "darkgreen"]
-    ],
     marker_opacity=0.8,
     marker_line_width=1.2,
 ))
@@ -495,8 +544,8 @@ fig = go.Figure(go.Choroplethmapbox(
 # Layout
 fig.update_layout(
     mapbox_style="carto-positron",
-    mapbox_zoom=5,
-    mapbox_center={"lat": 36.7783, "lon": -119.4179},
+    mapbox_zoom=STATE["zoom"],
+    mapbox_center=STATE["center"],
     margin={"r": 0, "t": 0, "l": 0, "b": 0},
     height=600,
     width=600,
@@ -507,4 +556,5 @@ fig.update_layout(
     )
 )
 
-st.plotly_chart(fig, use_container_width=True)
\ No newline at end of file
+st.plotly_chart(fig, use_container_width=True)
+gotv_table("senate_district")
\ No newline at end of file
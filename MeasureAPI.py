@@ -0,0 +1,99 @@
+import argparse
+import asyncio
+import json
+import os
+import socket
+import subprocess
+import sys
+import time
+import urllib.request
+import numpy as np
+from tornado.httpclient import AsyncHTTPClient, HTTPClientError
+from tornado.ioloop import IOLoop
+from RenderTables import GEOGRAPHIES
+
+# Throughput of AggregateAPI.py under concurrent load: the server runs in its own process and a
+# tornado client keeps --concurrency requests in flight over every aggregate, render table and
+# drill-down URL, in three modes:
+#   no cache     the server rebuilds every response (--no-cache)
+#   cached       responses come from the server's cache, gzip-compressed
+#   conditional  cached, and the client sends the ETag it already has (304 Not Modified)
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def start_server(port, no_cache):
+    command = [sys.executable, os.path.join(os.path.dirname(os.path.abspath(__file__)), "AggregateAPI.py"),
+               "--port", str(port)] + (["--no-cache"] if no_cache else [])
+    server = subprocess.Popen(command, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    for _ in range(300):
+        try:
+            urllib.request.urlopen(f"http://127.0.0.1:{port}/api", timeout=1)
+            return server
+        except OSError:
+            time.sleep(0.1)
+    server.kill()
+    raise RuntimeError("AggregateAPI.py did not start")
+
+
+def api_urls(base):
+    urls = [f"{base}/api/aggregates/{geo['key']}" for geo in GEOGRAPHIES]
+    urls += [f"{base}/api/render/{geo['key']}" for geo in GEOGRAPHIES]
+    urls.append(f"{base}/api/drilldown")
+    return urls
+
+
+async def load(urls, total, concurrency, conditional):
+    client = AsyncHTTPClient(max_clients=concurrency)
+    etags = {}
+    if conditional:
+        for url in urls:
+            etags[url] = (await client.fetch(url)).headers["Etag"]
+
+    latencies, received, statuses = [], 0, {}
+
+    async def worker(offset):
+        nonlocal received
+        for i in range(offset, total, concurrency):
+            url = urls[i % len(urls)]
+            headers = {"If-None-Match": etags[url]} if conditional else {}
+            start = time.perf_counter()
+            try:
+                response = await client.fetch(url, headers=headers)
+                code = response.code
+                received += len(response.body or b"")
+            except HTTPClientError as error:
+                code = error.code
+            latencies.append(time.perf_counter() - start)
+            statuses[code] = statuses.get(code, 0) + 1
+
+    start = time.perf_counter()
+    await asyncio.gather(*(worker(offset) for offset in range(concurrency)))
+    elapsed = time.perf_counter() - start
+    client.close()
+    return {"elapsed": elapsed, "latencies": latencies, "bytes": received, "statuses": statuses}
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Measure AggregateAPI.py requests per second under concurrent load")
+    parser.add_argument("--requests", type=int, default=5_000)
+    parser.add_argument("--concurrency", type=int, default=32)
+    args = parser.parse_args()
+
+    print(f"{'Mode':<12} {'Req/s':>8} {'p50':>8} {'p95':>8} {'KB/resp':>8}  Status")
+    for mode in ["no cache", "cached", "conditional"]:
+        port = free_port()
+        server = start_server(port, no_cache=mode == "no cache")
+        try:
+            urls = api_urls(f"http://127.0.0.1:{port}")
+            r = IOLoop.current().run_sync(lambda: load(urls, args.requests, args.concurrency, mode == "conditional"))
+        finally:
+            server.terminate()
+            server.wait()
+        p50, p95 = np.percentile(r["latencies"], [50, 95]) * 1000
+        print(f"{mode:<12} {args.requests / r['elapsed']:>8,.0f} {p50:>6.1f}ms {p95:>6.1f}ms "
+              f"{r['bytes'] / args.requests / 1024:>8.1f}  {json.dumps(r['statuses'])}")
@@ -0,0 +1,71 @@
+import argparse
+import json
+import os
+import subprocess
+import sys
+import time
+
+# Time-to-first-map for Map.py / MapVoting.py, on a cold start (fresh Python process, empty
+# Streamlit caches) and a warm rerun (same process, caches filled), with and without
+# dashboard_bundle.pkl. Each measurement runs the app headless through streamlit's AppTest.
+
+
+def seconds(value, width):
+    """A timing right-aligned in width, or n/a when it was not recorded (e.g. no plotly chart in the
+    default view)."""
+    return f"{value:>{width - 1}.2f}s" if value is not None else f"{'n/a':>{width}}"
+
+
+def measure(app):
+    start = time.perf_counter()
+    import streamlit
+    from streamlit.testing.v1 import AppTest
+    import_seconds = time.perf_counter() - start
+
+    # Record when the first chart is handed to Streamlit
+    first_map = {}
+    original_plotly_chart = streamlit.plotly_chart
+
+    def timed_plotly_chart(*args, **kwargs):
+        first_map.setdefault("seconds", time.perf_counter() - run_start)
+        return original_plotly_chart(*args, **kwargs)
+
+    streamlit.plotly_chart = timed_plotly_chart
+    results = {"import": import_seconds}
+    app_test = AppTest.from_file(app, default_timeout=600)
+    for run in ["cold", "warm"]:
+        first_map.clear()
+        run_start = time.perf_counter()
+        app_test.run()
+        results[f"{run}_first_map"] = first_map.get("seconds")
+        results[f"{run}_full_page"] = time.perf_counter() - run_start
+        if app_test.exception:
+            results["error"] = str(app_test.exception[0].value)
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Measure dashboard time-to-first-map")
+    parser.add_argument("apps", nargs="*", default=["Map.py", "MapVoting.py"])
+    parser.add_argument("--child", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        print(json.dumps(measure(args.child)))
+        sys.exit(0)
+
+    print(f"{'App':<14} {'Mode':<10} {'Imports':>8} {'Cold 1st map':>13} {'Cold page':>10} {'Warm 1st map':>13} {'Warm page':>10}")
+    for app in args.apps:
+        for mode in ["bundle", "no bundle"]:
+            env = dict(os.environ, PYTHONPATH=os.getcwd())
+            if mode == "no bundle":
+                env["DASHBOARD_BUNDLE"] = os.devnull + ".missing"
+            output = subprocess.run(
+                [sys.executable, __file__, "--child", app], env=env, capture_output=True, text=True, check=True
+            ).stdout
+            r = json.loads(output.strip().splitlines()[-1])
+            if "error" in r:
+                print(f"{app:<14} {mode:<10} failed: {r['error']}")
+                continue
+            print(f"{app:<14} {mode:<10} {seconds(r['import'], 8)} {seconds(r['cold_first_map'], 13)} "
+                  f"{seconds(r['cold_full_page'], 10)} {seconds(r['warm_first_map'], 13)} {seconds(r['warm_full_page'], 10)}")
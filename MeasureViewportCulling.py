@@ -0,0 +1,86 @@
+import argparse
+import time
+import warnings
+import numpy as np
+import pandas as pd
+import plotly.graph_objects as go
+from RenderTables import GEOGRAPHY_BY_KEY, load_stats_table, classed_trace_args
+from BuildMapPayloads import encode_boundaries
+from GeometryTools import feature_bounds, build_rtree, query_rtree
+from ExportZoomMap import CULLED_LAYERS, CULL_MARGIN, LAYER_TOLERANCE
+
+# Metro-level zoom (about zoom 9-10) against the full-state render for the culled layers of
+# the zoomable map (ExportZoomMap.py). For each layer and viewport it reports:
+#   shapes      features drawn (culled: R-tree hits for the viewport plus CULL_MARGIN)
+#   query       R-tree query time vs a linear scan over all feature bounds
+#   figure      time to build and serialize the Plotly figure, and its size; this is the work
+#               repeated on every relayout, and what the browser has to parse and draw
+
+METRO_VIEWPORTS = {
+    "Los Angeles": [-118.67, 33.70, -117.65, 34.34],
+    "San Francisco Bay Area": [-122.55, 37.25, -121.75, 37.95],
+    "San Diego": [-117.30, 32.53, -116.90, 33.10],
+    "Sacramento": [-121.60, 38.40, -121.20, 38.75],
+}
+
+
+def with_margin(bbox, margin=CULL_MARGIN):
+    min_x, min_y, max_x, max_y = bbox
+    mx, my = (max_x - min_x) * margin, (max_y - min_y) * margin
+    return [min_x - mx, min_y - my, max_x + mx, max_y + my]
+
+
+def timed(function, repeat=20):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        result = function()
+    return result, (time.perf_counter() - start) / repeat * 1000
+
+
+def figure_json(geo, geojson_data, stats):
+    property_name = geo["featureidkey"].split(".", 1)[1]
+    keys = {str(f["properties"].get(property_name)) for f in geojson_data["features"]}
+    locations = pd.Index([location for location in stats[0].index if str(location) in keys])
+    fig = go.Figure(go.Choroplethmapbox(
+        geojson=geojson_data,
+        featureidkey=geo["featureidkey"],
+        marker_opacity=0.8,
+        marker_line_width=1.2,
+        hovertemplate="%{text}<extra></extra>",
+        **classed_trace_args(stats, "Muslim_Total", locations),
+    ))
+    return fig.to_json()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Measure viewport culling at metro zoom against the full-state render")
+    parser.add_argument("--viewport", type=float, nargs=4, metavar=("MIN_LON", "MIN_LAT", "MAX_LON", "MAX_LAT"),
+                        help="Measure this viewport instead of the preset metro areas")
+    parser.add_argument("--precision", type=int, default=5)
+    args = parser.parse_args()
+    warnings.filterwarnings("ignore", category=DeprecationWarning)  # choroplethmapbox, same trace as the apps
+    viewports = {"Custom": args.viewport} if args.viewport else METRO_VIEWPORTS
+
+    print(f"{'Layer':<16} {'Viewport':<24} {'Shapes':>12} {'Query (R-tree / scan)':>22} {'Figure build':>13} {'Figure size':>12}")
+    for key in CULLED_LAYERS:
+        geo = GEOGRAPHY_BY_KEY[key]
+        rounded, _ = encode_boundaries(geo, args.precision, LAYER_TOLERANCE[key])
+        stats = load_stats_table(key)
+        bounds = feature_bounds(rounded)
+        tree = build_rtree(np.round(bounds, args.precision))
+
+        full_json, full_ms = timed(lambda: figure_json(geo, rounded, stats), repeat=3)
+        total = len(rounded["features"])
+        print(f"{geo['title']:<16} {'Full state':<24} {total:>12,} {'-':>22} {full_ms:>10.1f}ms "
+              f"{len(full_json) / 1e3:>9.0f}kB")
+
+        for name, viewport in viewports.items():
+            box = with_margin(viewport)
+            hits, tree_ms = timed(lambda: query_rtree(tree, box))
+            _, scan_ms = timed(lambda: np.flatnonzero(
+                (bounds[:, 2] >= box[0]) & (bounds[:, 0] <= box[2]) & (bounds[:, 3] >= box[1]) & (bounds[:, 1] <= box[3])
+            ))
+            culled = {"type": "FeatureCollection", "features": [rounded["features"][i] for i in hits]}
+            culled_json, culled_ms = timed(lambda: figure_json(geo, culled, stats), repeat=3)
+            print(f"{'':<16} {name:<24} {len(hits):>5,} ({len(hits) / max(total, 1):>4.0%}) "
+                  f"{tree_ms:>9.3f} / {scan_ms:>6.3f}ms {culled_ms:>10.1f}ms {len(culled_json) / 1e3:>9.0f}kB")
@@ -0,0 +1,111 @@
+import argparse
+import hashlib
+import os
+import shutil
+import time
+import pandas as pd
+import pyarrow as pa
+import pyarrow.dataset as ds
+from States import STATES
+from VoterDB import VOTER_TABLES
+
+# State-partitioned storage for the voter tables, so each state's pipeline (RunStates.py) reads
+# only its own rows:
+#   partitions/voters/State=<code>/CountyCode=<code>/part-*.parquet
+#   partitions/cd_ld_voters/State=<code>/part-*.parquet       (no county column in this file)
+# Columns are renamed to the pipeline's names with the state's voter_columns (States.py) first.
+# Every column is read and written as text, so all chunks write the same Parquet schema
+# (per-chunk type inference would make a column float in a chunk with a blank, int in one
+# without, and null in one where it is all blank).
+#
+# Every run writes to partitions/.incoming/ and then compares each state with what is already
+# stored: a state whose Parquet files are byte-identical is left alone (RunStates.py then skips
+# it), states that are not in the input at all are untouched, and changed states are swapped in
+# whole. So a file with only Texas rows, or a re-export of all states where one changed, only
+# rewrites what actually changed.
+
+PARTITION_DIR = "partitions"
+INCOMING_DIR = os.path.join(PARTITION_DIR, ".incoming")
+PARTITION_COLUMNS = {"voters": ["State", "CountyCode"], "cd_ld_voters": ["State"]}
+
+
+def state_partition(table, state):
+    return os.path.join(PARTITION_DIR, table, f"State={state}")
+
+
+def partition_digest(path):
+    """Content hash of every file under a partition directory (None if there is none)."""
+    if not os.path.isdir(path):
+        return None
+    digest = hashlib.sha256()
+    for root, dirs, files in os.walk(path):
+        dirs.sort()
+        for name in sorted(files):
+            file_path = os.path.join(root, name)
+            digest.update(os.path.relpath(file_path, path).encode("utf-8"))
+            with open(file_path, "rb") as file:
+                for block in iter(lambda: file.read(1 << 20), b""):
+                    digest.update(block)
+    return digest.hexdigest()[:16]
+
+
+def write_chunk(chunk, table, number, state, state_column):
+    if state_column:
+        states = chunk[state_column].astype(str).str.strip().str.upper()
+    else:
+        states = pd.Series(state, index=chunk.index)
+    unknown = sorted(set(states) - set(STATES))
+    if unknown:
+        raise ValueError(f"{table}: no configuration in States.py for state(s) {', '.join(unknown)}")
+
+    for code, rows in chunk.groupby(states.to_numpy()):
+        rows = rows.drop(columns=[state_column] if state_column else []).rename(columns=STATES[code]["voter_columns"])
+        rows.insert(0, "State", code)
+        schema = pa.schema([(column, pa.string()) for column in rows.columns])
+        ds.write_dataset(
+            pa.Table.from_pandas(rows, schema=schema, preserve_index=False),
+            os.path.join(INCOMING_DIR, table),
+            format="parquet",
+            partitioning=PARTITION_COLUMNS[table],
+            partitioning_flavor="hive",
+            basename_template=f"part-{number}-{{i}}.parquet",
+            existing_data_behavior="overwrite_or_ignore",
+        )
+    return set(states)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Write the voter tables as Parquet partitioned by state and county")
+    parser.add_argument("--voters", default=VOTER_TABLES["voters"]["file"])
+    parser.add_argument("--cd-ld", default=VOTER_TABLES["cd_ld_voters"]["file"])
+    group = parser.add_mutually_exclusive_group(required=True)
+    group.add_argument("--state", choices=sorted(STATES), help="Every row is from this state")
+    group.add_argument("--state-column", help="Column holding each row's state code")
+    parser.add_argument("--chunksize", type=int, default=1_000_000)
+    args = parser.parse_args()
+    start = time.perf_counter()
+
+    # Step 1: Write both tables to the incoming area, chunk by chunk
+    shutil.rmtree(INCOMING_DIR, ignore_errors=True)
+    states = set()
+    for table, csv_file in (("voters", args.voters), ("cd_ld_voters", args.cd_ld)):
+        for number, chunk in enumerate(pd.read_csv(csv_file, dtype=str, chunksize=args.chunksize)):
+            states |= write_chunk(chunk, table, number, args.state, args.state_column)
+
+    # Step 2: Swap in only the states whose partitions changed
+    print(f"{'State':<6} {'Status':<10} {'Files':>6}")
+    for state in sorted(states):
+        changed = False
+        for table in PARTITION_COLUMNS:
+            incoming = os.path.join(INCOMING_DIR, table, f"State={state}")
+            if partition_digest(incoming) == partition_digest(state_partition(table, state)):
+                continue
+            changed = True
+            shutil.rmtree(state_partition(table, state), ignore_errors=True)
+            os.makedirs(os.path.dirname(state_partition(table, state)), exist_ok=True)
+            if os.path.isdir(incoming):
+                os.replace(incoming, state_partition(table, state))
+        files = sum(len(f) for table in PARTITION_COLUMNS for _, _, f in os.walk(state_partition(table, state)))
+        print(f"{state:<6} {'updated' if changed else 'unchanged':<10} {files:>6}")
+    shutil.rmtree(INCOMING_DIR, ignore_errors=True)
+    print(f"✅ Saved to {PARTITION_DIR}/ in {time.perf_counter() - start:.1f}s")
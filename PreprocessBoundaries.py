@@ -0,0 +1,211 @@
+import argparse
+import hashlib
+import json
+import os
+import shutil
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from GeometryTools import simplify_topology
+from RenderTables import GEOGRAPHIES, GEOGRAPHY_BY_KEY
+from States import STATE, boundary_source
+
+# One-shot preprocessing of the boundary files the dashboards use. Every file is handled in
+# its own worker process:
+#   1. reprojection check   anything not in WGS84 lon/lat (EPSG:4326) is reprojected
+#   2. validation           empty geometries dropped, invalid ones repaired (keeping only their
+#                           polygonal parts), coordinate range checked
+#   3. simplification       --tolerance degrees over the file's shared arcs
+#                           (GeometryTools.simplify_topology), so neighbouring features keep a
+#                           common border: no gaps or slivers between them
+#   4. key normalization    the state's key property trimmed (and 12.0 -> 12), duplicates reported,
+#                           and renamed to the featureidkey property of RenderTables.GEOGRAPHIES
+# Results are cached in boundary_cache/ by a hash of the file contents and the settings, so
+# rerunning after adding a new election's redistricting files only processes the new files.
+# The inputs are the current state's boundary files (States.py). The processed files are written
+# to boundaries/<file name in RenderTables.GEOGRAPHIES>; DashboardBundle.py, BuildMapPayloads.py
+# and the apps read them from there when present.
+
+PROCESSED_DIR = "boundaries"
+CACHE_DIR = "boundary_cache"
+
+
+def boundary_path(geojson_file):
+    """Preprocessed copy of a boundary file if there is one, else the state's original."""
+    processed = os.path.join(PROCESSED_DIR, os.path.basename(geojson_file))
+    if os.path.exists(processed):
+        return processed
+    key = next((geo["key"] for geo in GEOGRAPHIES if geo["geojson_file"] == geojson_file), None)
+    return boundary_source(key) if key else geojson_file
+
+
+def file_hash(path, settings):
+    digest = hashlib.sha256(json.dumps(settings, sort_keys=True).encode("utf-8"))
+    with open(path, "rb") as file:
+        for block in iter(lambda: file.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()[:16]
+
+
+def normalize_key(value):
+    if isinstance(value, float) and value.is_integer():
+        return int(value)
+    if isinstance(value, str):
+        return " ".join(value.split())
+    return value
+
+
+def polygonal(geometry):
+    """The polygonal part of a repaired geometry: make_valid can return a GeometryCollection with
+    the lines and points of collapsed parts, which the maps cannot fill."""
+    from shapely.geometry import MultiPolygon
+
+    if geometry is None or geometry.geom_type in ("Polygon", "MultiPolygon"):
+        return geometry
+    parts = [part for g in getattr(geometry, "geoms", []) if g.geom_type in ("Polygon", "MultiPolygon")
+             for part in getattr(g, "geoms", [g])]
+    return MultiPolygon(parts) if parts else None
+
+
+def repair(gdf, notes, what):
+    """Make invalid geometries valid, keeping polygons only; drops features left without area."""
+    invalid = ~gdf.geometry.is_valid
+    if invalid.any():
+        notes.append(f"repaired {int(invalid.sum())} invalid geometries{what}")
+        gdf.loc[invalid, "geometry"] = gdf.loc[invalid, "geometry"].make_valid().map(polygonal)
+    empty = gdf.geometry.isna() | gdf.geometry.is_empty
+    if empty.any():
+        notes.append(f"dropped {int(empty.sum())} features without a polygon{what}")
+        gdf = gdf[~empty].copy()
+    return gdf
+
+
+def preprocess_file(geojson_file, key_property, target_property, tolerance, cache_file):
+    """Runs in a worker process; returns (notes, per-stage timings)."""
+    import geopandas as gpd  # imported here so the dashboards can import boundary_path cheaply
+    from shapely.geometry import shape
+
+    timings, notes = {}, []
+    start = time.perf_counter()
+    gdf = gpd.read_file(geojson_file)
+    timings["read"] = time.perf_counter() - start
+
+    # Step 1: Reprojection check
+    start = time.perf_counter()
+    if gdf.crs is None:
+        notes.append("no CRS, assumed EPSG:4326")
+        gdf = gdf.set_crs(epsg=4326)
+    elif gdf.crs.to_epsg() != 4326:
+        notes.append(f"reprojected from {gdf.crs.to_string()}")
+        gdf = gdf.to_crs(epsg=4326)
+    timings["reproject"] = time.perf_counter() - start
+
+    # Step 2: Validation
+    start = time.perf_counter()
+    empty = gdf.geometry.isna() | gdf.geometry.is_empty
+    if empty.any():
+        notes.append(f"dropped {int(empty.sum())} empty geometries")
+        gdf = gdf[~empty].copy()
+    gdf = repair(gdf, notes, "")
+    min_lon, min_lat, max_lon, max_lat = gdf.total_bounds
+    if not (-180 <= min_lon <= max_lon <= 180 and -90 <= min_lat <= max_lat <= 90):
+        raise ValueError(f"{geojson_file}: coordinates out of lon/lat range {gdf.total_bounds}")
+    timings["validate"] = time.perf_counter() - start
+
+    # Step 3: Simplification over the shared borders (a ring crossing itself after simplifying is
+    # repaired like an invalid input)
+    start = time.perf_counter()
+    if tolerance > 0:
+        simplified = simplify_topology(gdf.geometry.__geo_interface__, tolerance)
+        gdf["geometry"] = gpd.GeoSeries([shape(f["geometry"]) for f in simplified["features"]],
+                                        index=gdf.index, crs=gdf.crs)
+        gdf = repair(gdf, notes, " after simplification")
+    timings["simplify"] = time.perf_counter() - start
+
+    # Step 4: Key normalization
+    start = time.perf_counter()
+    if key_property not in gdf.columns:
+        raise ValueError(f"{geojson_file}: missing feature key property '{key_property}'")
+    gdf[key_property] = gdf[key_property].map(normalize_key)
+    duplicated = gdf[key_property].duplicated(keep=False)
+    if duplicated.any():
+        notes.append(f"{gdf.loc[duplicated, key_property].nunique()} duplicated keys, "
+                     f"e.g. {gdf.loc[duplicated, key_property].head(3).tolist()}")
+    if key_property != target_property:
+        gdf = gdf.drop(columns=[target_property], errors="ignore").rename(columns={key_property: target_property})
+    timings["normalize"] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    temp_file = cache_file + f".{os.getpid()}.tmp"
+    with open(temp_file, "w") as file:
+        file.write(gdf.to_json(drop_id=True))
+    os.replace(temp_file, cache_file)
+    timings["write"] = time.perf_counter() - start
+    return notes, timings
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Validate, reproject, simplify and normalize the boundary files")
+    parser.add_argument("geographies", nargs="*", help=f"Geography keys (default: all of {list(GEOGRAPHY_BY_KEY)})")
+    parser.add_argument("--tolerance", type=float, default=0.0005, help="Simplification tolerance in degrees")
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--force", action="store_true", help="Ignore the cache")
+    args = parser.parse_args()
+
+    os.makedirs(PROCESSED_DIR, exist_ok=True)
+    os.makedirs(CACHE_DIR, exist_ok=True)
+    geographies = [GEOGRAPHY_BY_KEY[k] for k in args.geographies] if args.geographies else GEOGRAPHIES
+    settings = {"tolerance": args.tolerance, "version": 2}
+    total_start = time.perf_counter()
+
+    # Step 1: Hash every input and split into cache hits and files to process
+    cache_files, jobs, results = {}, {}, {}
+    for geo in geographies:
+        source = STATE["boundaries"][geo["key"]]
+        target_property = geo["featureidkey"].split(".", 1)[1]
+        digest = file_hash(source["file"], dict(settings, key_property=source["key_property"], target=target_property))
+        cache_file = os.path.join(CACHE_DIR, f"{geo['key']}.{digest}.geojson")
+        cache_files[geo["geojson_file"]] = cache_file
+        if os.path.exists(cache_file) and not args.force:
+            results[geo["geojson_file"]] = ("cached", [], {})
+        else:
+            jobs[geo["geojson_file"]] = (source["file"], source["key_property"], target_property, cache_file)
+
+    # Step 2: Process the rest concurrently, one file per worker process
+    failed = []
+    if jobs:
+        with ProcessPoolExecutor(max_workers=args.workers or min(len(jobs), os.cpu_count() or 1)) as pool:
+            futures = {
+                pool.submit(preprocess_file, source_file, key_property, target_property, args.tolerance,
+                            cache_file): geojson_file
+                for geojson_file, (source_file, key_property, target_property, cache_file) in jobs.items()
+            }
+            for future in as_completed(futures):
+                geojson_file = futures[future]
+                try:
+                    notes, timings = future.result()
+                    results[geojson_file] = ("processed", notes, timings)
+                except Exception as error:
+                    failed.append(f"{geojson_file}: {error}")
+
+    # Step 3: Copy the cached results into place and report per-file timing
+    stages = ["read", "reproject", "validate", "simplify", "normalize", "write"]
+    print(f"{'Boundary file':<50} {'Status':<10} " + " ".join(f"{s:>9}" for s in stages) + f" {'Total':>7}")
+    for geo in geographies:
+        geojson_file = geo["geojson_file"]
+        if geojson_file not in results:
+            continue
+        status, notes, timings = results[geojson_file]
+        target = os.path.join(PROCESSED_DIR, os.path.basename(geojson_file))
+        shutil.copyfile(cache_files[geojson_file], target + ".tmp")
+        os.replace(target + ".tmp", target)
+        cells = " ".join(f"{timings[s]:>8.2f}s" if s in timings else f"{'-':>9}" for s in stages)
+        print(f"{geojson_file:<50} {status:<10} {cells} {sum(timings.values()):>6.2f}s")
+        for note in notes:
+            print(f"    {note}")
+
+    if failed:
+        for failure in failed:
+            print(f"❌ {failure}")
+        raise SystemExit(1)
+    print(f"✅ Saved {len(results)} boundary files to {PROCESSED_DIR}/ in {time.perf_counter() - total_start:.1f}s "
+          f"({len(jobs)} processed, {len(results) - len(jobs)} from cache)")
@@ -0,0 +1,157 @@
+import numpy as np
+import pandas as pd
+import argparse
+import csv
+import os
+from VoterDB import DB_FILE, connect, quote
+
+# Sorted, memory-mapped RegistrantID index over a voter CSV.
+#
+# For a CSV "voters.csv" three .npy files are written next to it:
+#   voters.ids.npy      voter ids, sorted (fixed-width bytes so they can be memory-mapped)
+#   voters.rows.npy     data-row number of each sorted id in the CSV
+#   voters.offsets.npy  byte offset where each data row starts (plus one final end offset)
+# Lookups are a binary search (np.searchsorted) over the memory-mapped ids, and a single
+# record can be read back with one seek instead of loading the whole CSV.
+#
+# A voter table of muslim_voters.sqlite gets the same index as muslim_voters.<table>.ids.npy and
+# muslim_voters.<table>.rows.npy, with row numbers in rowid order (Step0_buildVoterDatabase.py
+# rebuilds it whenever it reloads the table; AddSchoolDistrict.py joins through it).
+
+
+def index_paths(csv_path):
+    base = os.path.splitext(csv_path)[0]
+    return base + ".ids.npy", base + ".rows.npy", base + ".offsets.npy"
+
+
+def normalize_ids(values):
+    """Voter ids as the index stores them: stripped text, float-formatted ids ("123.0", 123.0)
+    written as integers, missing ids as empty."""
+    ids = pd.Series(list(values), dtype=object)
+    ids = ids.where(ids.notna(), "").astype(str).str.strip().str.replace(r"^(\d+)\.0+$", r"\1", regex=True)
+    return np.asarray(ids.to_numpy(), dtype="S")
+
+
+def build_index(csv_path, id_column):
+    ids_path, rows_path, offsets_path = index_paths(csv_path)
+
+    # Step 1: Byte offsets of every non-blank line start (read_csv skips blank lines too)
+    raw = np.memmap(csv_path, dtype=np.uint8, mode="r")
+    newlines = np.flatnonzero(raw == ord("\n"))
+    starts = np.concatenate([[0], newlines + 1])
+    starts = starts[starts < len(raw)]
+    first = raw[starts]
+    second = raw[np.minimum(starts + 1, len(raw) - 1)]
+    starts = starts[~((first == ord("\n")) | ((first == ord("\r")) & (second == ord("\n"))))]
+    offsets = np.append(starts[1:], len(raw)).astype(np.int64)  # skip the header line, keep the final end offset
+
+    # Step 2: Sort the ids; a stable sort keeps the first occurrence of a duplicate first
+    ids = normalize_ids(pd.read_csv(csv_path, usecols=[id_column], dtype=str)[id_column])
+    if len(ids) != len(offsets) - 1:
+        raise ValueError(f"{csv_path}: {len(ids):,} records on {len(offsets) - 1:,} lines; "
+                         "records with embedded newlines cannot be indexed")
+    order = np.argsort(ids, kind="stable")
+
+    np.save(ids_path, ids[order])
+    np.save(rows_path, order.astype(np.int64))
+    np.save(offsets_path, offsets)
+    print(f"✅ Indexed {len(ids):,} rows of {csv_path}")
+
+
+def open_index(csv_path, id_column):
+    ids_path, rows_path, offsets_path = index_paths(csv_path)
+    # Rebuild when the CSV is newer than its index
+    if not os.path.exists(ids_path) or os.path.getmtime(ids_path) < os.path.getmtime(csv_path):
+        build_index(csv_path, id_column)
+    return (
+        np.load(ids_path, mmap_mode="r"),
+        np.load(rows_path, mmap_mode="r"),
+        np.load(offsets_path, mmap_mode="r"),
+    )
+
+
+def table_index_paths(table, db_path=DB_FILE):
+    base = f"{os.path.splitext(db_path)[0]}.{table}"
+    return base + ".ids.npy", base + ".rows.npy"
+
+
+def build_table_index(table, id_column, connection=None, db_path=DB_FILE):
+    ids_path, rows_path = table_index_paths(table, db_path)
+    connection = connection or connect(db_path, read_only=True)
+    ids = pd.read_sql_query(f"SELECT {quote(id_column)} FROM {table} ORDER BY rowid", connection)[id_column]
+    ids = normalize_ids(ids)
+    order = np.argsort(ids, kind="stable")
+    np.save(ids_path, ids[order])
+    np.save(rows_path, order.astype(np.int64))
+    print(f"✅ Indexed {len(ids):,} rows of {table}")
+
+
+def open_table_index(table, id_column, db_path=DB_FILE):
+    """The index of a database table (built when missing); it has no byte offsets."""
+    ids_path, rows_path = table_index_paths(table, db_path)
+    if not os.path.exists(ids_path) or not os.path.exists(rows_path):
+        build_table_index(table, id_column, db_path=db_path)
+    return np.load(ids_path, mmap_mode="r"), np.load(rows_path, mmap_mode="r"), None
+
+
+def lookup(index, ids):
+    """Return the CSV row number of each id (first occurrence), or -1 if the id is not indexed."""
+    sorted_ids, rows, _ = index
+    ids = normalize_ids(ids)
+    if len(sorted_ids) == 0:
+        return np.full(len(ids), -1, dtype=np.int64)
+    positions = np.searchsorted(sorted_ids, ids, side="left")
+    positions = np.minimum(positions, len(sorted_ids) - 1)
+    found = sorted_ids[positions] == ids
+    return np.where(found, rows[positions], -1)
+
+
+def duplicates(index):
+    """Return the ids that appear on more than one row."""
+    sorted_ids = index[0]
+    repeated = sorted_ids[1:] == sorted_ids[:-1]
+    return np.unique(sorted_ids[1:][repeated])
+
+
+def read_records(csv_path, index, row_numbers):
+    """Read the given data rows back as dicts with one seek per row."""
+    offsets = index[2]
+    with open(csv_path, "r", newline="") as file:
+        header = next(csv.reader(file))
+    records = []
+    with open(csv_path, "rb") as file:
+        for row in row_numbers:
+            file.seek(int(offsets[row]))
+            line = file.read(int(offsets[row + 1] - offsets[row])).decode("utf-8").rstrip("\r\n")
+            records.append(dict(zip(header, next(csv.reader([line])))))
+    return records
+
+
+if __name__ == "__main__":
+    # Ad-hoc lookup: which districts is this voter in, and did they vote?
+    parser = argparse.ArgumentParser(description="Look up voters by RegistrantID")
+    parser.add_argument("ids", nargs="*", help="RegistrantIDs to look up")
+    parser.add_argument("--file", default="muslim_Voters_data_with_SchoolDistrict_CD_LD_Voted.csv")
+    parser.add_argument("--id-column", default="Voters Id")
+    parser.add_argument("--duplicates", action="store_true", help="List ids that appear more than once")
+    args = parser.parse_args()
+
+    index = open_index(args.file, args.id_column)
+
+    if args.duplicates:
+        repeated = duplicates(index)
+        print(f"{len(repeated):,} duplicated ids")
+        for voter_id in repeated[:50]:
+            print(voter_id.decode())
+
+    rows = lookup(index, args.ids)
+    columns = ["School District", "Congressional District", "State Senate District",
+               "State Assembly District", "Voted"]
+    found_rows = rows[rows >= 0]
+    records = iter(read_records(args.file, index, found_rows))
+    for voter_id, row in zip(args.ids, rows):
+        if row < 0:
+            print(f"{voter_id}: not found")
+            continue
+        record = next(records)
+        print(f"{voter_id}: " + ", ".join(f"{c}={record.get(c, '')}" for c in columns))
@@ -0,0 +1,299 @@
+import pandas as pd
+import numpy as np
+import json
+import os
+import re
+from VoterDB import read_aggregate
+from States import read_county_lookup
+
+# Render tables for the six geography maps, outside of Streamlit.
+#
+# Map.py and MapVoting.py build these inline; this module builds the same tables
+# (location key, counts, percent and hover text per feature) so export and other
+# non-Streamlit stages can render the maps from one place.
+
+GEOGRAPHIES = [
+    {
+        "key": "county",
+        "title": "County",
+        "data_file": "MuslimVoterStatsByCountyCode.csv",
+        "geojson_file": "California_County_Boundaries.geojson",
+        "featureidkey": "properties.CountyName",
+    },
+    {
+        "key": "city",
+        "title": "City",
+        "data_file": "MuslimsPerCityVoting.csv",
+        "geojson_file": "California_Incorporated_Cities.geojson",
+        "featureidkey": "properties.CITY",
+    },
+    {
+        "key": "school_district",
+        "title": "School District",
+        "data_file": "MuslimPerSchoolDistrictVoted2.csv",
+        "geojson_file": "California_School_District_Areas_2022-23.geojson",
+        "featureidkey": "properties.DistrictName",
+    },
+    {
+        "key": "congressional_district",
+        "title": "Congressional District",
+        "data_file": "MuslimsPerCongressionalDistrictVoting.csv",
+        "geojson_file": "Congressional_Districts_CA.geojson",
+        "featureidkey": "properties.CongDistri",
+    },
+    {
+        "key": "assembly_district",
+        "title": "State Assembly District",
+        "data_file": "MuslimsPerStateAssemblyDistrictVoting.csv",
+        "geojson_file": "CA_AssemblyDistricts_WGS84.geojson",
+        "featureidkey": "properties.AssemblyDistrictName",
+    },
+    {
+        "key": "senate_district",
+        "title": "State Senate District",
+        "data_file": "MuslimsPerStateSenateDistrictVoting.csv",
+        "geojson_file": "CA_SenateDistricts_WGS84.geojson",
+        "featureidkey": "properties.district",
+    },
+]
+
+GEOGRAPHY_BY_KEY = {geo["key"]: geo for geo in GEOGRAPHIES}
+
+# Precomputed color classes (Step10_computeMapStats.py)
+RENDER_DIR = "render_tables"
+NUM_CLASSES = 5
+MIN_VOTERS = 11  # turnout is not shown for smaller groups
+CLASS_COLORS = ["white", "yellow", "lightgreen", "green", "darkgreen"]
+
+
+def jenks_breaks(values, num_classes):
+    """Fisher-Jenks natural breaks (exact dynamic program, vectorized over the split point)."""
+    x = np.sort(np.asarray(values, dtype=float))
+    n = len(x)
+    if n == 0:
+        return [0.0, 0.0]
+    num_classes = min(num_classes, len(np.unique(x)))
+    if num_classes <= 1:
+        return [float(x[0]), float(x[-1])]
+
+    s1 = np.concatenate([[0.0], np.cumsum(x)])
+    s2 = np.concatenate([[0.0], np.cumsum(x * x)])
+
+    def ssd(i, j):
+        # Sum of squared deviations of x[i..j] inclusive (i may be an array)
+        count = j - i + 1
+        total = s1[j + 1] - s1[i]
+        return (s2[j + 1] - s2[i]) - total * total / count
+
+    cost = np.full((num_classes, n), np.inf)
+    split = np.zeros((num_classes, n), dtype=int)
+    cost[0] = ssd(np.zeros(n, dtype=int), np.arange(n))
+    for c in range(1, num_classes):
+        for j in range(c, n):
+            starts = np.arange(c, j + 1)
+            candidates = cost[c - 1][starts - 1] + ssd(starts, j)
+            best = np.argmin(candidates)
+            cost[c, j] = candidates[best]
+            split[c, j] = starts[best]
+
+    # Walk the splits back to get the upper bound of every class
+    breaks = [float(x[-1])]
+    j = n - 1
+    for c in range(num_classes - 1, 0, -1):
+        j = split[c, j] - 1
+        breaks.append(float(x[j]))
+    breaks.append(float(x[0]))
+    return sorted(breaks)
+
+
+def quantile_breaks(values, num_classes):
+    values = np.asarray(values, dtype=float)
+    if len(values) == 0:  # e.g. every feature suppressed: one empty class
+        return [0.0, 0.0]
+    breaks = np.quantile(values, np.linspace(0, 1, num_classes + 1))
+    return [float(b) for b in np.unique(np.round(breaks, 2))]
+
+
+def classify(values, breaks):
+    # Class 0 .. len(breaks) - 2; the lower edge of the first class is included
+    inner = np.asarray(breaks[1:-1])
+    return np.searchsorted(inner, np.asarray(values, dtype=float), side="left")
+
+
+def extract_district_number(text):
+    match = re.search(r'(\d+)', str(text))
+    if match:
+        return int(match.group(1))
+    return None
+
+
+def add_hover_text(data):
+    data["hover_text"] = (
+        "<b>" + data["label"] + "</b><br>" +
+        "Total Muslims: <span style='color:red'>" + data["Muslim_Total"].apply(lambda x: f"{x:,}") + "</span><br>" +
+        "Voted Muslims: <span style='color:red'>" + data["Muslim_Voted"].apply(lambda x: f"{x:,}") + "</span><br>" +
+        "Voting %: <span style='color:red'>" + data["Muslim_Voted_Percent"].astype(str) + "%</span>"
+    )
+    return data
+
+
+def add_locations(key, data):
+    """Add the feature key (location) and label of every aggregate row that has a feature."""
+    if key == "county":
+        data = pd.merge(
+            data,
+            read_county_lookup(),
+            on="CountyCode",
+            how="left"
+        )
+        data["location"] = data["County_Name"].str.strip().str.title()
+        data["label"] = data["location"]
+
+    elif key == "city":
+        data["location"] = data["City"].str.strip().str.title()
+        data["label"] = data["location"]
+
+    elif key == "school_district":
+        matches = pd.read_csv("district_name_matching_results.csv")
+        data = data.rename(columns={"school_district": "School District"})
+        data = pd.merge(data, matches, on="School District", how="left")
+        data = data.dropna(subset=["Matched DistrictName"])
+        data = data[data["Matched DistrictName"].str.strip() != ""]
+        data["location"] = data["Matched DistrictName"]
+        data["label"] = data["location"]
+
+    elif key == "congressional_district":
+        numbers = data["Congressional District"].apply(extract_district_number)
+        data = data[numbers.notna()].copy()
+        data["location"] = "Congressional District " + numbers.dropna().astype(int).map("{:02d}".format)
+        data["label"] = data["location"]
+
+    elif key == "assembly_district":
+        numbers = data["State Assembly District"].apply(extract_district_number)
+        data = data[numbers.notna()].copy()
+        data["location"] = "Assembly District " + numbers.dropna().astype(int).map("{:02d}".format)
+        data["label"] = data["location"]
+
+    elif key == "senate_district":
+        numbers = data["State Senate District"].apply(extract_district_number)
+        data = data[numbers.notna()].copy()
+        data["location"] = numbers.dropna().astype(int).astype(str)
+        data["label"] = "State Senate District " + data["location"]
+    return data
+
+
+def build_render_table(key, data_dir=""):
+    """Return location, label, counts, percent and hover_text for one geography."""
+    data = add_locations(key, read_aggregate(data_dir + GEOGRAPHY_BY_KEY[key]["data_file"]))
+    data["Muslim_Total"] = data["Muslim_Total"].astype(int)
+    data["Muslim_Voted"] = data["Muslim_Voted"].fillna(0).astype(int)
+    data["Muslim_Voted_Percent"] = data["Muslim_Voted_Percent"].round(2)
+    data = add_hover_text(data)
+    return data[["location", "label", "Muslim_Total", "Muslim_Voted", "Muslim_Voted_Percent", "hover_text"]].reset_index(drop=True)
+
+
+def build_render_tables(data_dir=""):
+    return {geo["key"]: build_render_table(geo["key"], data_dir) for geo in GEOGRAPHIES}
+
+
+def wilson_interval(voted, total, z=1.96):
+    voted = np.asarray(voted, dtype=float)
+    total = np.asarray(total, dtype=float)
+    p = voted / total
+    denominator = 1 + z * z / total
+    center = (p + z * z / (2 * total)) / denominator
+    margin = z * np.sqrt(p * (1 - p) / total + z * z / (4 * total * total)) / denominator
+    return ((center - margin) * 100).round(2), ((center + margin) * 100).round(2)
+
+
+def compute_stats_table(key, data_dir=""):
+    """The render table Step10_computeMapStats.py saves for one geography, and its class breaks."""
+    table = build_render_table(key, data_dir)
+
+    # Step 1: One row per feature; source rows matched to the same feature (e.g. school
+    # districts sharing a Matched DistrictName) are summed so the tables index uniquely
+    table = table.groupby("location", as_index=False, sort=False).agg(
+        label=("label", "first"), Muslim_Total=("Muslim_Total", "sum"), Muslim_Voted=("Muslim_Voted", "sum"))
+    table["Muslim_Voted_Percent"] = (table["Muslim_Voted"] / table["Muslim_Total"] * 100).round(2)
+
+    # Step 2: Small-n suppression and confidence intervals for turnout
+    table["Suppressed"] = table["Muslim_Total"] < MIN_VOTERS
+    table["Percent_CI_Low"], table["Percent_CI_High"] = wilson_interval(table["Muslim_Voted"], table["Muslim_Total"])
+    shown = table[~table["Suppressed"]]
+
+    # Step 3: Class breaks per metric (turnout breaks only use rows that are shown)
+    count_breaks = jenks_breaks(table["Muslim_Total"], NUM_CLASSES)
+    percent_breaks = quantile_breaks(shown["Muslim_Voted_Percent"], NUM_CLASSES)
+    breaks = {
+        "Muslim_Total": {"method": "jenks", "breaks": count_breaks},
+        "Muslim_Voted_Percent": {"method": "quantile", "breaks": percent_breaks},
+    }
+    table["Muslim_Total_class"] = classify(table["Muslim_Total"], count_breaks)
+    table["Muslim_Voted_Percent_class"] = classify(table["Muslim_Voted_Percent"], percent_breaks)
+    table.loc[table["Suppressed"], "Muslim_Voted_Percent_class"] = -1
+
+    # Step 4: Hover text with the interval, or the suppression note
+    table["hover_text"] = (
+        "<b>" + table["label"] + "</b><br>" +
+        "Total Muslims: <span style='color:red'>" + table["Muslim_Total"].apply(lambda x: f"{x:,}") + "</span><br>" +
+        "Voted Muslims: <span style='color:red'>" + table["Muslim_Voted"].apply(lambda x: f"{x:,}") + "</span><br>" +
+        "Voting %: <span style='color:red'>" + table["Muslim_Voted_Percent"].astype(str) + "%</span>" +
+        " (95% CI " + table["Percent_CI_Low"].astype(str) + "–" + table["Percent_CI_High"].astype(str) + "%)"
+    )
+    suppressed = table["Suppressed"]
+    table.loc[suppressed, "hover_text"] = (
+        "<b>" + table.loc[suppressed, "label"] + "</b><br>" +
+        "Total Muslims: <span style='color:red'>" + table.loc[suppressed, "Muslim_Total"].astype(str) + "</span><br>" +
+        f"Voting %: not shown (fewer than {MIN_VOTERS} voters)"
+    )
+    return table, breaks
+
+
+def stats_source(key, data_dir=""):
+    """The file load_stats_table() reads for a geography: the precomputed render table, else the
+    aggregate CSV it is computed from."""
+    path = f"{RENDER_DIR}/{data_dir}{key}.csv"
+    return path if os.path.exists(path) else data_dir + GEOGRAPHY_BY_KEY[key]["data_file"]
+
+
+def load_stats_table(key, data_dir=""):
+    """Load a precomputed render table (indexed by location) and its class breaks; computed from
+    the aggregates when Step10_computeMapStats.py has not been run (e.g. a fresh checkout)."""
+    path = stats_source(key, data_dir)
+    if path != f"{RENDER_DIR}/{data_dir}{key}.csv":
+        table, breaks = compute_stats_table(key, data_dir)
+        table["location"] = table["location"].astype(str)
+        return table.set_index("location"), breaks
+    table = pd.read_csv(path, dtype={"location": str})
+    with open(f"{RENDER_DIR}/{data_dir}class_breaks.json", "r") as file:
+        breaks = json.load(file)[key]
+    return table.set_index("location"), breaks
+
+
+def classed_trace_args(stats, metric, locations):
+    """Choroplethmapbox z/color/hover arguments for the given locations from precomputed classes."""
+    table, breaks = stats
+    edges = breaks[metric]["breaks"]
+    num_classes = len(edges) - 1
+    rows = table.reindex(pd.Series(locations, dtype=str).to_numpy())
+    z = rows[f"{metric}_class"].astype(float) + 0.5  # middle of the class's color band
+    z[z < 0] = float("nan")  # suppressed features (class -1) are left uncolored
+
+    # Stepped colorscale: each class gets one flat color band
+    colors = CLASS_COLORS[-num_classes:] if num_classes < len(CLASS_COLORS) else CLASS_COLORS
+    colorscale = []
+    for i, color in enumerate(colors):
+        colorscale.append([i / num_classes, color])
+        colorscale.append([(i + 1) / num_classes, color])
+
+    suffix = "%" if metric == "Muslim_Voted_Percent" else ""
+    title = "Muslim Voting %" if metric == "Muslim_Voted_Percent" else "Muslim Voter Count"
+    ticktext = [f"{edges[i]:,g}{suffix}–{edges[i + 1]:,g}{suffix}" for i in range(num_classes)]
+    return dict(
+        z=z.to_numpy(),
+        zmin=0,
+        zmax=num_classes,
+        colorscale=colorscale,
+        colorbar=dict(title=title, tickvals=[i + 0.5 for i in range(num_classes)], ticktext=ticktext),
+        text=rows["hover_text"].to_numpy(),
+    )
@@ -0,0 +1,140 @@
+import argparse
+import hashlib
+import json
+import os
+import subprocess
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from States import STATES, STATE_FILE, state_input_files
+from PartitionVoters import PARTITION_COLUMNS, state_partition, partition_digest
+from PreprocessBoundaries import file_hash
+from VoterDB import VOTER_TABLES
+
+# Run the pipeline for every partitioned state (PartitionVoters.py), states in parallel.
+#
+# Each state gets its own working directory states/<code>/ with state.json (so every stage
+# reads that state's configuration from States.py), links to its voter partitions
+# (voters.parquet, cd_ld_voters.parquet, which Step0 loads) and links to the input files
+# listed for it in States.py, taken from its source_dir. STATE_STAGES then run there one after
+# another, each writing its usual outputs (muslim_voters.sqlite, the aggregates, render_tables/,
+# boundaries/, the dashboard bundle ...) inside the state's directory.
+#
+# A state is skipped when the fingerprint of its inputs (partition contents, input files, its
+# configuration and the stage list) matches the one saved by its last successful run, so adding
+# a state, or changing one, only runs that state.
+
+STATES_DIR = "states"
+FINGERPRINT_FILE = ".inputs_fingerprint"
+LOG_FILE = "pipeline.log"
+
+# (script, input the stage needs in the state's directory, or None)
+STATE_STAGES = [
+    ("Step0_buildVoterDatabase.py", None),
+    ("AddSchoolDistrict.py", None),
+    ("CityResolution.py", None),
+    ("Step1_countMuslimPerCountycode.py", None),
+    ("Step2_countMuslimPerCity.py", None),
+    ("Step3_countMuslimsPerSchoolDistrict.py", None),
+    ("step4_countPerCD.py", None),
+    ("step5_countStateSenate.py", None),
+    ("Step6_countLD.py", None),
+    ("Step7_buildDrilldownIndex.py", None),
+    ("Step8_buildVotingHistory.py", "voting_history.csv"),
+    ("Step9_countTurnoutHistory.py", "voting_history.csv"),
+    ("Step10_computeMapStats.py", None),
+    ("ChangeReport.py", None),
+    ("PreprocessBoundaries.py", None),
+    ("DashboardBundle.py", None),
+]
+
+
+def state_dir(state):
+    return os.path.join(STATES_DIR, state)
+
+
+def link(target, link_path):
+    if os.path.lexists(link_path):
+        os.remove(link_path)
+    os.symlink(os.path.abspath(target), link_path)
+
+
+def prepare_state_dir(state):
+    """Create states/<code>/ with state.json and links to the partitions and input files."""
+    config, directory = STATES[state], state_dir(state)
+    os.makedirs(directory, exist_ok=True)
+    with open(os.path.join(directory, STATE_FILE), "w") as file:
+        json.dump({"state": state}, file)
+    for table in PARTITION_COLUMNS:
+        link(state_partition(table, state), os.path.join(directory, VOTER_TABLES[table]["partition"]))
+    for name in state_input_files(state):
+        source = os.path.join(config["source_dir"], name)
+        if os.path.exists(source):
+            link(source, os.path.join(directory, name))
+
+
+def fingerprint(state):
+    config = STATES[state]
+    digest = hashlib.sha256(json.dumps({"config": config, "stages": STATE_STAGES}, sort_keys=True).encode("utf-8"))
+    for table in PARTITION_COLUMNS:
+        digest.update(str(partition_digest(state_partition(table, state))).encode("utf-8"))
+    for name in state_input_files(state):
+        source = os.path.join(config["source_dir"], name)
+        digest.update(f"{name}:{file_hash(source, {}) if os.path.exists(source) else None}".encode("utf-8"))
+    return digest.hexdigest()[:16]
+
+
+def run_state(state, force):
+    """Runs in a worker thread; every stage is its own process, in the state's directory."""
+    start = time.perf_counter()
+    directory = state_dir(state)
+    fingerprint_path = os.path.join(directory, FINGERPRINT_FILE)
+    current = fingerprint(state)
+    if not force and os.path.exists(fingerprint_path):
+        with open(fingerprint_path, "r") as file:
+            if file.read().strip() == current:
+                return state, "unchanged", 0, time.perf_counter() - start
+
+    prepare_state_dir(state)
+    if os.path.exists(fingerprint_path):
+        os.remove(fingerprint_path)
+    ran = 0
+    with open(os.path.join(directory, LOG_FILE), "w") as log:
+        for script, needs in STATE_STAGES:
+            if needs and not os.path.exists(os.path.join(directory, needs)):
+                continue
+            log.write(f"=== {script}\n")
+            log.flush()
+            result = subprocess.run([sys.executable, os.path.abspath(script)], cwd=directory,
+                                    stdout=log, stderr=subprocess.STDOUT)
+            if result.returncode != 0:
+                return state, f"failed in {script} (see {os.path.join(directory, LOG_FILE)})", ran, \
+                    time.perf_counter() - start
+            ran += 1
+    with open(fingerprint_path, "w") as file:
+        file.write(current)
+    return state, "rebuilt", ran, time.perf_counter() - start
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run the pipeline per state partition, in parallel")
+    parser.add_argument("states", nargs="*", help="State codes (default: every partitioned state)")
+    parser.add_argument("--jobs", type=int, default=os.cpu_count(), help="States processed at the same time")
+    parser.add_argument("--force", action="store_true", help="Rebuild even if a state's inputs did not change")
+    args = parser.parse_args()
+    start = time.perf_counter()
+
+    states = args.states or sorted(s for s in STATES if os.path.isdir(state_partition("voters", s)))
+    if not states:
+        print("⚠️ No partitioned states; run PartitionVoters.py first")
+        sys.exit(1)
+
+    print(f"{'State':<6} {'Status':<40} {'Stages':>6} {'Time':>8}")
+    failed = False
+    with ThreadPoolExecutor(max_workers=args.jobs) as pool:
+        for state, status, ran, seconds in pool.map(lambda s: run_state(s, args.force), states):
+            failed |= status.startswith("failed")
+            print(f"{state:<6} {status:<40} {ran:>6} {seconds:>7.1f}s")
+    if failed:
+        sys.exit(1)
+    print(f"✅ Saved to {STATES_DIR}/ ({len(states)} states) in {time.perf_counter() - start:.1f}s")
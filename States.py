@@ -0,0 +1,74 @@
+import json
+import os
+import pandas as pd
+
+# Per-state configuration. Every stage reads the state it works on from state.json in its working
+# directory (written by RunStates.py into states/<code>/); without one it is California, the
+# original single-state layout in the project root.
+#
+# Each state maps its own files and key schemas onto the names the pipeline uses:
+#   boundaries      geography key -> the state's boundary file and the property holding the
+#                   feature key. PreprocessBoundaries.py renames that property to the one in
+#                   RenderTables.GEOGRAPHIES and writes boundaries/<canonical file name>, so
+#                   the later stages and the apps never see the state's own names.
+#   voter_columns   the state's voter file column -> pipeline column (CountyCode, City, ...),
+#                   applied by PartitionVoters.py
+#   county_lookup   county code -> county name table and its two columns
+#   places          optional: Census Designated Place boundaries ({file, key_property}) that
+#                   CityResolution.py maps unincorporated City values to
+#   inputs          every file RunStates.py links into the state's working directory
+
+STATE_FILE = "state.json"
+DEFAULT_STATE = "CA"
+
+STATES = {
+    "CA": {
+        "name": "California",
+        "center": {"lat": 36.7783, "lon": -119.4179},
+        "zoom": 5,
+        "source_dir": ".",
+        "boundaries": {
+            "county": {"file": "California_County_Boundaries.geojson", "key_property": "CountyName"},
+            "city": {"file": "California_Incorporated_Cities.geojson", "key_property": "CITY"},
+            "school_district": {"file": "California_School_District_Areas_2022-23.geojson",
+                                "key_property": "DistrictName"},
+            "congressional_district": {"file": "Congressional_Districts_CA.geojson", "key_property": "CongDistri"},
+            "assembly_district": {"file": "CA_AssemblyDistricts_WGS84.geojson",
+                                  "key_property": "AssemblyDistrictName"},
+            "senate_district": {"file": "CA_SenateDistricts_WGS84.geojson", "key_property": "district"},
+        },
+        "voter_columns": {},
+        "county_lookup": {"file": "DHCS_County_Code_Reference_Table.csv",
+                          "code_column": "DHCS_County_Code", "name_column": "County_Name"},
+        "inputs": ["district_name_matching_results.csv", "voting_history.csv", "city_aliases.csv"],
+    },
+}
+
+
+def current_state():
+    if os.path.exists(STATE_FILE):
+        with open(STATE_FILE, "r") as file:
+            return json.load(file)["state"]
+    return DEFAULT_STATE
+
+
+STATE = STATES[current_state()]
+
+
+def boundary_source(geography_key):
+    return STATE["boundaries"][geography_key]["file"]
+
+
+def state_input_files(state):
+    """Every input file of a state: boundaries, county lookup, places and the other inputs."""
+    config = STATES[state]
+    return ([b["file"] for b in config["boundaries"].values()] + [config["county_lookup"]["file"]]
+            + ([config["places"]["file"]] if "places" in config else []) + config["inputs"])
+
+
+def read_county_lookup():
+    """County code -> name table of the current state, as CountyCode / County_Name."""
+    lookup = STATE["county_lookup"]
+    table = pd.read_csv(lookup["file"])
+    return table.rename(columns={lookup["code_column"]: "CountyCode", lookup["name_column"]: "County_Name"})[
+        ["CountyCode", "County_Name"]]
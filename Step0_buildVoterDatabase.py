@@ -0,0 +1,44 @@
+import pandas as pd
+import glob
+import os
+from VoterDB import DB_FILE, VOTER_TABLES, connect, load_csv, load_parquet, create_indexes, store_aggregate
+from RegistrantIndex import build_table_index
+
+# Build muslim_voters.sqlite: the voter-level tables first, then every aggregate CSV that
+# already exists. Run this first; the Step scripts read from it and write their outputs back.
+connection = connect()
+
+# Step 1: Voter-level tables, indexed by id and geography columns, plus a memory-mapped id index
+# (RegistrantIndex.py); from the state's Parquet partition when RunStates.py linked one in, else
+# from the CSV
+for table, settings in VOTER_TABLES.items():
+    if os.path.exists(settings["partition"]):
+        load_parquet(connection, table, settings["partition"], settings["id_column"])
+        source = settings["partition"]
+    elif os.path.exists(settings["file"]):
+        load_csv(connection, table, settings["file"], settings["id_column"])
+        source = settings["file"]
+    else:
+        print(f"⚠️ {settings['file']} not found, skipping {table}")
+        continue
+    create_indexes(connection, table, settings["indexed"])
+    build_table_index(table, settings["id_column"], connection)
+    print(f"✅ Loaded {source} into {table}")
+
+# Step 2: Aggregate outputs (current files and per-election slices)
+aggregate_files = [
+    "MuslimVoterStatsByCountyCode.csv",
+    "MuslimsPerCityVoting.csv",
+    "MuslimPerSchoolDistrictVoted2.csv",
+    "MuslimsPerCongressionalDistrictVoting.csv",
+    "MuslimsPerStateSenateDistrictVoting.csv",
+    "MuslimsPerStateAssemblyDistrictVoting.csv",
+]
+aggregate_files += sorted(glob.glob("history/*/*.csv"))
+
+for file_name in aggregate_files:
+    if os.path.exists(file_name):
+        store_aggregate(file_name, pd.read_csv(file_name), connection)
+
+connection.close()
+print(f"✅ Saved to {DB_FILE}")
@@ -0,0 +1,32 @@
+import json
+import os
+from RenderTables import GEOGRAPHIES, RENDER_DIR, compute_stats_table
+
+# Precompute everything the maps need to color a feature, so the apps do no statistics per render:
+#   - Jenks natural breaks for Muslim_Total (one giant district no longer flattens the scale)
+#   - quantile breaks for Muslim_Voted_Percent
+#   - the class index of every feature for both metrics
+#   - Wilson 95% confidence interval for Muslim_Voted_Percent
+#   - small-n suppression: turnout is hidden where Muslim_Total < MIN_VOTERS
+# RenderTables.compute_stats_table() builds each table; results are saved as
+# render_tables/<geography>.csv plus render_tables/class_breaks.json.
+
+# The current aggregates, plus every per-election slice from Step9_countTurnoutHistory.py
+data_dirs = [""]
+if os.path.exists("history/elections.json"):
+    with open("history/elections.json", "r") as file:
+        data_dirs += [os.path.join("history", e["folder"], "") for e in json.load(file)]
+
+for data_dir in data_dirs:
+    out_dir = os.path.join(RENDER_DIR, data_dir)
+    os.makedirs(out_dir, exist_ok=True)
+    class_breaks = {}
+
+    for geo in GEOGRAPHIES:
+        table, class_breaks[geo["key"]] = compute_stats_table(geo["key"], data_dir)
+        table.to_csv(os.path.join(out_dir, f"{geo['key']}.csv"), index=False)
+        print(f"✅ Saved {out_dir}{geo['key']}.csv ({int(table['Suppressed'].sum())} suppressed)")
+
+    with open(os.path.join(out_dir, "class_breaks.json"), "w") as file:
+        json.dump(class_breaks, file, indent=2)
+    print(f"✅ Saved to {out_dir}class_breaks.json")
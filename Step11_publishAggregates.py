@@ -0,0 +1,189 @@
+import pandas as pd
+import numpy as np
+import argparse
+import json
+import os
+import time
+from RenderTables import GEOGRAPHIES, MIN_VOTERS
+from VoterDB import read_aggregate
+from States import read_county_lookup
+
+# Publishing stage: privacy-protected copies of the aggregates for release, in published/.
+#   1. primary suppression     Muslim_Total < k hides the whole row; turnout is also hidden when
+#                              the voted or the not-voted count is between 1 and k - 1
+#   2. complementary           a suppressed cell must not be recoverable by subtraction, so every
+#      suppression             group of sibling cells (all rows of one file, or the cities of one
+#                              county / districts of one city in DrilldownIndex.json) gets at least
+#                              two suppressed cells, and a suppressed parent at least one suppressed
+#                              child; repeated until nothing changes
+#   3. optional noise          --epsilon adds two-sided geometric (discrete Laplace) noise to every
+#                              published count (epsilon per count)
+# A county, or a city or school district lying in one county (one city), appears both in its
+# aggregate file and in DrilldownIndex.json. Cells are keyed by (election slice, geography, name),
+# and hiding any copy hides every copy in every pass, so a complement chosen in one copy cannot be
+# undone by subtraction in the other. Copies with the same counts get the same noise draw, so
+# averaging the copies does not cancel the noise.
+# Every file, election slice and hierarchy level is stacked into one set of arrays, so each pass
+# is a handful of vectorized operations however many small areas there are. Differencing across
+# different geographies (e.g. a city that equals its county) is not covered.
+
+PUBLISH_DIR = "published"
+DRILLDOWN_LEVELS = ["county", "city", "school_district"]
+
+
+def primary_suppression(total, voted, k):
+    total_hidden = total < k
+    not_voted = total - voted
+    small_turnout = ((voted > 0) & (voted < k)) | ((not_voted > 0) & (not_voted < k))
+    return total_hidden, total_hidden | small_turnout
+
+
+def complementary_suppression(values, groups, child_groups, suppressed, cells):
+    """Suppress more cells until no group has exactly one suppressed cell and no suppressed
+    parent has only published children. Picks the smallest published cell of each group; every
+    copy of a suppressed cell (same id in cells) is suppressed with it."""
+    suppressed = suppressed.copy()
+    num_groups = int(max(groups.max(), child_groups.max())) + 1
+    num_cells = int(cells.max()) + 1
+    sizes = np.bincount(groups, minlength=num_groups)
+    has_children = child_groups >= 0
+    while True:
+        suppressed = np.bincount(cells, weights=suppressed, minlength=num_cells)[cells] > 0
+        counts = np.bincount(groups, weights=suppressed, minlength=num_groups)
+        needs_more = (counts == 1) & (sizes > 1)
+        parent_hidden = np.zeros(num_groups, dtype=bool)
+        parent_hidden[child_groups[suppressed & has_children]] = True
+        needs_more |= parent_hidden & (counts == 0)
+        if not needs_more.any():
+            return suppressed
+
+        candidates = np.flatnonzero(needs_more[groups] & ~suppressed)
+        if len(candidates) == 0:
+            return suppressed
+        candidates = candidates[np.lexsort((values[candidates], groups[candidates]))]
+        _, first = np.unique(groups[candidates], return_index=True)
+        suppressed[candidates[first]] = True
+
+
+def geometric_noise(rng, epsilon, size):
+    p = 1 - np.exp(-epsilon)
+    return rng.geometric(p, size) - rng.geometric(p, size)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Publish the aggregates with small-cell suppression")
+    parser.add_argument("--k", type=int, default=MIN_VOTERS, help="Minimum published cell size")
+    parser.add_argument("--epsilon", type=float, default=None, help="Add discrete Laplace noise (epsilon per count)")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+    start = time.perf_counter()
+
+    data_dirs = [""]
+    if os.path.exists("history/elections.json"):
+        with open("history/elections.json", "r") as file:
+            data_dirs += [os.path.join("history", e["folder"], "") for e in json.load(file)]
+
+    # Step 1: Stack every cell into flat arrays; each file is one sibling group under the state.
+    # Keys name the cell (county names as Step7 writes them) to link its copies
+    county_lookup = read_county_lookup()
+    county_names = dict(zip(county_lookup["CountyCode"], county_lookup["County_Name"].astype(str).str.strip().str.title()))
+    tables, totals, voted, groups, child_groups, keys = [], [], [], [], [], []
+    for data_dir in data_dirs:
+        for geo in GEOGRAPHIES:
+            df = read_aggregate(data_dir + geo["data_file"])
+            tables.append((data_dir + geo["data_file"], df, sum(len(t) for t in totals)))
+            totals.append(df["Muslim_Total"].to_numpy(dtype=np.int64))
+            voted.append(df["Muslim_Voted"].fillna(0).to_numpy(dtype=np.int64))
+            groups.append(np.full(len(df), len(tables) - 1))
+            child_groups.append(np.full(len(df), -1))
+            names = df["CountyCode"].map(county_names) if geo["key"] == "county" else df.iloc[:, 0]
+            keys += [f"{data_dir}|{geo['key']}|{name}" for name in names.fillna("").astype(str).str.strip()]
+    next_group = len(tables)
+
+    # County -> city -> school district from DrilldownIndex.json, where children sum to their parent
+    drilldown, drilldown_nodes = None, []
+    if os.path.exists("DrilldownIndex.json"):
+        with open("DrilldownIndex.json", "r") as file:
+            drilldown = json.load(file)
+        node_groups, node_child_groups = [], []
+        node_paths = []
+        pending = [(drilldown, next_group, ())]
+        next_group += 1
+        while pending:
+            siblings, group, parents = pending.pop()
+            for name, node in siblings.items():
+                drilldown_nodes.append(node)
+                node_groups.append(group)
+                node_paths.append(parents + (name.strip(),))
+                if node.get("children"):
+                    pending.append((node["children"], next_group, node_paths[-1]))
+                    node_child_groups.append(next_group)
+                    next_group += 1
+                else:
+                    node_child_groups.append(-1)
+        totals.append(np.array([n["Muslim_Total"] for n in drilldown_nodes], dtype=np.int64))
+        voted.append(np.array([n["Muslim_Voted"] for n in drilldown_nodes], dtype=np.int64))
+        groups.append(np.array(node_groups, dtype=np.int64))
+        child_groups.append(np.array(node_child_groups, dtype=np.int64))
+        # A node is the same cell as its aggregate file row when no other node on its level has
+        # its name (e.g. a city split over two counties is two different, smaller cells)
+        repeats = pd.Series([(len(path), path[-1]) for path in node_paths]).value_counts()
+        keys += [f"|{DRILLDOWN_LEVELS[len(path) - 1]}|{path[-1]}" if repeats[(len(path), path[-1])] == 1
+                 else f"|drilldown|{'/'.join(path)}" for path in node_paths]
+
+    totals, voted = np.concatenate(totals), np.concatenate(voted)
+    groups, child_groups = np.concatenate(groups), np.concatenate(child_groups)
+    cells = pd.factorize(np.array(keys, dtype=object))[0]
+
+    # Step 2: Primary and complementary suppression for both dimensions, all cells at once
+    total_primary, turnout_primary = primary_suppression(totals, voted, args.k)
+    total_hidden = complementary_suppression(totals, groups, child_groups, total_primary, cells)
+    turnout_hidden = complementary_suppression(totals, groups, child_groups, turnout_primary | total_hidden, cells)
+
+    # Step 3: Optional noise on the published counts, one draw per distinct (cell, counts)
+    published_total = totals.astype(float)
+    published_voted = voted.astype(float)
+    if args.epsilon:
+        rng = np.random.default_rng(args.seed)
+        draws = pd.DataFrame({"cell": cells, "total": totals, "voted": voted}).groupby(
+            ["cell", "total", "voted"], sort=False).ngroup().to_numpy()
+        num_draws = int(draws.max()) + 1
+        published_total = np.maximum(published_total + geometric_noise(rng, args.epsilon, num_draws)[draws], 0)
+        published_voted = np.clip(published_voted + geometric_noise(rng, args.epsilon, num_draws)[draws],
+                                  0, published_total)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        published_percent = np.round(published_voted / published_total * 100, 2)
+    published_total[total_hidden] = np.nan
+    published_voted[turnout_hidden] = np.nan
+    published_percent[turnout_hidden] = np.nan
+
+    # Step 4: Write the published copies with the same file names
+    print(f"{'Aggregate':<60} {'Rows':>6} {'Hidden (primary + complementary)':>34}")
+    for file_name, df, offset in tables:
+        rows = slice(offset, offset + len(df))
+        out = df.copy()
+        out["Muslim_Total"] = pd.array(published_total[rows], dtype="Int64")
+        out["Muslim_Voted"] = pd.array(published_voted[rows], dtype="Int64")
+        out["Muslim_Voted_Percent"] = published_percent[rows]
+        out["Total_Suppressed"] = total_hidden[rows]
+        out["Turnout_Suppressed"] = turnout_hidden[rows]
+
+        out_path = os.path.join(PUBLISH_DIR, file_name)
+        os.makedirs(os.path.dirname(out_path) or ".", exist_ok=True)
+        out.to_csv(out_path, index=False)
+        primary = int(total_primary[rows].sum())
+        print(f"{file_name:<60} {len(df):>6,} {primary:>10,} + {int(total_hidden[rows].sum()) - primary:<6,} "
+              f"(turnout: {int(turnout_hidden[rows].sum()):,})")
+
+    if drilldown is not None:
+        offset = len(totals) - len(drilldown_nodes)
+        for i, node in enumerate(drilldown_nodes, start=offset):
+            node["Muslim_Total"] = None if total_hidden[i] else int(published_total[i])
+            node["Muslim_Voted"] = None if turnout_hidden[i] else int(published_voted[i])
+            node["Muslim_Voted_Percent"] = None if turnout_hidden[i] else float(published_percent[i])
+        with open(os.path.join(PUBLISH_DIR, "DrilldownIndex.json"), "w") as file:
+            json.dump(drilldown, file)
+        print(f"{'DrilldownIndex.json':<60} {len(drilldown_nodes):>6,} {int(total_hidden[offset:].sum()):>10,} hidden")
+
+    print(f"✅ Saved to {PUBLISH_DIR}/ (k={args.k}, "
+          f"{'epsilon=' + str(args.epsilon) if args.epsilon else 'no noise'}) in {time.perf_counter() - start:.2f}s")
@@ -1,7 +1,9 @@
 import pandas as pd
+from VoterDB import read_columns, store_aggregate
 
 # Load your full merged data (with CountyCode, Voted, etc.)
-df = pd.read_csv("muslim_voters_with_vote_status.csv")
+# (read from muslim_voters.sqlite, built by Step0_buildVoterDatabase.py)
+df = read_columns("voters", ["CountyCode", "Voted"])
 
 # --- Step 1: Total Muslim count per CountyCode ---
 total_counts = df.groupby("CountyCode").size().reset_index(name="Muslim_Total")
@@ -22,4 +24,5 @@ merged["Muslim_Voted_Percent"] = merged["Muslim_Voted_Percent"].round(2)  # Opti
 
 # --- Step 5: Save to file ---
 merged.to_csv("MuslimVoterStatsByCountyCode.csv", index=False)
+store_aggregate("MuslimVoterStatsByCountyCode.csv", merged)
 print("✅ Saved to MuslimVoterStatsByCountyCode.csv")
@@ -1,10 +1,14 @@
 import pandas as pd
+from VoterDB import read_columns, store_aggregate
+from CityResolution import resolve_city_names
 
 # Load full merged voter file (must have 'City' and 'Voted' columns)
-df = pd.read_csv("muslim_voters_with_vote_status.csv")
+# (read from muslim_voters.sqlite, built by Step0_buildVoterDatabase.py)
+df = read_columns("voters", ["City", "Voted"])
 
-# Step 1: Clean City names (optional but helps with grouping)
-df["City"] = df["City"].astype(str).str.strip().str.title()
+# Step 1: Clean City names and key them by their city boundary feature (city_resolution.csv
+# from CityResolution.py; without it the title-cased names are used)
+df["City"] = resolve_city_names(df["City"])
 
 # Step 2: Total Muslim count per city
 total_counts = df.groupby("City").size().reset_index(name="Muslim_Total")
@@ -30,4 +34,5 @@ merged["Muslim_Voted_Percent"] = (
 
 # Step 6: Save to CSV
 merged.to_csv("MuslimsPerCityVoting.csv", index=False)
+store_aggregate("MuslimsPerCityVoting.csv", merged)
 print("✅ Saved to MuslimsPerCity.csv")
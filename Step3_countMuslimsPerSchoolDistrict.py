@@ -1,8 +1,10 @@
 import pandas as pd
 import re
+from VoterDB import read_columns, store_aggregate
 
 # Load your dataset
-df = pd.read_csv("muslim_voters_with_vote_status.csv")
+# (read from muslim_voters.sqlite, built by Step0_buildVoterDatabase.py)
+df = read_columns("voters", ["School District", "Voted"])
 
 # Clean the 'School District' column
 def clean_district(name):
@@ -39,4 +41,5 @@ merged = merged.rename(columns={"clean_district": "school_district"})
 
 # Save to file
 merged.to_csv("MuslimPerSchoolDistrictVoted2.csv", index=False)
+store_aggregate("MuslimPerSchoolDistrictVoted2.csv", merged)
 print("✅ Saved to MuslimPerSchoolDistrict.csv")
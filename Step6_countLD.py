@@ -1,7 +1,9 @@
 import pandas as pd
+from VoterDB import read_columns, store_aggregate
 
 # Load full merged voter file (must have State Assembly District' and 'Voted' columns)
-df = pd.read_csv("muslim_Voters_data_with_SchoolDistrict_CD_LD_Voted.csv")
+# (read from muslim_voters.sqlite, built by Step0_buildVoterDatabase.py)
+df = read_columns("voters_with_districts", ["State Assembly District", "Voted"])
 
 # Step 1: Clean State Assembly District names
 df["State Assembly District"] = df["State Assembly District"].astype(str).str.strip()
@@ -30,4 +32,5 @@ merged["Muslim_Voted_Percent"] = (
 
 # Step 6: Save the result
 merged.to_csv("MuslimsPerStateAssemblyDistrictVoting.csv", index=False)
+store_aggregate("MuslimsPerStateAssemblyDistrictVoting.csv", merged)
 print("✅ Saved to MuslimsPerStateSenateDistrictVoting.csv")
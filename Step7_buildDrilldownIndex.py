@@ -0,0 +1,67 @@
+import pandas as pd
+import json
+import re
+from VoterDB import read_columns
+from States import read_county_lookup
+from CityResolution import resolve_city_names
+
+# Load the voter table from muslim_voters.sqlite (Step0_buildVoterDatabase.py)
+df = read_columns("voters", ["CountyCode", "City", "School District", "Voted"])
+county_lookup = read_county_lookup()  # Contains CountyCode, County_Name (the state's county table)
+
+# Step 1: Attach county names so the index is keyed the same way as the county map
+df = pd.merge(df, county_lookup, on="CountyCode", how="left")
+df["County_Name"] = df["County_Name"].astype(str).str.strip().str.title()
+
+# Step 2: Clean City names the same way Step2 does (resolved to the city map's feature names by
+# CityResolution.py) and School District names the same way Step3 does
+df["City"] = resolve_city_names(df["City"])
+
+def clean_district(name):
+    if isinstance(name, str):
+        name = name.lower()
+        match = re.search(r"(.*?school district)", name)
+        if match:
+            return match.group(1).strip()
+        return name.strip()
+    return ""  # return empty string for NaN or invalid entries
+
+df["school_district"] = df["School District"].apply(clean_district)
+df["is_voted"] = (df["Voted"].astype(str).str.lower() == "yes").astype(int)
+
+# Step 3: One groupby per level of the hierarchy (county -> city -> school district)
+def rollup(keys):
+    counts = (
+        df.groupby(keys)
+        .agg(Muslim_Total=("is_voted", "size"), Muslim_Voted=("is_voted", "sum"))
+        .reset_index()
+    )
+    counts["Muslim_Voted_Percent"] = (counts["Muslim_Voted"] / counts["Muslim_Total"] * 100).round(2)
+    return counts
+
+def stats(row):
+    return {
+        "Muslim_Total": int(row.Muslim_Total),
+        "Muslim_Voted": int(row.Muslim_Voted),
+        "Muslim_Voted_Percent": float(row.Muslim_Voted_Percent),
+    }
+
+county_counts = rollup(["County_Name"])
+city_counts = rollup(["County_Name", "City"])
+district_counts = rollup(["County_Name", "City", "school_district"])
+
+# Step 4: Nest the levels into a parent -> children index
+index = {}
+for row in county_counts.itertuples(index=False):
+    index[row.County_Name] = {**stats(row), "children": {}}
+
+for row in city_counts.itertuples(index=False):
+    index[row.County_Name]["children"][row.City] = {**stats(row), "children": {}}
+
+for row in district_counts.itertuples(index=False):
+    index[row.County_Name]["children"][row.City]["children"][row.school_district] = stats(row)
+
+# Step 5: Save the index next to the other render tables
+with open("DrilldownIndex.json", "w") as file:
+    json.dump(index, file)
+print("✅ Saved to DrilldownIndex.json")
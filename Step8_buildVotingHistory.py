@@ -0,0 +1,42 @@
+import pandas as pd
+import numpy as np
+import os
+from VoterDB import read_columns
+
+# Build a compact voting-history store: one bit per voter per election.
+#
+# Input is a long file with one row per (voter, election):
+#   RegistrantID, Election, Voted
+# Elections are kept in the order they first appear in the file, so list them oldest first.
+# If there is no history file yet, the single 'Voted' flag from the current voter file is
+# stored as one election so the rest of the pipeline works the same way.
+HISTORY_FILE = "voting_history.csv"
+CURRENT_ELECTION = "2024 General"
+
+if os.path.exists(HISTORY_FILE):
+    history = pd.read_csv(HISTORY_FILE, usecols=["RegistrantID", "Election", "Voted"])
+else:
+    history = read_columns("voters", ["RegistrantID", "Voted"])
+    history["Election"] = CURRENT_ELECTION
+
+# Step 1: Give every voter and every election an integer position
+voter_codes, voter_ids = pd.factorize(history["RegistrantID"].astype(str), sort=True)
+election_codes, elections = pd.factorize(history["Election"].astype(str))
+
+# Step 2: Fill a (voters x elections) boolean matrix in one vectorized assignment
+voted = np.zeros((len(voter_ids), len(elections)), dtype=bool)
+is_yes = (history["Voted"].astype(str).str.lower() == "yes").to_numpy()
+voted[voter_codes[is_yes], election_codes[is_yes]] = True
+
+# Step 3: Pack the matrix into bits (8 elections per byte per voter)
+bits = np.packbits(voted, axis=1)
+
+# Step 4: Save ids, election labels and bits together
+np.savez_compressed(
+    "VotingHistory.npz",
+    ids=np.asarray(voter_ids, dtype=str),
+    elections=np.asarray(elections, dtype=str),
+    bits=bits,
+)
+print(f"✅ Saved {len(voter_ids):,} voters x {len(elections)} elections to VotingHistory.npz "
+      f"({bits.nbytes / 1e6:.2f} MB of bits)")
@@ -0,0 +1,94 @@
+import pandas as pd
+import numpy as np
+import json
+import os
+import re
+from VoterDB import read_columns, store_aggregate
+from CityResolution import resolve_city_names
+
+# Turn VotingHistory.npz (from Step8_buildVotingHistory.py) into per-geography turnout
+# series, and write one slice per election with the same file names the Step 1-6 scripts
+# produce, under history/<election>/. MapVoting.py reads these slices for its election selector.
+
+store = np.load("VotingHistory.npz")
+voter_ids = pd.Index(store["ids"])
+elections = list(store["elections"])
+bits = store["bits"]  # voters x ceil(elections / 8) bytes, election e in bit 7 - e % 8 of byte e // 8
+
+def clean_district(name):
+    if isinstance(name, str):
+        name = name.lower()
+        match = re.search(r"(.*?school district)", name)
+        if match:
+            return match.group(1).strip()
+        return name.strip()
+    return ""  # return empty string for NaN or invalid entries
+
+# Step 1: Load the geography columns for every voter from muslim_voters.sqlite (same cleaning as the Step scripts)
+status_df = read_columns("voters", ["RegistrantID", "CountyCode", "City", "School District"])
+status_df["City"] = resolve_city_names(status_df["City"])
+status_df["school_district"] = status_df["School District"].apply(clean_district)
+
+district_df = read_columns(
+    "voters_with_districts",
+    ["Voters Id", "Congressional District", "State Senate District", "State Assembly District"]
+)
+for column in ["Congressional District", "State Senate District", "State Assembly District"]:
+    district_df[column] = district_df[column].astype(str).str.strip()
+
+# (voter frame, id column, geography column, output file)
+geographies = [
+    (status_df, "RegistrantID", "CountyCode", "MuslimVoterStatsByCountyCode.csv"),
+    (status_df, "RegistrantID", "City", "MuslimsPerCityVoting.csv"),
+    (status_df, "RegistrantID", "school_district", "MuslimPerSchoolDistrictVoted2.csv"),
+    (district_df, "Voters Id", "Congressional District", "MuslimsPerCongressionalDistrictVoting.csv"),
+    (district_df, "Voters Id", "State Senate District", "MuslimsPerStateSenateDistrictVoting.csv"),
+    (district_df, "Voters Id", "State Assembly District", "MuslimsPerStateAssemblyDistrictVoting.csv"),
+]
+
+def turnout_series(frame, id_column, geo_column):
+    # Voters with a value for this geography (factorize gives -1 for missing ones, which the
+    # Step scripts' groupby drops as well)
+    geo_codes, geo_names = pd.factorize(frame[geo_column], sort=True)
+    known = geo_codes >= 0
+    geo_codes = geo_codes[known]
+    totals = np.bincount(geo_codes, minlength=len(geo_names))
+
+    # Row of the voting matrix for each of them (voters with no history count as not voted)
+    rows = voter_ids.get_indexer(frame[id_column].astype(str).to_numpy()[known])
+    found = rows >= 0
+    rows, found_codes = rows[found], geo_codes[found]
+
+    # Count each election's voters per geography straight from its packed bit column, so no
+    # voters x elections matrix is ever unpacked
+    voted_counts = np.zeros((len(geo_names), len(elections)), dtype=np.int64)
+    for e in range(len(elections)):
+        voted_e = ((bits[rows, e // 8] >> (7 - e % 8)) & 1).astype(bool)
+        voted_counts[:, e] = np.bincount(found_codes[voted_e], minlength=len(geo_names))
+    return geo_names, totals, voted_counts
+
+def election_slug(election):
+    return re.sub(r"[^A-Za-z0-9]+", "_", election).strip("_")
+
+# Step 2: One vectorized pass per geography, then write a slice per election
+for frame, id_column, geo_column, output_file in geographies:
+    geo_names, totals, voted_counts = turnout_series(frame, id_column, geo_column)
+    percents = np.round(voted_counts / totals[:, None] * 100, 2)
+
+    for e, election in enumerate(elections):
+        out_dir = os.path.join("history", election_slug(election))
+        os.makedirs(out_dir, exist_ok=True)
+        slice_df = pd.DataFrame({
+            geo_column: geo_names,
+            "Muslim_Total": totals,
+            "Muslim_Voted": voted_counts[:, e],
+            "Muslim_Voted_Percent": percents[:, e],
+        })
+        slice_df.to_csv(os.path.join(out_dir, output_file), index=False)
+        store_aggregate(os.path.join(out_dir, output_file), slice_df)
+    print(f"✅ Saved {output_file} for {len(elections)} elections")
+
+# Step 3: Save the election list for the dashboard selector (oldest first)
+with open(os.path.join("history", "elections.json"), "w") as file:
+    json.dump([{"election": e, "folder": election_slug(e)} for e in elections], file)
+print("✅ Saved to history/elections.json")
@@ -0,0 +1,166 @@
+import pandas as pd
+import sqlite3
+import os
+import re
+from urllib.request import pathname2url
+
+# Embedded SQLite database for the voter tables and every aggregate output.
+#
+# Tables:
+#   voters                 muslim_voters_with_vote_status.csv
+#   cd_ld_voters           FinaaaalCD AND LD data.csv
+#   voters_with_districts  the AddSchoolDistrict.py join
+#   agg_<name>             one table per aggregate CSV (e.g. agg_MuslimsPerCityVoting,
+#                          agg_history_2022_General_MuslimsPerCityVoting)
+# Voter tables are indexed on their id and geography columns, aggregate tables on
+# their geography key, so consumers run indexed queries in-process instead of CSV scans.
+# Readers open the database read-only, so a missing database is an error instead of a new empty
+# file; read_aggregate() falls back to the aggregate's CSV (the committed copies, on a fresh
+# checkout) when the database or its table does not exist.
+#
+# When BASE_DB_VARIABLE names a database (WatchPipeline.py sets it for a staged rebuild), every
+# connection attaches it read-only as "base": tables missing from the opened (scratch) database
+# are read from it, and everything written lands in the scratch database.
+
+DB_FILE = "muslim_voters.sqlite"
+BASE_DB_VARIABLE = "VOTER_DB_BASE"
+
+VOTER_TABLES = {
+    "voters": {
+        "file": "muslim_voters_with_vote_status.csv",
+        "partition": "voters.parquet",
+        "id_column": "RegistrantID",
+        "indexed": ["RegistrantID", "CountyCode", "City", "School District"],
+    },
+    "cd_ld_voters": {
+        "file": "FinaaaalCD AND LD data.csv",
+        "partition": "cd_ld_voters.parquet",
+        "id_column": "Voters Id",
+        "indexed": ["Voters Id"],
+    },
+}
+
+DISTRICT_COLUMNS = ["Congressional District", "State Senate District", "State Assembly District"]
+
+
+def read_only_uri(path):
+    return f"file:{pathname2url(os.path.abspath(path))}?mode=ro"
+
+
+def connect(path=DB_FILE, read_only=False):
+    if read_only:
+        if not os.path.exists(path):
+            raise FileNotFoundError(f"{path} not found (run Step0_buildVoterDatabase.py)")
+        connection = sqlite3.connect(read_only_uri(path), uri=True)
+    else:
+        connection = sqlite3.connect(path, uri=True)
+    base = os.environ.get(BASE_DB_VARIABLE)
+    if base and os.path.exists(base):
+        connection.execute("ATTACH DATABASE ? AS base", [read_only_uri(base)])
+    return connection
+
+
+def has_table(connection, table):
+    """Whether the database or one attached to it (the "base" of a staged rebuild) has the table."""
+    schemas = [row[1] for row in connection.execute("PRAGMA database_list")]
+    return any(connection.execute(f"SELECT 1 FROM {quote(schema)}.sqlite_master WHERE type = 'table' AND name = ?",
+                                  [table]).fetchone() for schema in schemas)
+
+
+def quote(name):
+    return '"' + name.replace('"', '""') + '"'
+
+
+def create_indexes(connection, table, columns):
+    for column in columns:
+        index_name = re.sub(r"\W+", "_", f"idx_{table}_{column}")
+        connection.execute(f"CREATE INDEX IF NOT EXISTS {index_name} ON {table} ({quote(column)})")
+    connection.commit()
+
+
+def load_csv(connection, table, csv_file, id_column, chunksize=500_000):
+    """(Re)load a voter CSV into a table, keeping the id column as text."""
+    connection.execute(f"DROP TABLE IF EXISTS main.{table}")
+    for chunk in pd.read_csv(csv_file, dtype={id_column: str}, chunksize=chunksize):
+        chunk.to_sql(table, connection, if_exists="append", index=False)
+    connection.commit()
+
+
+def load_parquet(connection, table, dataset_dir, id_column):
+    """(Re)load a table from a Hive-partitioned Parquet dataset (PartitionVoters.py), batch by batch;
+    the partition columns (e.g. CountyCode) come back as columns."""
+    import pyarrow.dataset as ds
+
+    connection.execute(f"DROP TABLE IF EXISTS main.{table}")
+    dataset = ds.dataset(dataset_dir, format="parquet", partitioning="hive")
+    for batch in dataset.to_batches():
+        chunk = batch.to_pandas()
+        chunk[id_column] = chunk[id_column].astype(str)
+        chunk.to_sql(table, connection, if_exists="append", index=False)
+    connection.commit()
+
+
+def read_columns(table, columns, connection=None):
+    """Read just the given columns of a table (what the Step scripts used to get from read_csv)."""
+    connection = connection or connect(read_only=True)
+    sql = f"SELECT {', '.join(quote(c) for c in columns)} FROM {table}"
+    return pd.read_sql_query(sql, connection)
+
+
+def aggregate_table_name(file_name):
+    stem = os.path.splitext(file_name)[0]
+    return "agg_" + re.sub(r"\W+", "_", stem).strip("_")
+
+
+def store_aggregate(file_name, df, connection=None):
+    """Save an aggregate next to its CSV, indexed by its first (geography) column."""
+    connection = connection or connect()
+    table = aggregate_table_name(file_name)
+    df.to_sql(table, connection, if_exists="replace", index=False)
+    create_indexes(connection, table, [df.columns[0]])
+
+
+def read_aggregate(file_name, connection=None):
+    """Read an aggregate by its CSV file name, e.g. read_aggregate('MuslimsPerCityVoting.csv'),
+    from the database when it has the table, else from the CSV."""
+    if connection is None and not os.path.exists(DB_FILE):
+        return pd.read_csv(file_name)
+    connection = connection or connect(read_only=True)
+    table = aggregate_table_name(file_name)
+    if not has_table(connection, table):
+        return pd.read_csv(file_name)
+    return pd.read_sql_query(f"SELECT * FROM {table}", connection)
+
+
+def geography_row(file_name, key_column, key, connection=None):
+    """Indexed lookup of one geography's aggregate row."""
+    connection = connection or connect(read_only=True)
+    sql = f"SELECT * FROM {aggregate_table_name(file_name)} WHERE {quote(key_column)} = ?"
+    return pd.read_sql_query(sql, connection, params=[key])
+
+
+def voter_lookup(ids, connection=None):
+    """Which districts is each voter in, and did they vote?"""
+    connection = connection or connect(read_only=True)
+    placeholders = ", ".join("?" for _ in ids)
+    sql = f"""
+        SELECT "Voters Id", "School District", {', '.join(quote(c) for c in DISTRICT_COLUMNS)}, "Voted"
+        FROM voters_with_districts
+        WHERE "Voters Id" IN ({placeholders})
+    """
+    return pd.read_sql_query(sql, connection, params=[str(i) for i in ids])
+
+
+def voter_geographies(connection=None):
+    """Every voters row with all six geography columns: the first voters_with_districts row with
+    the same id supplies the legislative districts (NULL when the voter has none)."""
+    connection = connection or connect(read_only=True)
+    sql = f"""
+        SELECT v."RegistrantID", v."CountyCode", v."City", v."School District", v."Voted",
+               {', '.join('d.' + quote(c) for c in DISTRICT_COLUMNS)}
+        FROM voters v
+        LEFT JOIN voters_with_districts d
+          ON d.rowid = (SELECT MIN(rowid) FROM voters_with_districts WHERE "Voters Id" = v."RegistrantID")
+        ORDER BY v.rowid
+    """
+    return pd.read_sql_query(sql, connection)
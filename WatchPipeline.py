@@ -0,0 +1,364 @@
+import argparse
+import ctypes
+import ctypes.util
+import json
+import os
+import runpy
+import select
+import shutil
+import sqlite3
+import struct
+import subprocess
+import sys
+import time
+from ChangeReport import SNAPSHOT_DIR
+from DashboardBundle import ARTIFACTS_VERSION_FILE, BUNDLE_FILE
+from PreprocessBoundaries import CACHE_DIR
+from RenderTables import GEOGRAPHIES, RENDER_DIR
+from RegistrantIndex import table_index_paths
+from VoterDB import BASE_DB_VARIABLE, DB_FILE, VOTER_TABLES, quote
+from States import STATE, boundary_source
+
+# Watch mode: rebuild only what a changed input affects, then hot-swap the results.
+#
+#   python WatchPipeline.py                 watch with inotify (polling where inotify is missing)
+#   python WatchPipeline.py --changed X     rebuild once as if X had changed
+#
+# 1. Changes to the voter CSVs or their Parquet partitions (RunStates.py links them in; a
+#    partition swapped in by PartitionVoters.py is seen where its link points), the voting
+#    history, the county lookup and the boundary files are picked up with inotify
+#    (close-after-write / moved-in / created), debounced.
+# 2. The affected stages are found from STAGES (inputs -> outputs, in pipeline order).
+# 3. They run in .pipeline_staging/, which mirrors this directory with symlinks, except for the
+#    stages' own outputs and, if a stage writes to the database, an empty scratch
+#    muslim_voters.sqlite: the live database is attached to it read-only (VoterDB.BASE_DB_VARIABLE),
+#    so the stages read the tables they do not write from it and only the tables they write are
+#    staged. A failed stage leaves the live files untouched. Each stage runs with an audit hook
+#    that fails its writes to project files outside the staging directory (and the append-only
+#    SHARED_DIRS), so an undeclared output cannot write through a staging symlink into a live file.
+#    CheckConsistency.py then checks the staged aggregates; a failed check also leaves everything
+#    live untouched.
+# 4. Every output file is moved into place with os.replace (never a half-written CSV), and the
+#    staged tables are copied into the live database in one transaction. An output
+#    directory is moved to .pipeline_versions/ and its live path, a symlink, is flipped to it
+#    with one os.replace, so readers see either the whole old or the whole new directory (the
+#    previous version is kept for readers still inside it). The dashboard bundle goes last, then
+#    artifacts_version.json is bumped. Map.py / MapVoting.py poll it, clear their caches and
+#    rerun, so open dashboards show the new data without a restart.
+
+STAGING_DIR = ".pipeline_staging"
+VERSIONS_DIR = ".pipeline_versions"
+KEEP_VERSIONS = 2
+# Append-only directories the stages add to in place: the snapshot history and the
+# content-addressed boundary cache
+SHARED_DIRS = [SNAPSHOT_DIR, CACHE_DIR]
+
+VOTER_FILES = [settings["file"] for settings in VOTER_TABLES.values()]
+VOTER_PARTITIONS = [settings["partition"] for settings in VOTER_TABLES.values()]
+BOUNDARY_FILES = [boundary_source(geo["key"]) for geo in GEOGRAPHIES]
+COUNTY_LOOKUP_FILE = STATE["county_lookup"]["file"]
+AGGREGATE_FILES = [geo["data_file"] for geo in GEOGRAPHIES]
+
+# Run on the staged outputs before anything is swapped in, whenever the stages wrote to the database
+CONSISTENCY_CHECK = "CheckConsistency.py"
+
+# (script, inputs, outputs) in pipeline order; "db:<table>" is a table in muslim_voters.sqlite
+STAGES = [
+    ("Step0_buildVoterDatabase.py", VOTER_FILES + VOTER_PARTITIONS,
+     ["db:voters", "db:cd_ld_voters"] + [path for table in VOTER_TABLES for path in table_index_paths(table)]),
+    ("AddSchoolDistrict.py", ["db:voters", "db:cd_ld_voters"],
+     ["db:voters_with_districts", "muslim_Voters_data_with_SchoolDistrict_CD_LD_Voted.csv"]),
+    ("Step1_countMuslimPerCountycode.py", ["db:voters"], ["MuslimVoterStatsByCountyCode.csv", "db:aggregates"]),
+    ("CityResolution.py", ["db:voters", "city_aliases.csv", boundary_source("city"), boundary_source("county"),
+                           COUNTY_LOOKUP_FILE]
+     + ([STATE["places"]["file"]] if "places" in STATE else []), ["city_resolution.csv"]),
+    ("Step2_countMuslimPerCity.py", ["db:voters", "city_resolution.csv"], ["MuslimsPerCityVoting.csv", "db:aggregates"]),
+    ("Step3_countMuslimsPerSchoolDistrict.py", ["db:voters"], ["MuslimPerSchoolDistrictVoted2.csv", "db:aggregates"]),
+    ("step4_countPerCD.py", ["db:voters_with_districts"], ["MuslimsPerCongressionalDistrictVoting.csv", "db:aggregates"]),
+    ("step5_countStateSenate.py", ["db:voters_with_districts"], ["MuslimsPerStateSenateDistrictVoting.csv", "db:aggregates"]),
+    ("Step6_countLD.py", ["db:voters_with_districts"], ["MuslimsPerStateAssemblyDistrictVoting.csv", "db:aggregates"]),
+    ("Step7_buildDrilldownIndex.py", ["db:voters", COUNTY_LOOKUP_FILE, "city_resolution.csv"], ["DrilldownIndex.json"]),
+    ("Step8_buildVotingHistory.py", ["voting_history.csv", "db:voters"], ["VotingHistory.npz"]),
+    ("Step9_countTurnoutHistory.py", ["VotingHistory.npz", "db:voters", "db:voters_with_districts",
+                                      "city_resolution.csv"],
+     ["history", "db:aggregates"]),
+    ("Step10_computeMapStats.py", AGGREGATE_FILES + ["history"], [RENDER_DIR]),
+    ("ChangeReport.py", [RENDER_DIR], ["change_report.csv"]),
+    ("Crosswalks.py", ["db:voters", "db:voters_with_districts", "city_resolution.csv"], ["crosswalks.npz"]),
+    ("HexGrid.py", ["muslim_voters_geocoded.csv"], ["hexbins.npz"]),
+    ("Step11_publishAggregates.py", AGGREGATE_FILES + ["history", "DrilldownIndex.json"], ["published"]),
+    ("PreprocessBoundaries.py", BOUNDARY_FILES, ["boundaries"]),
+    ("DotDensity.py", [RENDER_DIR, "boundaries"], ["dots"]),
+    ("BuildMapPayloads.py", ["boundaries"], [os.path.join("static", "geo")]),
+    ("ExportZoomMap.py", ["boundaries", RENDER_DIR, "history"], [os.path.join("static", "zoom")]),
+    ("DashboardBundle.py", AGGREGATE_FILES + ["history", RENDER_DIR, "boundaries", "DrilldownIndex.json"],
+     [BUNDLE_FILE]),
+]
+
+# Files dropped in from outside the pipeline
+WATCHED_FILES = sorted({i for _, inputs, _ in STAGES for i in inputs
+                        if not i.startswith("db:") and not any(i in outputs for _, _, outputs in STAGES)})
+
+
+def affected_stages(changed):
+    dirty, stages = set(changed), []
+    for script, inputs, outputs in STAGES:
+        if dirty.intersection(inputs):
+            stages.append((script, outputs))
+            dirty.update(outputs)
+    return stages
+
+
+def build_staging(outputs, stage_database):
+    """Mirror the project into STAGING_DIR: symlinks for everything except the stage outputs
+    (created fresh by the stages) and, if a stage writes to it, the database, which becomes an
+    empty scratch database for the staged tables."""
+    shutil.rmtree(STAGING_DIR, ignore_errors=True)
+    # Shared directories are linked like any input, so they must exist
+    for directory in SHARED_DIRS:
+        os.makedirs(directory, exist_ok=True)
+    outputs = {os.path.normpath(o) for o in outputs}
+    skip = {STAGING_DIR, VERSIONS_DIR, ".git", DB_FILE if stage_database else None}
+
+    def mirror(relative_dir):
+        os.makedirs(os.path.join(STAGING_DIR, relative_dir), exist_ok=True)
+        for name in os.listdir(relative_dir or "."):
+            path = os.path.normpath(os.path.join(relative_dir, name))
+            if path in skip or path in outputs:
+                continue
+            if any(o.startswith(path + os.sep) for o in outputs):
+                mirror(path)  # a directory that holds an output: mirror it one level down
+            else:
+                os.symlink(os.path.abspath(path), os.path.join(STAGING_DIR, path))
+
+    mirror("")
+    if stage_database:
+        sqlite3.connect(os.path.join(STAGING_DIR, DB_FILE)).close()
+
+
+def merge_staged_tables():
+    """Replace the live copies of the tables in the scratch database, all in one transaction."""
+    connection = sqlite3.connect(DB_FILE, isolation_level=None)
+    connection.execute("ATTACH DATABASE ? AS staged", [os.path.join(STAGING_DIR, DB_FILE)])
+    tables = connection.execute("SELECT name, sql FROM staged.sqlite_master WHERE type = 'table'").fetchall()
+    indexes = connection.execute("SELECT sql FROM staged.sqlite_master WHERE type = 'index' AND sql IS NOT NULL")
+    indexes = [sql for (sql,) in indexes]
+    connection.execute("BEGIN IMMEDIATE")
+    for name, sql in tables:
+        connection.execute(f"DROP TABLE IF EXISTS main.{quote(name)}")
+        connection.execute(sql)  # unqualified CREATE TABLE / CREATE INDEX go to main
+        connection.execute(f"INSERT INTO main.{quote(name)} SELECT * FROM staged.{quote(name)}")
+    for sql in indexes:
+        connection.execute(sql)
+    connection.execute("COMMIT")
+    connection.execute("DETACH DATABASE staged")
+    connection.close()
+    return [name for name, _ in tables]
+
+
+def guard_writes(project_dir):
+    """Audit hook for a stage process (run in STAGING_DIR): writing, creating, renaming or
+    removing a project file outside the staging directory and SHARED_DIRS raises PermissionError."""
+    project_dir = os.path.realpath(project_dir)
+    allowed = [os.path.realpath(".")] + [os.path.realpath(os.path.join(project_dir, d)) for d in SHARED_DIRS]
+    write_flags = os.O_WRONLY | os.O_RDWR | os.O_APPEND | os.O_CREAT | os.O_TRUNC
+
+    def inside(path, directory):
+        return path == directory or path.startswith(directory + os.sep)
+
+    def check(path, follow=True):
+        if isinstance(path, int):
+            return
+        path = os.path.abspath(os.fsdecode(path))
+        # A renamed or removed entry is the link itself, not its target
+        real = (os.path.realpath(path) if follow
+                else os.path.join(os.path.realpath(os.path.dirname(path)), os.path.basename(path)))
+        if inside(real, project_dir) and not any(inside(real, d) for d in allowed):
+            raise PermissionError(f"{real} is not a declared output of this stage")
+
+    def hook(event, args):
+        if event == "open" and (args[1] is None and args[2] & write_flags or args[1] and set(args[1]) & set("wax+")):
+            check(args[0])
+        elif event in ("os.remove", "os.rmdir", "os.mkdir", "shutil.rmtree"):
+            check(args[0], follow=False)
+        elif event == "os.rename":
+            check(args[0], follow=False)
+            check(args[1], follow=False)
+        elif event == "sqlite3.connect" and "mode=ro" not in str(args[0]):
+            check(args[0])
+
+    sys.addaudithook(hook)
+
+
+def flip_directory(output, staged):
+    """Move a staged directory to VERSIONS_DIR and point the live symlink at it."""
+    os.makedirs(VERSIONS_DIR, exist_ok=True)
+    name = output.replace(os.sep, "__")
+    version = os.path.join(VERSIONS_DIR, f"{name}.{time.time_ns()}")
+    os.replace(staged, version)
+    if os.path.isdir(output) and not os.path.islink(output):
+        # Once, when a plain directory is first converted: it becomes the previous version
+        os.replace(output, os.path.join(VERSIONS_DIR, f"{name}.0"))
+    temp_link = output + ".link.tmp"
+    if os.path.lexists(temp_link):
+        os.remove(temp_link)
+    os.symlink(os.path.relpath(version, os.path.dirname(output) or "."), temp_link)
+    os.replace(temp_link, output)
+    versions = sorted((v for v in os.listdir(VERSIONS_DIR) if v.rsplit(".", 1)[0] == name),
+                      key=lambda v: int(v.rsplit(".", 1)[1]))
+    for old in versions[:-KEEP_VERSIONS]:
+        shutil.rmtree(os.path.join(VERSIONS_DIR, old), ignore_errors=True)
+
+
+def swap_in(outputs):
+    """Move every staged output into place: one os.replace per file, one symlink flip per directory."""
+    for output in outputs:
+        staged = os.path.join(STAGING_DIR, output)
+        if os.path.isdir(staged):
+            flip_directory(output, staged)
+        elif os.path.exists(staged):
+            os.replace(staged, output)
+
+
+def run_stage(script, env):
+    """Run one script in STAGING_DIR under guard_writes; print why and return False if it fails."""
+    stage_start = time.perf_counter()
+    result = subprocess.run([sys.executable, os.path.abspath(__file__), "--stage", os.path.abspath(script)],
+                            cwd=STAGING_DIR, env=env, capture_output=True, text=True)
+    if result.returncode != 0:
+        print(f"❌ {script} failed, live artifacts left unchanged:\n{result.stdout[-2000:]}{result.stderr[-2000:]}")
+        return False
+    print(f"   {script:<40} {time.perf_counter() - stage_start:>6.1f}s")
+    return True
+
+
+def rebuild(changed):
+    stages = affected_stages(changed)
+    if not stages:
+        return
+    start = time.perf_counter()
+    print(f"🔄 {', '.join(sorted(changed))} changed: running {', '.join(s for s, _ in stages)}")
+
+    file_outputs = [o for _, outputs in stages for o in outputs if not o.startswith("db:")]
+    writes_database = any(o.startswith("db:") for _, outputs in stages for o in outputs)
+    build_staging(file_outputs, writes_database)
+    env = dict(os.environ)
+    if writes_database and os.path.exists(DB_FILE):
+        env[BASE_DB_VARIABLE] = os.path.abspath(DB_FILE)
+
+    scripts = [script for script, _ in stages] + ([CONSISTENCY_CHECK] if writes_database else [])
+    for script in scripts:
+        if not run_stage(script, env):
+            return
+
+    # Dashboard bundle last: it is what the apps read first
+    swap_in([o for o in file_outputs if o != BUNDLE_FILE])
+    if writes_database:
+        tables = merge_staged_tables()
+        print(f"   {len(tables)} tables replaced in {DB_FILE}")
+    swap_in([o for o in file_outputs if o == BUNDLE_FILE])
+    shutil.rmtree(STAGING_DIR, ignore_errors=True)
+
+    temp_file = ARTIFACTS_VERSION_FILE + ".tmp"
+    with open(temp_file, "w") as file:
+        json.dump({"rebuilt_at": time.time(), "changed": sorted(changed), "stages": [s for s, _ in stages]}, file)
+    os.replace(temp_file, ARTIFACTS_VERSION_FILE)
+    print(f"✅ Swapped in new artifacts in {time.perf_counter() - start:.1f}s")
+
+
+# inotify(7) through libc, so watch mode needs no extra package
+IN_CLOSE_WRITE, IN_MOVED_TO, IN_CREATE = 0x00000008, 0x00000080, 0x00000100
+EVENT_HEADER = struct.Struct("iIII")
+
+
+def open_inotify(names):
+    """Watch the directory each name lives in: this one, or for a link (a linked-in partition)
+    the directory of its target, which PartitionVoters.py replaces as a whole.
+    Returns the inotify descriptor and {(watch descriptor, entry name): watched name}."""
+    libc = ctypes.CDLL(ctypes.util.find_library("c"), use_errno=True)
+    fd = libc.inotify_init1(os.O_CLOEXEC)
+    if fd < 0:
+        raise OSError(ctypes.get_errno(), "inotify is not available")
+    targets = {}
+    for name in names:
+        places = [(".", name)]
+        if os.path.islink(name):
+            places.append(os.path.split(os.path.realpath(name)))
+        for directory, entry in places:
+            watch = libc.inotify_add_watch(fd, os.fsencode(directory), IN_CLOSE_WRITE | IN_MOVED_TO | IN_CREATE)
+            if watch < 0:
+                raise OSError(ctypes.get_errno(), f"cannot watch {directory}")
+            targets[(watch, entry)] = name
+    return fd, targets
+
+
+def inotify_events(fd, targets, debounce):
+    """Yield sets of changed names, after `debounce` seconds without further events."""
+    changed = set()
+    while True:
+        ready, _, _ = select.select([fd], [], [], debounce if changed else None)
+        if not ready:
+            yield changed
+            changed = set()
+            continue
+        data = os.read(fd, 64 * 1024)
+        offset = 0
+        while offset < len(data):
+            watch, _, _, length = EVENT_HEADER.unpack_from(data, offset)
+            entry = data[offset + EVENT_HEADER.size:offset + EVENT_HEADER.size + length].rstrip(b"\0").decode()
+            offset += EVENT_HEADER.size + length
+            if (watch, entry) in targets:
+                changed.add(targets[(watch, entry)])
+
+
+def polling_events(names, interval, debounce):
+    def snapshot():
+        stats = {}
+        for name in names:
+            if os.path.exists(name):
+                stat = os.stat(name)  # a replaced partition directory has a new inode
+                stats[name] = (stat.st_ino, stat.st_mtime_ns, stat.st_size)
+        return stats
+
+    previous = snapshot()
+    while True:
+        time.sleep(interval)
+        current = snapshot()
+        changed = {n for n in set(previous) | set(current) if previous.get(n) != current.get(n)}
+        if changed:
+            time.sleep(debounce)
+            current = snapshot()
+            yield changed
+        previous = current
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Rebuild affected pipeline stages when input files change")
+    parser.add_argument("--changed", nargs="+", help="Rebuild once for these changed inputs and exit")
+    parser.add_argument("--poll", action="store_true", help="Poll file times instead of using inotify")
+    parser.add_argument("--interval", type=float, default=2.0, help="Polling interval in seconds")
+    parser.add_argument("--debounce", type=float, default=1.0, help="Quiet time before a rebuild starts")
+    parser.add_argument("--stage", help=argparse.SUPPRESS)  # run one stage script in the staging directory
+    args = parser.parse_args()
+
+    if args.stage:
+        guard_writes(os.path.dirname(os.getcwd()))  # the project holding STAGING_DIR
+        sys.argv = [args.stage]
+        runpy.run_path(args.stage, run_name="__main__")
+        sys.exit(0)
+
+    if args.changed:
+        rebuild(set(args.changed))
+        sys.exit(0)
+
+    print(f"👀 Watching {', '.join(WATCHED_FILES)}")
+    events = None
+    if not args.poll:
+        try:
+            events = inotify_events(*open_inotify(WATCHED_FILES), args.debounce)
+        except (OSError, AttributeError) as error:  # AttributeError: no inotify_init1 in this libc
+            print(f"⚠️ inotify unavailable ({error}), polling every {args.interval}s")
+    if events is None:
+        events = polling_events(WATCHED_FILES, args.interval, args.debounce)
+    for changed in events:
+        rebuild(changed)
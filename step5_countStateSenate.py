@@ -1,7 +1,9 @@
 import pandas as pd
+from VoterDB import read_columns, store_aggregate
 
 # Load full merged voter file (must have 'State Senate District' and 'Voted' columns)
-df = pd.read_csv("muslim_Voters_data_with_SchoolDistrict_CD_LD_Voted.csv")
+# (read from muslim_voters.sqlite, built by Step0_buildVoterDatabase.py)
+df = read_columns("voters_with_districts", ["State Senate District", "Voted"])
 
 # Step 1: Clean 'State Senate District' names
 df["State Senate District"] = df["State Senate District"].astype(str).str.strip()
@@ -30,4 +32,5 @@ merged["Muslim_Voted_Percent"] = (
 
 # Step 6: Save the result
 merged.to_csv("MuslimsPerStateSenateDistrictVoting.csv", index=False)
+store_aggregate("MuslimsPerStateSenateDistrictVoting.csv", merged)
 print("✅ Saved to MuslimsPerStateSenateDistrictVoting.csv")
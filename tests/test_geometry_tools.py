@@ -0,0 +1,102 @@
+import numpy as np
+from GeometryTools import to_topojson, build_rtree, query_rtree
+
+PRECISION = 5
+
+
+def square(x, y, size=1.0):
+    return [[x, y], [x + size, y], [x + size, y + size], [x, y + size], [x, y]]
+
+
+def feature(geometry_type, coordinates, name):
+    return {"type": "Feature", "properties": {"name": name},
+            "geometry": {"type": geometry_type, "coordinates": coordinates}}
+
+
+def decode_ring(topology, arc_indexes):
+    """Coordinates of a ring from its arc indexes (~i is arc i reversed), as TopoJSON clients do."""
+    (sx, sy), (tx, ty) = topology["transform"]["scale"], topology["transform"]["translate"]
+    points = []
+    for index in arc_indexes:
+        arc = np.cumsum(np.asarray(topology["arcs"][~index if index < 0 else index]), axis=0)
+        arc = arc[::-1] if index < 0 else arc
+        coordinates = [[round(x * sx + tx, PRECISION), round(y * sy + ty, PRECISION)] for x, y in arc]
+        points.extend(coordinates if not points else coordinates[1:])
+    return points
+
+
+def canonical(ring):
+    """Open ring rotated to start at its smallest point, keeping its direction."""
+    ring = [tuple(round(c, PRECISION) for c in p) for p in ring]
+    ring = ring[:-1] if ring[0] == ring[-1] else ring
+    start = ring.index(min(ring))
+    return ring[start:] + ring[:start]
+
+
+def decoded_rings(topology):
+    rings = []
+    for geometry in topology["objects"]["boundaries"]["geometries"]:
+        polygons = [geometry["arcs"]] if geometry["type"] == "Polygon" else geometry["arcs"]
+        rings.append([canonical(decode_ring(topology, ring)) for polygon in polygons for ring in polygon])
+    return rings
+
+
+def original_rings(geojson_data):
+    rings = []
+    for f in geojson_data["features"]:
+        geometry = f["geometry"]
+        polygons = [geometry["coordinates"]] if geometry["type"] == "Polygon" else geometry["coordinates"]
+        rings.append([canonical(ring) for polygon in polygons for ring in polygon])
+    return rings
+
+
+def test_topojson_round_trip_restores_every_ring():
+    hole = [[2.25, 0.25], [2.25, 0.75], [2.75, 0.75], [2.75, 0.25], [2.25, 0.25]]
+    geojson_data = {"type": "FeatureCollection", "features": [
+        feature("Polygon", [square(0, 0)], "a"),
+        feature("Polygon", [square(1, 0)], "b"),
+        feature("Polygon", [square(2, 0), hole], "c"),
+        feature("MultiPolygon", [[square(0, 1)], [square(5.123456, 5.654321, 0.5)]], "d"),
+    ]}
+    topology = to_topojson(geojson_data, PRECISION)
+    assert decoded_rings(topology) == original_rings(geojson_data)
+    names = [g["properties"]["name"] for g in topology["objects"]["boundaries"]["geometries"]]
+    assert names == ["a", "b", "c", "d"]
+
+
+def test_topojson_stores_a_shared_edge_once():
+    geojson_data = {"type": "FeatureCollection", "features": [
+        feature("Polygon", [square(0, 0)], "left"),
+        feature("Polygon", [square(1, 0)], "right"),
+    ]}
+    topology = to_topojson(geojson_data, PRECISION)
+    # The shared edge plus the rest of each square
+    assert len(topology["arcs"]) == 3
+    left, right = (g["arcs"][0] for g in topology["objects"]["boundaries"]["geometries"])
+    shared = {i if i >= 0 else ~i for i in left} & {i if i >= 0 else ~i for i in right}
+    assert len(shared) == 1
+    assert decoded_rings(topology) == original_rings(geojson_data)
+
+
+def brute_force(bounds, bbox):
+    min_x, min_y, max_x, max_y = bbox
+    hits = ~((bounds[:, 2] < min_x) | (bounds[:, 0] > max_x) | (bounds[:, 3] < min_y) | (bounds[:, 1] > max_y))
+    return np.flatnonzero(hits & ~np.isnan(bounds).any(axis=1)).tolist()
+
+
+def test_rtree_query_matches_brute_force():
+    rng = np.random.default_rng(3)
+    for num_features, node_size in [(1, 16), (7, 4), (300, 4), (1000, 16)]:
+        corners = rng.uniform(-120, -110, (num_features, 2))
+        bounds = np.column_stack([corners, corners + rng.uniform(0, 0.8, (num_features, 2))])
+        bounds[rng.random(num_features) < 0.05] = np.nan  # features without geometry
+        tree = build_rtree(bounds, node_size)
+        for _ in range(50):
+            corner = rng.uniform(-121, -109, 2)
+            bbox = [*corner, *(corner + rng.uniform(0, 3, 2))]
+            assert query_rtree(tree, bbox) == brute_force(bounds, bbox)
+
+
+def test_rtree_of_no_features_finds_nothing():
+    tree = build_rtree(np.empty((0, 4)))
+    assert query_rtree(tree, [-180, -90, 180, 90]) == []
@@ -0,0 +1,50 @@
+import numpy as np
+from GOTVRanking import TopK
+
+
+def expected_top(scores, k, keep=None):
+    ranked = sorted((location for location in scores if keep is None or keep(location)),
+                    key=lambda location: (-scores[location], location))
+    return ranked[:k]
+
+
+def test_top_skips_stale_and_removed_entries():
+    topk = TopK()
+    for location, score in [("a", 5.0), ("b", 9.0), ("c", 7.0), ("d", 1.0)]:
+        topk.update(location, score)
+    topk.update("b", 2.0)     # the 9.0 entry is now stale
+    topk.update("c", None)    # removed
+    topk.update("d", np.nan)  # removed
+    topk.update("a", 5.0)     # unchanged: no new entry
+    assert topk.top(10) == ["a", "b"]
+    assert topk.top(1) == ["a"]
+
+
+def test_score_set_back_to_an_old_value_is_listed_once():
+    topk = TopK()
+    topk.update("a", 3.0)
+    topk.update("a", 4.0)
+    topk.update("a", 3.0)  # the first entry is current again, next to the newest one
+    topk.update("b", 1.0)
+    assert topk.top(5) == ["a", "b"]
+
+
+def test_top_matches_a_full_sort_after_random_updates():
+    rng = np.random.default_rng(11)
+    topk, scores = TopK(), {}
+    locations = [f"area {i}" for i in range(60)]
+    for step in range(3000):
+        location = locations[rng.integers(len(locations))]
+        if rng.random() < 0.1:
+            topk.update(location, None)
+            scores.pop(location, None)
+        else:
+            score = float(rng.integers(0, 20))  # few distinct scores: ties and repeats
+            topk.update(location, score)
+            scores[location] = score
+        if step % 100 == 0:
+            keep = (lambda location: location.endswith(("1", "4", "7"))) if step % 200 else None
+            for k in (1, 5, 60):
+                assert topk.top(k, keep) == expected_top(scores, k, keep)
+    # Stale entries are compacted away once they outnumber the live ones
+    assert len(topk.heap) <= 2 * len(topk.scores) + 64
@@ -0,0 +1,86 @@
+import numpy as np
+from Step11_publishAggregates import primary_suppression, complementary_suppression
+
+K = 11
+
+
+def check_invariants(values, groups, child_groups, suppressed, cells):
+    # Every copy of a cell has the same state
+    for cell in np.unique(cells):
+        assert len(set(suppressed[cells == cell])) == 1
+    # No group of two or more cells has exactly one suppressed cell
+    for group in np.unique(groups):
+        members = groups == group
+        if members.sum() > 1:
+            assert suppressed[members].sum() != 1
+    # A suppressed parent has at least one suppressed child
+    for row in np.flatnonzero(suppressed & (child_groups >= 0)):
+        assert suppressed[groups == child_groups[row]].any()
+
+
+def test_primary_hides_small_totals_and_small_turnout():
+    total = np.array([5, 50, 50, 50, 50])
+    voted = np.array([5, 3, 45, 0, 20])
+    total_hidden, turnout_hidden = primary_suppression(total, voted, K)
+    assert total_hidden.tolist() == [True, False, False, False, False]
+    # 3 voted, 5 did not vote: both recoverable small counts; 0 voted is not
+    assert turnout_hidden.tolist() == [True, True, True, False, False]
+
+
+def test_complementary_hides_smallest_sibling():
+    values = np.array([5, 40, 20, 90])
+    groups = np.zeros(4, dtype=int)
+    child_groups = np.full(4, -1)
+    primary = np.array([True, False, False, False])
+    suppressed = complementary_suppression(values, groups, child_groups, primary, np.arange(4))
+    assert suppressed.tolist() == [True, False, True, False]
+
+
+def test_complementary_hides_a_child_of_a_hidden_parent():
+    # Rows 0-1: two counties (group 0); rows 2-4: the cities of county 0 (group 1)
+    values = np.array([5, 8, 30, 40, 50])
+    groups = np.array([0, 0, 1, 1, 1])
+    child_groups = np.array([1, -1, -1, -1, -1])
+    primary = np.array([True, True, False, False, False])
+    suppressed = complementary_suppression(values, groups, child_groups, primary, np.arange(5))
+    assert suppressed[2:].sum() == 2
+    assert suppressed[2] and suppressed[3]
+
+
+def test_every_copy_of_a_cell_is_suppressed_together():
+    # Cell 1 is published in its file (group 0, rows 0-2) and in the drilldown (group 1, rows 3-5)
+    values = np.array([5, 20, 60, 20, 25, 30])
+    groups = np.array([0, 0, 0, 1, 1, 1])
+    cells = np.array([0, 1, 2, 1, 3, 4])
+    child_groups = np.full(6, -1)
+    primary = np.array([True, False, False, False, False, False])
+    suppressed = complementary_suppression(values, groups, child_groups, primary, cells)
+    # The complement of cell 0 is cell 1, so its drilldown copy is hidden too, and the drilldown
+    # group then needs one more hidden cell
+    assert suppressed[1] and suppressed[3]
+    assert suppressed[4]
+    check_invariants(values, groups, child_groups, suppressed, cells)
+
+
+def test_invariants_on_random_hierarchies():
+    rng = np.random.default_rng(7)
+    for _ in range(200):
+        num_groups = rng.integers(2, 6)
+        num_rows = rng.integers(num_groups * 2, num_groups * 6)
+        groups = np.concatenate([np.arange(num_groups), rng.integers(0, num_groups, num_rows - num_groups)])
+        values = rng.integers(1, 100, num_rows)
+        # Some rows are copies of a cell in another group
+        cells = np.arange(num_rows)
+        for row in rng.choice(num_rows, size=num_rows // 4, replace=False):
+            other = rng.integers(0, num_rows)
+            if groups[other] != groups[row]:
+                cells[cells == cells[row]] = cells[other]
+        cells = np.unique(cells, return_inverse=True)[1]
+        # Rows of group 0 may be parents of the other groups
+        child_groups = np.where((groups == 0) & (rng.random(num_rows) < 0.5),
+                                rng.integers(1, num_groups, num_rows), -1)
+        primary = values < 15
+
+        suppressed = complementary_suppression(values, groups, child_groups, primary, cells)
+        assert suppressed[primary].all()
+        check_invariants(values, groups, child_groups, suppressed, cells)
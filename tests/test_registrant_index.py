@@ -0,0 +1,58 @@
+import sqlite3
+import numpy as np
+import pandas as pd
+from RegistrantIndex import (normalize_ids, open_index, lookup, duplicates, read_records,
+                             build_table_index, open_table_index)
+
+
+def write_csv(path, text):
+    path.write_bytes(text.encode("utf-8"))
+    return str(path)
+
+
+def test_normalize_ids():
+    assert normalize_ids([" 123 ", 123.0, "456.00", None, np.nan, "A7"]).tolist() == \
+        [b"123", b"123", b"456", b"", b"", b"A7"]
+
+
+def test_lookup_and_read_records(tmp_path):
+    csv_path = write_csv(tmp_path / "voters.csv",
+                         "RegistrantID,City\r\n"
+                         "300,Fresno\r\n"
+                         "\r\n"                      # blank line, skipped like read_csv does
+                         "100,\"Los Angeles, CA\"\r\n"
+                         "200,Oakland\r\n"
+                         "100,Duplicate\r\n"
+                         "\n"
+                         "400,Irvine")               # no final newline
+    index = open_index(csv_path, "RegistrantID")
+    rows = lookup(index, ["100", 200, "200.0", "999", " 400"])
+    assert rows.tolist() == [1, 2, 2, -1, 4]
+    records = read_records(csv_path, index, rows[[0, 1, 4]])
+    assert records == [{"RegistrantID": "100", "City": "Los Angeles, CA"},
+                       {"RegistrantID": "200", "City": "Oakland"},
+                       {"RegistrantID": "400", "City": "Irvine"}]
+    # Every indexed row reads back as the row pandas sees
+    frame = pd.read_csv(csv_path, dtype=str)
+    assert [r["City"] for r in read_records(csv_path, index, range(len(frame)))] == frame["City"].tolist()
+    assert duplicates(index).tolist() == [b"100"]
+
+
+def test_index_of_an_empty_file(tmp_path):
+    csv_path = write_csv(tmp_path / "empty.csv", "RegistrantID,City\n")
+    index = open_index(csv_path, "RegistrantID")
+    assert lookup(index, ["1", "2"]).tolist() == [-1, -1]
+    assert len(duplicates(index)) == 0
+
+
+def test_table_index(tmp_path):
+    db_path = str(tmp_path / "voters.sqlite")
+    connection = sqlite3.connect(db_path)
+    pd.DataFrame({"Voters Id": ["30", "10", "20", "10"], "Voted": ["Yes", "No", "Yes", "Yes"]}).to_sql(
+        "cd_ld_voters", connection, index=False)
+    build_table_index("cd_ld_voters", "Voters Id", connection, db_path=db_path)
+    connection.close()
+    index = open_table_index("cd_ld_voters", "Voters Id", db_path=db_path)
+    # Row numbers in rowid order; a duplicate id finds its first row
+    assert lookup(index, ["10", 20.0, "30", "40"]).tolist() == [1, 2, 0, -1]
+    assert duplicates(index).tolist() == [b"10"]